@@ -10,7 +10,11 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+import dotenv
+dotenv.load_dotenv()
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'AttendanceManagement.settings')
+# An open live updates stream costs next to nothing under ASGI, so push instead of polling
+os.environ.setdefault('LIVE_UPDATES_SSE', 'True')
 
 application = get_asgi_application()
@@ -76,8 +76,10 @@ AUTHENTICATION_BACKENDS = [
     # AxesStandaloneBackend should be the first backend in the AUTHENTICATION_BACKENDS list.
     'axes.backends.AxesStandaloneBackend',
 
-    # Django ModelBackend is the default authentication backend.
-    'django.contrib.auth.backends.ModelBackend',
+    # Django's ModelBackend, with permission lookups cached in the shared cache: one cache round
+    # trip per request instead of two queries. With the default database cache that is still a
+    # query; the saving is largest with Redis or Memcached (CACHE_BACKEND_SETTING).
+    'accounts.backends.CachedPermissionBackend',
 ]
 
 ROOT_URLCONF = 'AttendanceManagement.urls'
@@ -100,6 +102,12 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'AttendanceManagement.wsgi.application'
+ASGI_APPLICATION = 'AttendanceManagement.asgi.application'
+
+# Push announcements and notifications over Server-Sent Events instead of polling every 30
+# seconds. Only for ASGI (uvicorn, see deploy/uvicorn.service): under WSGI every open stream
+# would hold a worker until it ends. asgi.py switches it on; set LIVE_UPDATES_SSE=False to opt out.
+LIVE_UPDATES_SSE = os.environ.get('LIVE_UPDATES_SSE', 'False') == 'True'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -172,6 +180,44 @@ DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
 SERVER_EMAIL = os.environ.get('SERVER_EMAIL', EMAIL_HOST_USER)
 ADMINS = [('Admin', os.environ.get('ADMIN_EMAIL', 'admin@example.com'))]
 
+# Cache shared by every worker process. Cached permissions, scope-versioned pages and
+# publication job progress must look the same from every worker, so a per-process cache
+# (LocMemCache) is not enough: without a shared cache they are bypassed (see the
+# academics.W001 check). The database cache needs `python manage.py createcachetable`; point
+# CACHE_BACKEND_SETTING / CACHE_LOCATION_SETTING at Redis or Memcached to take the load off MySQL.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND_SETTING', 'django.core.cache.backends.db.DatabaseCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('CACHE_LOCATION_SETTING', 'django_cache'),
+    }
+}
+if CACHE_BACKEND.endswith('.DatabaseCache'):
+    # Room for every user's permissions and the cached pages (the default is 300 entries)
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 20000}
+
+# Sessions. 'django.contrib.sessions.backends.cached_db' (with a cache shared by all workers)
+# or 'django.contrib.sessions.backends.signed_cookies' avoid a database read per request.
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE_SETTING', 'django.contrib.sessions.backends.db')
+# SessionTimeoutMiddleware only saves a user's last activity once it is older than this many
+# seconds, so ordinary page views do not write to the session store.
+SESSION_ACTIVITY_GRANULARITY = int(os.environ.get('SESSION_ACTIVITY_GRANULARITY', 60))
+
+# User activity log entries are buffered per worker and written in batches of this size,
+# or this many seconds after the first pending entry, whichever comes first.
+ACTIVITY_LOG_BUFFER_SIZE = 50
+ACTIVITY_LOG_FLUSH_SECONDS = 5
+ACTIVITY_LOG_ARCHIVE_DIR = BASE_DIR / 'archives' / 'activity_logs'
+
+# Parquet export for offline analysis (export_analytics); academic sessions start in this month
+ANALYTICS_EXPORT_DIR = BASE_DIR / 'exports' / 'analytics'
+ACADEMIC_YEAR_START_MONTH = 6
+
+# Timetable auto-scheduler (academics.scheduler): CourseSubject.required_hours are spread over
+# this many teaching weeks, on these days
+SEMESTER_TEACHING_WEEKS = 15
+AUTO_SCHEDULE_DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = 'accounts:home'
 LOGOUT_REDIRECT_URL = 'accounts:login'
@@ -189,8 +235,10 @@ LOGGING = {
     'handlers': {
         'file': {
             'level': 'INFO',  # Catches everything from INFO up to CRITICAL
-            'class': 'logging.FileHandler',
+            'class': 'logging.handlers.RotatingFileHandler',
             'filename': os.path.join(BASE_DIR, 'debug.log'),
+            'maxBytes': 5 * 1024 * 1024,  # Rolls over to debug.log.1 ... debug.log.5
+            'backupCount': 5,
             'formatter': 'verbose',
         },
         'console': {
@@ -57,7 +57,7 @@ class AttendanceSettingsAdmin(admin.ModelAdmin):
     list_display = (
         'required_percentage', 'mark_deadline_days', 'edit_deadline_days',
         'passing_percentage', 'cancellation_threshold_hours',
-        'number_of_backups_to_retain', 'session_timeout_seconds'
+        'number_of_backups_to_retain', 'session_timeout_seconds', 'activity_log_retention_days'
     )
 
     def has_add_permission(self, request):
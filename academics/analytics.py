@@ -0,0 +1,177 @@
+# In academics/analytics.py
+"""
+Class-level attendance analytics on a dense NumPy matrix.
+
+A class group's attendance for a semester is loaded with one values_list query into an
+AttendanceMatrix: `codes` is an int8 array of students x sessions (a session being one
+timetable slot on one date, or one extra class), and `session_subjects` says which of the
+semester's subjects each session belongs to. Per-subject figures are column masks over the
+same matrix rather than a third axis, which would be mostly empty.
+
+The matrix is cached per (group, semester) under the version of the group's cache scope,
+which every attendance record and roster change of the group bumps (see
+academics.cache_versions and academics.signals).
+"""
+import numpy as np
+from django.contrib.auth.models import User
+
+from .cache_versions import cached_by_scope
+from .models import AttendanceRecord, CourseSubject
+
+ATTENDANCE_MATRIX_CACHE_TIMEOUT = 60 * 60  # 1 hour; also replaced whenever the group's attendance changes
+
+# Status codes stored in the matrix
+NOT_MARKED = -1  # No record for the student (e.g. they joined the class later)
+ABSENT = 0
+PRESENT = 1
+LATE = 2
+
+TREND_WINDOW = 10  # sessions
+
+
+class AttendanceMatrix:
+    def __init__(self, student_ids, subject_ids, session_subjects, session_dates, codes):
+        self.student_ids = student_ids  # (students,) user ids, ascending
+        self.subject_ids = subject_ids  # (subjects,) course subject ids
+        self.session_subjects = session_subjects  # (sessions,) index into subject_ids
+        self.session_dates = session_dates  # (sessions,) datetime64[D], ascending
+        self.codes = codes  # (students, sessions) int8 status codes
+
+    @classmethod
+    def load(cls, group, semester):
+        subject_ids = np.array(sorted(CourseSubject.objects.filter(
+            course_id=group.course_id, semester=semester
+        ).values_list('pk', flat=True)), dtype=np.int64)
+        student_ids = np.array(sorted(User.objects.filter(
+            profile__student_group=group, profile__role='student'
+        ).values_list('pk', flat=True)), dtype=np.int64)
+
+        rows = list(AttendanceRecord.objects.filter(
+            student_group=group, course_subject_id__in=subject_ids.tolist()
+        ).values_list(
+            'student_id', 'course_subject_id', 'date', 'timetable_id', 'extra_class_id', 'status', 'is_late'
+        ).order_by())
+
+        if not rows:
+            return cls(student_ids, subject_ids, np.zeros(0, dtype=np.int16),
+                       np.zeros(0, dtype='datetime64[D]'), np.zeros((len(student_ids), 0), dtype=np.int8))
+
+        students, subjects, dates, timetables, extra_classes, statuses, late = zip(*rows)
+        dates = np.array(dates, dtype='datetime64[D]')
+        subject_index = np.searchsorted(subject_ids, np.array(subjects, dtype=np.int64)).astype(np.int16)
+
+        # A session is a (date, timetable entry, extra class) triple; np.unique sorts them by date
+        sessions = np.empty(len(rows), dtype=[('date', 'datetime64[D]'), ('timetable', np.int64),
+                                               ('extra_class', np.int64), ('subject', np.int16)])
+        sessions['date'] = dates
+        sessions['timetable'] = [pk or 0 for pk in timetables]
+        sessions['extra_class'] = [pk or 0 for pk in extra_classes]
+        sessions['subject'] = subject_index
+        unique_sessions, session_index = np.unique(sessions, return_inverse=True)
+
+        attended = np.isin(np.array(statuses), ('Present', 'Late'))
+        record_codes = np.where(attended, np.where(np.array(late, dtype=bool), LATE, PRESENT), ABSENT)
+
+        # Records of students who have since left the group are dropped
+        students = np.array(students, dtype=np.int64)
+        student_index = np.searchsorted(student_ids, students)
+        in_group = (student_index < len(student_ids)) & (
+            student_ids[np.minimum(student_index, len(student_ids) - 1)] == students)
+
+        codes = np.full((len(student_ids), len(unique_sessions)), NOT_MARKED, dtype=np.int8)
+        codes[student_index[in_group], session_index.ravel()[in_group]] = record_codes[in_group]
+        return cls(student_ids, subject_ids, unique_sessions['subject'], unique_sessions['date'], codes)
+
+    # --- Vectorized measures ---
+
+    @property
+    def attended(self):
+        return self.codes >= PRESENT
+
+    def held_per_subject(self):
+        """(subjects,) number of sessions held."""
+        return np.bincount(self.session_subjects, minlength=len(self.subject_ids))
+
+    def attended_per_subject(self):
+        """(students, subjects) number of sessions attended."""
+        one_hot = np.zeros((len(self.session_subjects), len(self.subject_ids)), dtype=np.int32)
+        one_hot[np.arange(len(self.session_subjects)), self.session_subjects] = 1
+        return self.attended.astype(np.int32) @ one_hot
+
+    def subject_percentages(self):
+        """(students, subjects) percentage attended; NaN where a subject has had no classes."""
+        held = self.held_per_subject()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(held > 0, self.attended_per_subject() / held * 100, np.nan)
+
+    def overall_percentages(self):
+        """(students,) percentage over all sessions; NaN if none have been held."""
+        held = self.codes.shape[1]
+        if not held:
+            return np.full(len(self.student_ids), np.nan)
+        return self.attended.sum(axis=1) / held * 100
+
+    def absence_streaks(self):
+        """
+        (current, longest): (students,) runs of consecutive sessions missed; the current run
+        is the one ending at the latest session.
+        """
+        missed = (~self.attended).astype(np.int32)
+        if not missed.shape[1]:
+            zeros = np.zeros(len(self.student_ids), dtype=np.int32)
+            return zeros, zeros
+        total = np.cumsum(missed, axis=1)
+        # Total at the last attended session, carried forward; subtracting it restarts the count
+        restart = np.maximum.accumulate(np.where(missed == 0, total, 0), axis=1)
+        runs = total - restart
+        return runs[:, -1], runs.max(axis=1)
+
+    def trend(self, window=TREND_WINDOW):
+        """(students,) percentage over the last `window` sessions minus the overall percentage."""
+        if not self.codes.shape[1]:
+            return np.full(len(self.student_ids), np.nan)
+        recent = self.attended[:, -window:].mean(axis=1) * 100
+        return recent - self.overall_percentages()
+
+    def classes_needed(self, threshold):
+        """
+        (students,) consecutive classes to attend to reach `threshold` percent overall: 0 if
+        already there, -1 if it can no longer be reached (a 100% threshold after a missed class).
+        Vectorized form of stats.classes_needed.
+        """
+        attended = self.attended.sum(axis=1)
+        held = self.codes.shape[1]
+        # Smallest n with (attended + n) / (held + n) >= threshold / 100
+        shortfall = threshold * held - 100 * attended
+        if threshold >= 100:
+            return np.where(shortfall > 0, -1, 0)
+        return np.maximum(np.ceil(shortfall / (100 - threshold)), 0).astype(np.int64)
+
+    def student_summaries(self, threshold):
+        """JSON-ready figures per student: {student_id: {...}}."""
+        overall = self.overall_percentages()
+        current_streak, longest_streak = self.absence_streaks()
+        trend = self.trend()
+        needed = self.classes_needed(threshold)
+        per_subject = self.attended_per_subject()
+        return {
+            int(student_id): {
+                'attended_classes': int(self.attended[i].sum()),
+                'absent_classes': int(self.codes.shape[1] - self.attended[i].sum()),
+                'total_classes': int(self.codes.shape[1]),
+                'percentage': None if np.isnan(overall[i]) else round(float(overall[i]), 2),
+                'subjects': {int(cs): int(n) for cs, n in zip(self.subject_ids, per_subject[i])},
+                'current_absence_streak': int(current_streak[i]),
+                'longest_absence_streak': int(longest_streak[i]),
+                'trend': None if np.isnan(trend[i]) else round(float(trend[i]), 2),
+                'classes_needed': int(needed[i]),
+            }
+            for i, student_id in enumerate(self.student_ids)
+        }
+
+
+# --- Cache ---
+
+@cached_by_scope(timeout=ATTENDANCE_MATRIX_CACHE_TIMEOUT, group='group', course='group.course_id')
+def get_attendance_matrix(group, semester):
+    return AttendanceMatrix.load(group, semester)
@@ -0,0 +1,268 @@
+# In academics/analytics_export.py
+"""
+Columnar (Parquet) export of attendance, marks and their dimensions for offline analysis.
+
+Layout under settings.ANALYTICS_EXPORT_DIR, with Hive-style partition directories that
+pyarrow.dataset, pandas, DuckDB and Spark all understand:
+
+    attendance/session=<academic session>/month=<YYYY-MM>/data.parquet
+    marks/semester=<n>/data.parquet
+    students.parquet, subjects.parquet, timetable.parquet
+    _manifest.json
+
+Rows are read with .iterator() and written as Arrow record batches, so an export never holds
+more than one chunk in memory. Attendance is exported incrementally: a month's partition is
+written only if it does not exist yet or a record dated in that month changed since the last
+export. Marks have no date and are rewritten by semester, and the dimensions are rewritten, on
+every run. Deleted attendance is only dropped by a full export.
+"""
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+from itertools import islice
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .models import AcademicSession, AttendanceRecord, CourseSubject, Mark, Timetable
+
+EXPORT_CHUNK_SIZE = 5000
+MANIFEST_FILE = '_manifest.json'
+DATA_FILE = 'data.parquet'
+
+ATTENDANCE_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('date', pa.date32()),
+    ('student_id', pa.int64()),
+    ('student_group_id', pa.int64()),
+    ('course_subject_id', pa.int64()),
+    ('timetable_id', pa.int64()),
+    ('extra_class_id', pa.int64()),
+    ('status', pa.dictionary(pa.int8(), pa.string())),
+    ('is_late', pa.bool_()),
+    ('marked_by_id', pa.int64()),
+    ('created_at', pa.timestamp('us', tz='UTC')),
+    ('updated_at', pa.timestamp('us', tz='UTC')),
+])
+MARKS_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('student_id', pa.int64()),
+    ('course_subject_id', pa.int64()),
+    ('criterion_id', pa.int64()),
+    ('criterion_name', pa.string()),
+    ('max_marks', pa.int64()),
+    ('marks_obtained', pa.decimal128(5, 2)),
+])
+STUDENTS_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('username', pa.string()),
+    ('first_name', pa.string()),
+    ('last_name', pa.string()),
+    ('is_active', pa.bool_()),
+    ('student_id_number', pa.string()),
+    ('student_group_id', pa.int64()),
+    ('student_group_name', pa.string()),
+    ('course_id', pa.int64()),
+    ('course_name', pa.string()),
+    ('start_year', pa.int64()),
+    ('passout_year', pa.int64()),
+])
+SUBJECTS_SCHEMA = pa.schema([
+    ('course_subject_id', pa.int64()),
+    ('course_id', pa.int64()),
+    ('course_name', pa.string()),
+    ('semester', pa.int64()),
+    ('subject_id', pa.int64()),
+    ('subject_name', pa.string()),
+    ('subject_code', pa.string()),
+])
+TIMETABLE_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('student_group_id', pa.int64()),
+    ('course_subject_id', pa.int64()),
+    ('faculty_id', pa.int64()),
+    ('day_of_week', pa.string()),
+    ('start_time', pa.time64('us')),
+    ('end_time', pa.time64('us')),
+    ('status', pa.string()),
+])
+
+
+def get_export_dir():
+    return getattr(settings, 'ANALYTICS_EXPORT_DIR', os.path.join(settings.BASE_DIR, 'exports', 'analytics'))
+
+
+# --- Writing ---
+
+def _chunks(rows, size=EXPORT_CHUNK_SIZE):
+    rows = iter(rows)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def write_parquet(path, schema, rows):
+    """
+    Writes an iterable of row tuples (in schema order) to a Parquet file, one record batch
+    per chunk. The file is replaced atomically; returns the number of rows written.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    count = 0
+    try:
+        with pq.ParquetWriter(tmp_path, schema, compression='zstd') as writer:
+            for chunk in _chunks(rows):
+                columns = zip(*chunk)
+                writer.write_batch(pa.RecordBatch.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema
+                ))
+                count += len(chunk)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+    return count
+
+
+# --- Partitions ---
+
+def academic_session_label(month, sessions):
+    """
+    The academic session a month belongs to, as a path-safe label. Sessions are keyed by
+    their start year and begin in settings.ACADEMIC_YEAR_START_MONTH.
+    """
+    start_month = getattr(settings, 'ACADEMIC_YEAR_START_MONTH', 6)
+    start_year = month.year if month.month >= start_month else month.year - 1
+    return slugify(sessions.get(start_year, f'{start_year}-{start_year + 1}'))
+
+
+def attendance_partition_path(export_dir, month, sessions):
+    return os.path.join(export_dir, 'attendance', f'session={academic_session_label(month, sessions)}',
+                        f"month={month.strftime('%Y-%m')}", DATA_FILE)
+
+
+def read_manifest(export_dir):
+    try:
+        with open(os.path.join(export_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_manifest(export_dir, manifest):
+    path = os.path.join(export_dir, MANIFEST_FILE)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f'{path}.tmp', path)
+
+
+# --- Datasets ---
+
+def _attendance_rows(month):
+    return AttendanceRecord.objects.filter(date__year=month.year, date__month=month.month).order_by(
+        'date', 'pk'
+    ).values_list(
+        'pk', 'date', 'student_id', 'student_group_id', 'course_subject_id', 'timetable_id', 'extra_class_id',
+        'status', 'is_late', 'marked_by_id', 'created_at', 'updated_at'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _marks_rows(semester):
+    return Mark.objects.filter(subject__semester=semester).order_by('pk').values_list(
+        'pk', 'student_id', 'subject_id', 'criterion_id', 'criterion__name', 'criterion__max_marks', 'marks_obtained'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _students_rows():
+    return User.objects.filter(profile__role='student').order_by('pk').values_list(
+        'pk', 'username', 'first_name', 'last_name', 'is_active', 'profile__student_id_number',
+        'profile__student_group_id', 'profile__student_group__name', 'profile__student_group__course_id',
+        'profile__student_group__course__name', 'profile__student_group__start_year',
+        'profile__student_group__passout_year'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _subjects_rows():
+    return CourseSubject.objects.order_by('pk').values_list(
+        'pk', 'course_id', 'course__name', 'semester', 'subject_id', 'subject__name', 'subject__code'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def _timetable_rows():
+    return Timetable.objects.order_by('pk').values_list(
+        'pk', 'student_group_id', 'subject_id', 'faculty_id', 'day_of_week', 'time_slot__start_time',
+        'time_slot__end_time', 'status'
+    ).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+
+def export_analytics(full=False, export_dir=None):
+    """
+    Brings the Parquet export up to date and returns a summary:
+    {'attendance_partitions', 'attendance_rows', 'marks_rows', 'students', 'subjects', 'timetable'}.
+    """
+    export_dir = export_dir or get_export_dir()
+    started_at = timezone.now()
+    manifest = {} if full else read_manifest(export_dir)
+    last_export = datetime.fromisoformat(manifest['exported_at']) if manifest.get('exported_at') else None
+    sessions = dict(AcademicSession.objects.values_list('start_year', 'name'))
+
+    if full:
+        shutil.rmtree(os.path.join(export_dir, 'attendance'), ignore_errors=True)
+
+    changed_months = set()
+    if last_export:
+        changed_months = set(AttendanceRecord.objects.filter(updated_at__gte=last_export).dates('date', 'month'))
+
+    summary = {'attendance_partitions': 0, 'attendance_rows': 0}
+    for month in AttendanceRecord.objects.dates('date', 'month'):
+        path = attendance_partition_path(export_dir, month, sessions)
+        if month in changed_months or not os.path.exists(path):
+            summary['attendance_rows'] += write_parquet(path, ATTENDANCE_SCHEMA, _attendance_rows(month))
+            summary['attendance_partitions'] += 1
+
+    shutil.rmtree(os.path.join(export_dir, 'marks'), ignore_errors=True)
+    summary['marks_rows'] = 0
+    for semester in CourseSubject.objects.filter(marks__isnull=False).values_list('semester', flat=True).distinct():
+        path = os.path.join(export_dir, 'marks', f'semester={semester}', DATA_FILE)
+        summary['marks_rows'] += write_parquet(path, MARKS_SCHEMA, _marks_rows(semester))
+
+    summary['students'] = write_parquet(os.path.join(export_dir, 'students.parquet'), STUDENTS_SCHEMA,
+                                        _students_rows())
+    summary['subjects'] = write_parquet(os.path.join(export_dir, 'subjects.parquet'), SUBJECTS_SCHEMA,
+                                        _subjects_rows())
+    summary['timetable'] = write_parquet(os.path.join(export_dir, 'timetable.parquet'), TIMETABLE_SCHEMA,
+                                         _timetable_rows())
+
+    # Records changed while the export ran are picked up by the next one
+    _write_manifest(export_dir, {'exported_at': started_at.isoformat(), **summary})
+    return summary
+
+
+def zip_export(export_dir=None):
+    """
+    The export directory as a zip archive (Parquet files are already compressed), built in an
+    anonymous temporary file so a download never holds the export in memory. Closing the file
+    deletes it; FileResponse does that once it has streamed it.
+    """
+    export_dir = export_dir or get_export_dir()
+    archive_file = tempfile.TemporaryFile(suffix='.zip')
+    try:
+        with zipfile.ZipFile(archive_file, 'w', zipfile.ZIP_STORED) as archive:
+            for root, _, files in os.walk(export_dir):
+                for name in sorted(files):
+                    if name.endswith('.tmp'):
+                        continue
+                    path = os.path.join(root, name)
+                    archive.write(path, os.path.relpath(path, export_dir))
+    except BaseException:
+        archive_file.close()
+        raise
+    archive_file.seek(0)
+    return archive_file
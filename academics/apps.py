@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class AcademicsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'academics'
+
+    def ready(self):
+        # Register the signal handlers that keep cached academic data in sync
+        import academics.signals
+        # Warn when the cache is not shared between workers
+        import academics.checks
@@ -0,0 +1,132 @@
+# In academics/cache_versions.py
+"""
+Version counters for cached academics data.
+
+Cached values that depend on "everything about class group G" (or a course, a faculty
+member, a student, or the global settings) embed the current version of each of those
+scopes in their cache key. The narrower 'timetable' and 'faculty_timetable' scopes only
+cover a class group's or a faculty member's weekly timetable, for caches that should not be
+thrown away whenever attendance is marked. The signal handlers in academics.signals bump a scope's version
+whenever a model row belonging to it is saved or deleted, so the next read misses and
+recomputes; nothing has to be deleted and no TTL has to be guessed.
+
+    @cached_by_scope(group='group', course='group.course_id')
+    def timetable_grid(group, semester):
+        ...
+
+Versions are bumped when the transaction commits, so a reader in another request can never
+cache data from before the write under the new version. Each scope is bumped once per
+transaction, however many rows of it are written.
+
+This only holds if every worker sees the same versions: with a per-process cache
+(LocMemCache) a bump would only reach the worker that made the write, so nothing is cached
+and decorated functions always run (see academics.checks).
+"""
+import functools
+import hashlib
+import inspect
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .transaction_utils import on_commit_batched
+
+SCOPES = ('group', 'course', 'faculty', 'student', 'settings', 'timetable', 'faculty_timetable')
+SCOPE_VERSION_KEY = 'scope_version_{scope}_{object_id}'
+SCOPED_CACHE_KEY = 'scoped_{name}_{args}_{versions}'
+SCOPED_CACHE_TIMEOUT = 60 * 60 * 24  # 1 day; the key changes whenever the data does
+
+_MISSING = object()
+
+
+def cache_is_shared():
+    """
+    Whether the default cache is seen by every worker process. A LocMemCache is private to
+    one process, so a write in one worker cannot invalidate what another one has cached.
+    """
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def _version_key(scope, object_id):
+    if scope not in SCOPES:
+        raise ValueError(f"Unknown cache scope '{scope}'")
+    return SCOPE_VERSION_KEY.format(scope=scope, object_id=object_id)
+
+
+def get_scope_versions(scopes):
+    """Current versions of a list of (scope, object_id) pairs, in one cache round trip."""
+    keys = [_version_key(scope, object_id) for scope, object_id in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def _set_new_versions(scopes):
+    cache.set_many({_version_key(scope, object_id): time.time_ns() for scope, object_id in scopes}, None)
+
+
+def bump_scope_versions(*scopes):
+    """
+    Gives each (scope, object_id) pair a new version once the current transaction commits.
+    Pairs with no object id (e.g. a student without a class group) are ignored.
+    """
+    on_commit_batched('scope_versions', [(scope, object_id) for scope, object_id in scopes if object_id is not None],
+                      _set_new_versions)
+
+
+def _resolve(arguments, path):
+    """Follows a dotted path from a function argument, e.g. 'student.profile.student_group_id'."""
+    name, *attributes = path.split('.')
+    value = arguments.get(name)
+    for attribute in attributes:
+        value = getattr(value, attribute, None)
+    return getattr(value, 'pk', value)
+
+
+def _key_part(value):
+    if hasattr(value, '_meta'):
+        return f'{value._meta.label_lower}:{value.pk}'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return repr(value)
+
+
+def cached_by_scope(timeout=SCOPED_CACHE_TIMEOUT, **scopes):
+    """
+    Caches a function's return value under a key made of its arguments and the versions of
+    the given scopes. Each keyword names a scope and says which argument identifies it, as a
+    dotted path (an object or its id); `settings=True` depends on the global settings.
+
+    The uncached function stays available as `.uncached`.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not cache_is_shared():
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            versions = get_scope_versions([
+                (scope, 0 if path is True else _resolve(bound.arguments, path)) for scope, path in scopes.items()
+            ])
+            arguments = '|'.join(_key_part(value) for value in bound.arguments.values())
+            cache_key = SCOPED_CACHE_KEY.format(
+                name=name, args=hashlib.md5(arguments.encode()).hexdigest(),
+                versions='_'.join(str(version) for version in versions)
+            )
+            value = cache.get(cache_key, _MISSING)
+            if value is _MISSING:
+                value = func(*args, **kwargs)
+                cache.set(cache_key, value, timeout)
+            return value
+
+        wrapper.uncached = func
+        return wrapper
+    return decorator
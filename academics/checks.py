@@ -0,0 +1,16 @@
+# In academics/checks.py
+from django.core.checks import Tags, Warning, register
+
+from .cache_versions import cache_is_shared
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    if cache_is_shared():
+        return []
+    return [Warning(
+        "The default cache is local to each worker process.",
+        hint="Configure a cache shared by all workers (the database cache, Redis or Memcached) in "
+             "CACHES. Until then cached permissions and scope-versioned pages are not cached.",
+        id='academics.W001',
+    )]
@@ -7,11 +7,33 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def get_database_email_connection(settings=None):
+    """
+    Returns an SMTP connection built from the settings stored in the database, or None if
+    SMTP is not configured. Callers sending many emails can open it once and pass it to
+    send_database_email() for every message.
+    """
+    settings = settings or AttendanceSettings.load()
+    if not settings.email_host:
+        return None
+
+    return get_connection(
+        backend='django.core.mail.backends.smtp.EmailBackend',
+        host=settings.email_host,
+        port=settings.email_port,
+        username=settings.email_host_user,
+        password=settings.email_host_password,
+        use_tls=settings.email_use_tls,
+        use_ssl=settings.email_use_ssl,
+    )
+
+
 # Add 'bcc_list=None' to the function signature
-def send_database_email(subject, body, recipient_list, html_message=None, bcc_list=None):
+def send_database_email(subject, body, recipient_list, html_message=None, bcc_list=None, connection=None):
     """
     Send email using SMTP settings from the database.
     Can handle a main recipient list and a BCC list for bulk sending.
+    An already open connection can be passed in to reuse it across several emails.
     """
     settings = AttendanceSettings.load()
 
@@ -20,15 +42,7 @@ def send_database_email(subject, body, recipient_list, html_message=None, bcc_li
         return False
 
     try:
-        connection = get_connection(
-            backend='django.core.mail.backends.smtp.EmailBackend',
-            host=settings.email_host,
-            port=settings.email_port,
-            username=settings.email_host_user,
-            password=settings.email_host_password,
-            use_tls=settings.email_use_tls,
-            use_ssl=settings.email_use_ssl,
-        )
+        connection = connection or get_database_email_connection(settings)
 
         email = EmailMultiAlternatives(
             subject=subject,
@@ -2,6 +2,7 @@ import datetime
 
 from django import forms
 from django.contrib.auth.models import User
+from django.core.validators import FileExtensionValidator
 from django.forms import inlineformset_factory
 
 from accounts.models import Profile
@@ -175,6 +176,7 @@ class AttendanceSettingsForm(forms.ModelForm):
                   'cancellation_threshold_hours',
                   'number_of_backups_to_retain',
                   'session_timeout_seconds',
+                  'activity_log_retention_days',
                   'notification_recipient_email',
                   ]
         widgets = {
@@ -185,6 +187,7 @@ class AttendanceSettingsForm(forms.ModelForm):
             'cancellation_threshold_hours': forms.NumberInput(attrs={'class': 'form-control'}),
             'number_of_backups_to_retain': forms.NumberInput(attrs={'class': 'form-control'}),
             'session_timeout_seconds': forms.NumberInput(attrs={'class': 'form-control'}),
+            'activity_log_retention_days': forms.NumberInput(attrs={'class': 'form-control'}),
             'notification_recipient_email': forms.EmailInput(
                 attrs={'class': 'form-control', 'placeholder': 'e.g., admin@example.com'}),
         }
@@ -390,7 +393,11 @@ class MarkSelectForm(forms.Form):
 
 
 class BulkMarksImportForm(forms.Form):
-    file = forms.FileField(widget=forms.FileInput(attrs={'class': 'custom-file-input'}))
+    file = forms.FileField(
+        widget=forms.FileInput(attrs={'class': 'custom-file-input', 'accept': '.csv,.xlsx'}),
+        validators=[FileExtensionValidator(allowed_extensions=['csv', 'xlsx'])],
+        help_text="A CSV or Excel (.xlsx) file."
+    )
 
 
 class MarksReportForm(forms.Form):
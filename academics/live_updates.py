@@ -0,0 +1,281 @@
+# In academics/live_updates.py
+"""
+Pushes new announcements and notifications to logged-in users over Server-Sent Events.
+
+Events are fanned out through an in-process publish/subscribe registry: every open
+stream subscribes to the channels it cares about ('user:<id>' plus the user's
+announcement audiences) and publishers hand events to all subscribers of a channel.
+Streams also re-check the database every FALLBACK_POLL_SECONDS (no more often than the
+legacy 30 second poll), which covers events published by another worker process, and end
+after MAX_STREAM_SECONDS so long-lived connections are recycled (the browser's EventSource
+reconnects on its own). The database connection used for a check is closed right after it,
+so idle streams hold no MySQL connections.
+
+Only used under ASGI; see settings.LIVE_UPDATES_SSE.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.models import Notification, Profile
+from .models import Announcement, AnnouncementAudience, AnnouncementWatermark
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_POLL_SECONDS = 30
+MAX_STREAM_SECONDS = 5 * 60
+SUBSCRIBER_QUEUE_SIZE = 100
+
+_subscribers = {}  # channel -> set of (event loop, asyncio.Queue)
+_subscribers_lock = threading.Lock()
+
+
+# --- Announcement audiences ---
+
+def get_user_audiences(user):
+    """Returns the announcement audiences a user belongs to, e.g. ['all_students', 'group:3']."""
+    try:
+        profile = user.profile
+    except Profile.DoesNotExist:
+        return []
+
+    if profile.role == 'student' and profile.student_group_id:
+        return ['all_students', f'group:{profile.student_group_id}']
+    if profile.role == 'faculty':
+        return ['all_faculty']
+    return []
+
+
+def get_announcement_audiences(announcement, group_ids=None):
+    """Returns the audiences an announcement is sent to."""
+    audiences = []
+    if announcement.send_to_all_students:
+        audiences.append('all_students')
+    if announcement.send_to_all_faculty:
+        audiences.append('all_faculty')
+    if group_ids is None:
+        group_ids = announcement.target_student_groups.values_list('pk', flat=True)
+    audiences.extend(f'group:{group_id}' for group_id in group_ids)
+    return audiences
+
+
+def sync_announcement_audiences(announcement):
+    """Brings the AnnouncementAudience index of an announcement in line with its targets."""
+    wanted = set(get_announcement_audiences(announcement))
+    stored = set(AnnouncementAudience.objects.filter(
+        announcement=announcement
+    ).values_list('audience_key', flat=True))
+
+    if stored - wanted:
+        AnnouncementAudience.objects.filter(announcement=announcement, audience_key__in=stored - wanted).delete()
+    AnnouncementAudience.objects.bulk_create([
+        AnnouncementAudience(audience_key=audience_key, announcement=announcement)
+        for audience_key in wanted - stored
+    ], ignore_conflicts=True)
+
+
+def get_latest_unread_announcement(user, after_id=None):
+    """
+    Returns the newest announcement sent to the user above their seen watermark, or None.
+    A single query over the audience index.
+    """
+    audiences = get_user_audiences(user)
+    if not audiences:
+        return None
+
+    watermark = AnnouncementWatermark.objects.filter(user=user).values('last_seen_announcement_id')
+    announcements = Announcement.objects.filter(
+        audiences__audience_key__in=audiences,
+        pk__gt=Coalesce(Subquery(watermark), 0),
+    )
+    if after_id:
+        announcements = announcements.filter(pk__gt=after_id)
+    return announcements.order_by('-pk').first()
+
+
+def mark_announcement_seen(user, announcement):
+    """Moves the user's watermark up to this announcement; older announcements count as seen too."""
+    updated = AnnouncementWatermark.objects.filter(
+        user=user, last_seen_announcement_id__lt=announcement.pk
+    ).update(last_seen_announcement_id=announcement.pk, last_seen_at=timezone.now())
+    if not updated:
+        AnnouncementWatermark.objects.get_or_create(
+            user=user, defaults={'last_seen_announcement_id': announcement.pk}
+        )
+
+
+def serialize_announcement(announcement):
+    return {
+        'id': announcement.pk,
+        'title': announcement.title,
+        'content': announcement.content,
+        'timestamp': announcement.created_at.strftime('%b %d, %Y, %I:%M %p'),
+    }
+
+
+def serialize_notification(notification):
+    return {
+        'id': notification.pk,
+        'message': notification.message,
+        'url': notification.url or '',
+        'timestamp': notification.timestamp.strftime('%b %d, %Y, %I:%M %p'),
+    }
+
+
+# --- Publish / subscribe ---
+
+def subscribe(channels):
+    """Registers a new subscriber on the given channels and returns its handle."""
+    subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+    with _subscribers_lock:
+        for channel in channels:
+            _subscribers.setdefault(channel, set()).add(subscriber)
+    return subscriber
+
+
+def unsubscribe(subscriber, channels):
+    with _subscribers_lock:
+        for channel in channels:
+            subscribers = _subscribers.get(channel)
+            if subscribers:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del _subscribers[channel]
+
+
+def _deliver(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # A stalled client; the database fallback will catch it up
+        pass
+
+
+def publish(channels, event):
+    """
+    Hands an event to every subscriber of the given channels. Safe to call from
+    synchronous code running in any thread.
+    """
+    with _subscribers_lock:
+        subscribers = set().union(*(_subscribers.get(channel, ()) for channel in channels))
+    for loop, queue in subscribers:
+        try:
+            loop.call_soon_threadsafe(_deliver, queue, event)
+        except RuntimeError:
+            pass  # The subscriber's event loop has already closed
+
+
+def publish_announcement(announcement, group_ids=None):
+    publish(get_announcement_audiences(announcement, group_ids),
+            {'type': 'announcement', 'id': announcement.pk})
+
+
+def publish_notification(notification):
+    publish([f'user:{notification.recipient_id}'], {'type': 'notification', 'id': notification.pk})
+
+
+# --- The event stream ---
+
+def _format_event(event_type, data, last_announcement_id, last_notification_id):
+    # The event id carries both watermarks, so a reconnecting EventSource resumes where it left off
+    return (f"id: {last_announcement_id}:{last_notification_id}\n"
+            f"event: {event_type}\n"
+            f"data: {json.dumps(data)}\n\n")
+
+
+def _parse_last_event_id(last_event_id):
+    try:
+        announcement_id, notification_id = last_event_id.split(':')
+        return int(announcement_id), int(notification_id)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _initial_state(user, last_event_id):
+    resumed = _parse_last_event_id(last_event_id)
+    if resumed:
+        return resumed
+    # A fresh connection only cares about notifications from now on
+    last_notification_id = Notification.objects.filter(recipient=user).order_by('-pk').values_list(
+        'pk', flat=True).first() or 0
+    return 0, last_notification_id
+
+
+def _collect_pending(user, last_announcement_id, last_notification_id):
+    """
+    Returns the events the user has not received yet, read from the database: the latest
+    unseen announcement (marked as seen, like the legacy pop-up) and any newer notifications.
+    """
+    events = []
+    announcement = get_latest_unread_announcement(user, after_id=last_announcement_id)
+    if announcement:
+        mark_announcement_seen(user, announcement)
+        events.append(('announcement', announcement.pk, serialize_announcement(announcement)))
+
+    notifications = Notification.objects.filter(recipient=user, pk__gt=last_notification_id).order_by('pk')
+    events.extend(('notification', notification.pk, serialize_notification(notification))
+                  for notification in notifications[:20])
+    return events
+
+
+def _stream_setup(user, last_event_id):
+    try:
+        return _initial_state(user, last_event_id), get_user_audiences(user)
+    finally:
+        # A stream outlives its request, so nothing else would close this thread's connection
+        close_old_connections()
+
+
+def _stream_check(user, last_announcement_id, last_notification_id):
+    try:
+        return _collect_pending(user, last_announcement_id, last_notification_id)
+    finally:
+        close_old_connections()
+
+
+async def event_stream(user, last_event_id=None):
+    """Yields Server-Sent Events for a user until MAX_STREAM_SECONDS have passed."""
+    (last_announcement_id, last_notification_id), audiences = await sync_to_async(_stream_setup)(user, last_event_id)
+    channels = [f'user:{user.pk}'] + audiences
+    subscriber = subscribe(channels)
+    _, queue = subscriber
+    deadline = time.monotonic() + MAX_STREAM_SECONDS
+
+    try:
+        # Tell the browser how long to wait before reconnecting
+        yield "retry: 5000\n\n"
+        check_database = True
+        while time.monotonic() < deadline:
+            if check_database:
+                events = await sync_to_async(_stream_check)(user, last_announcement_id, last_notification_id)
+                for event_type, event_id, data in events:
+                    if event_type == 'announcement':
+                        last_announcement_id = max(last_announcement_id, event_id)
+                    else:
+                        last_notification_id = max(last_notification_id, event_id)
+                    yield _format_event(event_type, data, last_announcement_id, last_notification_id)
+
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=FALLBACK_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                # Keep the connection alive through proxies, then fall back to the database
+                yield ": keep-alive\n\n"
+                check_database = True
+                continue
+
+            # Skip what this stream has already delivered (e.g. an announcement sent to
+            # both 'all_students' and the student's class)
+            if event['type'] == 'announcement':
+                check_database = event['id'] > last_announcement_id
+            else:
+                check_database = event['id'] > last_notification_id
+    finally:
+        unsubscribe(subscriber, channels)
@@ -0,0 +1,210 @@
+# In academics/log_utils.py
+"""
+Reading the application log (settings.LOGGING's 'file' handler) for the System Reports page.
+
+Records use the 'verbose' format, '{levelname} {asctime} {module} {message}'; lines that do
+not start a record (e.g. tracebacks) belong to the record above them. Both the tail and the
+filtered views read on into the RotatingFileHandler backups ('<log file>.1', '.2', ...),
+newest first, so older records do not vanish at each rollover.
+
+Filtered views go through a sidecar index, '<log file>.idx': a header with the number of
+bytes indexed plus the file's first bytes (to notice rotation), followed by one fixed-size
+entry per record holding its byte offset, time and level. The index is extended on every
+read to cover newly written records, so only the new part of the log is ever scanned. A
+rollover renames every file, so each backup's index is rebuilt once after it.
+"""
+import bisect
+import os
+import re
+import struct
+from datetime import datetime
+
+from django.conf import settings
+
+LOG_LEVELS = ['DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL']
+RECORD_RE = re.compile(
+    r'^(?P<level>DEBUG|INFO|WARNING|ERROR|CRITICAL) '
+    r'(?P<time>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),\d{3} '
+    r'(?P<module>\S+) ?(?P<message>.*)$'
+)
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+DEFAULT_RECORD_LIMIT = 100
+TAIL_BLOCK_SIZE = 8192
+INDEX_HEAD_SIZE = 64
+INDEX_HEADER = struct.Struct(f'<Q{INDEX_HEAD_SIZE}s')  # bytes indexed, first bytes of the log
+INDEX_ENTRY = struct.Struct('<QqB')  # record offset, unix time, level number
+
+
+def get_log_file_path():
+    try:
+        return settings.LOGGING['handlers']['file']['filename']
+    except (AttributeError, KeyError):
+        return os.path.join(settings.BASE_DIR, 'debug.log')
+
+
+def log_file_chain(path):
+    """The log file followed by its existing rotated backups, newest first."""
+    paths = [path]
+    while os.path.exists(f'{path}.{len(paths)}'):
+        paths.append(f'{path}.{len(paths)}')
+    return paths
+
+
+# --- Parsing ---
+
+def parse_records(lines):
+    """Groups raw log lines into records: dicts with level, time, module, message and text."""
+    records = []
+    for line in lines:
+        line = line.rstrip('\n')
+        match = RECORD_RE.match(line)
+        if match:
+            records.append({
+                'level': match['level'],
+                'time': datetime.strptime(match['time'], TIME_FORMAT),
+                'module': match['module'],
+                'message': match['message'],
+                'text': line,
+            })
+        elif records:
+            records[-1]['message'] += '\n' + line
+            records[-1]['text'] += '\n' + line
+        elif line:
+            # The tail started in the middle of a record
+            records.append({'level': None, 'time': None, 'module': None, 'message': line, 'text': line})
+    return records
+
+
+# --- Tail ---
+
+def tail_lines(path, count):
+    """Returns the last `count` lines of a file, reading backwards from the end in blocks."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # One extra newline, since the file normally ends with one
+        while position > 0 and data.count(b'\n') <= count:
+            step = min(TAIL_BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.decode('utf-8', errors='replace').splitlines()
+    return lines[-count:]
+
+
+def tail_records(path, count):
+    """The last `count` records of the log, newest first, continuing into the rotated backups."""
+    records = []
+    for log_path in log_file_chain(path):
+        wanted = count - len(records)
+        lines = tail_lines(log_path, wanted)
+        records.extend(reversed(parse_records(lines)))
+        if len(lines) >= wanted:
+            break  # The rest of this file, and the backups, are older
+    return records[:count]
+
+
+# --- Index ---
+
+def _index_path(path):
+    return path + '.idx'
+
+
+def _read_index(path, head):
+    """Returns (bytes indexed, entries) from the sidecar index, or (0, []) if it is missing or stale."""
+    try:
+        with open(_index_path(path), 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return 0, []
+    if len(data) < INDEX_HEADER.size:
+        return 0, []
+    indexed_bytes, indexed_head = INDEX_HEADER.unpack_from(data)
+    if not head.startswith(indexed_head.rstrip(b'\0')):
+        # The log has been rotated; start over
+        return 0, []
+    body = data[INDEX_HEADER.size:]
+    body = body[:len(body) - len(body) % INDEX_ENTRY.size]
+    return indexed_bytes, list(INDEX_ENTRY.iter_unpack(body))
+
+
+def _write_index(path, indexed_bytes, head, entries):
+    tmp_path = _index_path(path) + f'.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(INDEX_HEADER.pack(indexed_bytes, head))
+        f.writelines(INDEX_ENTRY.pack(*entry) for entry in entries)
+    os.replace(tmp_path, _index_path(path))
+
+
+def update_index(path):
+    """Brings the index of a log file up to date and returns (entries, end of the last complete line)."""
+    with open(path, 'rb') as f:
+        head = f.read(INDEX_HEAD_SIZE)
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+
+        indexed_bytes, entries = _read_index(path, head)
+        if indexed_bytes > size:
+            indexed_bytes, entries = 0, []
+        if indexed_bytes == size:
+            return entries, indexed_bytes
+
+        f.seek(indexed_bytes)
+        offset = indexed_bytes
+        for raw_line in f:
+            if not raw_line.endswith(b'\n'):
+                break  # Still being written; picked up next time
+            match = RECORD_RE.match(raw_line.decode('utf-8', errors='replace').rstrip('\n'))
+            if match:
+                timestamp = int(datetime.strptime(match['time'], TIME_FORMAT).timestamp())
+                entries.append((offset, timestamp, LOG_LEVELS.index(match['level'])))
+            offset += len(raw_line)
+
+    _write_index(path, offset, head, entries)
+    return entries, offset
+
+
+def _filter_file(path, min_level, module, start, end, limit):
+    entries, indexed_bytes = update_index(path)
+
+    # Records are written in time order, so the time range is a slice of the index
+    times = [entry[1] for entry in entries]
+    first = bisect.bisect_left(times, int(start.timestamp())) if start else 0
+    last = bisect.bisect_right(times, int(end.timestamp())) if end else len(entries)
+
+    records = []
+    with open(path, 'rb') as f:
+        for position in range(last - 1, first - 1, -1):
+            offset, _, level_number = entries[position]
+            if level_number < min_level:
+                continue
+            next_offset = entries[position + 1][0] if position + 1 < len(entries) else indexed_bytes
+            f.seek(offset)
+            lines = f.read(next_offset - offset).decode('utf-8', errors='replace').splitlines()
+            record = parse_records(lines)[0]
+            if module and record['module'] != module:
+                continue
+            records.append(record)
+            if len(records) >= limit:
+                break
+    # Whether an older file could still hold matching records
+    reached_start = bool(entries) and first > 0
+    return records, reached_start
+
+
+def filter_records(path, level=None, module=None, start=None, end=None, limit=DEFAULT_RECORD_LIMIT):
+    """
+    Returns up to `limit` records, newest first, at or above `level`, from `module` and
+    within [start, end] (naive local datetimes, like the log's own timestamps), from the log
+    and then its rotated backups.
+    """
+    min_level = LOG_LEVELS.index(level) if level else 0
+    records = []
+    for log_path in log_file_chain(path):
+        file_records, reached_start = _filter_file(log_path, min_level, module, start, end, limit - len(records))
+        records.extend(file_records)
+        if len(records) >= limit or reached_start:
+            break
+    return records
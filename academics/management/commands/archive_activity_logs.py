@@ -0,0 +1,62 @@
+# academics/management/commands/archive_activity_logs.py
+import gzip
+import json
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from academics.models import AttendanceSettings
+from accounts.models import UserActivityLog
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = ('Moves user activity log entries older than the retention period (AttendanceSettings) '
+            'into monthly gzipped JSON-lines archives and deletes them from the database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Override the retention period from AttendanceSettings, in days.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report how many entries would be archived.')
+
+    def handle(self, *args, **options):
+        retention_days = options['days'] or AttendanceSettings.load().activity_log_retention_days
+        cutoff = timezone.now() - timedelta(days=retention_days)
+        old_logs = UserActivityLog.objects.filter(timestamp__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f"{old_logs.count()} entries are older than {retention_days} days.")
+            return
+
+        archive_dir = getattr(settings, 'ACTIVITY_LOG_ARCHIVE_DIR', os.path.join(settings.BASE_DIR, 'archives'))
+        os.makedirs(archive_dir, exist_ok=True)
+
+        archived = 0
+        while True:
+            batch = list(old_logs.order_by('pk').values(
+                'pk', 'user_id', 'username', 'action', 'timestamp', 'ip_address', 'user_agent'
+            )[:BATCH_SIZE])
+            if not batch:
+                break
+
+            # One archive file per month; gzip members can simply be appended
+            by_month = {}
+            for row in batch:
+                by_month.setdefault(row['timestamp'].strftime('%Y_%m'), []).append(row)
+            for month, rows in by_month.items():
+                path = os.path.join(archive_dir, f'activity_log_{month}.jsonl.gz')
+                with gzip.open(path, 'at', encoding='utf-8') as archive:
+                    for row in rows:
+                        archive.write(json.dumps(row, default=str) + '\n')
+
+            UserActivityLog.objects.filter(pk__in=[row['pk'] for row in batch]).delete()
+            archived += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} activity log entries older than {retention_days} days to {archive_dir}."
+        ))
@@ -0,0 +1,66 @@
+# academics/management/commands/auto_schedule.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from academics.models import StudentGroup
+from academics.scheduler import DEFAULT_TIME_LIMIT, auto_schedule, synthetic_solver
+
+
+class Command(BaseCommand):
+    help = ('Adds the missing periods to class timetables, meeting each subject\'s required hours without '
+            'double-booking a class or a faculty member. Existing entries are kept.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--group', type=int, action='append', dest='groups',
+                            help='Class group id to schedule (repeatable). Defaults to every class.')
+        parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT,
+                            help='Seconds the solver may search for a complete timetable.')
+        parser.add_argument('--preview', action='store_true', help='Show what would be added without saving it.')
+        parser.add_argument('--benchmark', type=int, metavar='GROUPS',
+                            help='Solve a synthetic institution with this many classes instead (nothing is saved).')
+        parser.add_argument('--periods', type=int, default=5,
+                            help='With --benchmark: weekly periods of each of the 6 subjects of a class '
+                                 '(5 fills 30 of the 35 cells of a week).')
+
+    def handle(self, *args, **options):
+        if options['benchmark']:
+            return self.benchmark(options['benchmark'], options['time_limit'], options['periods'])
+
+        groups = None
+        if options['groups']:
+            groups = list(StudentGroup.objects.filter(pk__in=options['groups']))
+            if len(groups) != len(set(options['groups'])):
+                raise CommandError("One or more class group ids do not exist.")
+
+        result = auto_schedule(groups, time_limit=options['time_limit'], preview=options['preview'])
+        for entry in result['entries']:
+            self.stdout.write(f"  {entry.student_group.name}: {entry.subject.subject.name} "
+                              f"({entry.faculty.get_full_name() or entry.faculty.username}) "
+                              f"{entry.day_of_week} {entry.time_slot}")
+        for item in result['unplaced']:
+            faculty = item['faculty'].get_full_name() if item['faculty'] else 'no faculty available'
+            self.stdout.write(self.style.WARNING(
+                f"  Could not place {item['periods']} period(s) of {item['subject'].subject.name} "
+                f"for {item['group'].name} ({faculty})."))
+
+        verb = 'Would add' if options['preview'] else 'Added'
+        summary = (f"{verb} {len(result['entries'])} timetable entries in {result['seconds']}s "
+                   f"({result['nodes']} search nodes).")
+        if result['complete']:
+            self.stdout.write(self.style.SUCCESS(summary))
+        else:
+            reason = 'the time limit was reached' if result['timed_out'] else 'no complete timetable exists'
+            self.stdout.write(self.style.WARNING(f"{summary} Incomplete: {reason}."))
+
+    def benchmark(self, n_groups, time_limit, periods):
+        solver = synthetic_solver(n_groups=n_groups, periods=periods, n_faculty=max(n_groups * 6 // 5, 1))
+        lessons = sum(periods for _, _, _, periods in solver.tasks)
+        started = time.monotonic()
+        complete = solver.solve(time_limit)
+        elapsed = time.monotonic() - started
+        message = (f"{n_groups} classes, {len(solver.tasks)} subjects, {lessons} periods "
+                   f"({lessons // n_groups} of {solver.n_days * solver.n_slots} cells per class): placed "
+                   f"{len(solver.best)} in {elapsed:.3f}s ({solver.nodes} search nodes, "
+                   f"{solver.restarts} restarts).")
+        self.stdout.write(self.style.SUCCESS(message) if complete else self.style.WARNING(message))
@@ -4,7 +4,6 @@ import logging
 
 from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
-from django.db.models import Q
 from django.template.loader import render_to_string
 
 from academics.email_utils import send_database_email
@@ -33,20 +32,15 @@ class Command(BaseCommand):
 
                 for subject in subjects:
                     # --- Robust Attendance Calculation ---
-                    # This query now counts attendance records linked to either a
-                    # regular timetable class OR an extra class for this specific subject.
+                    # course_subject is set for records of regular timetable classes and
+                    # extra classes alike.
 
                     # Total classes held for this subject that the student was a part of
-                    total_classes = AttendanceRecord.objects.filter(
-                        Q(student=student) &
-                        (Q(timetable__subject=subject) | Q(extra_class__subject=subject))
-                    ).count()
+                    total_classes = AttendanceRecord.objects.filter(student=student, course_subject=subject).count()
 
                     # Classes the student was marked 'Present' for
                     present_classes = AttendanceRecord.objects.filter(
-                        Q(student=student) &
-                        (Q(timetable__subject=subject) | Q(extra_class__subject=subject)) &
-                        Q(status='Present')
+                        student=student, course_subject=subject, status='Present'
                     ).count()
 
                     # --- End of Calculation ---
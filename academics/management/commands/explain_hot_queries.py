@@ -0,0 +1,93 @@
+# academics/management/commands/explain_hot_queries.py
+import json
+import re
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from academics.models import AttendanceRecord, Timetable, DailySubstitution, ClassCancellation, Mark
+from accounts.models import Notification
+
+
+def get_hot_queries():
+    """
+    The query shapes the attendance pages run most, as (name, table that must not be fully
+    scanned, queryset). EXPLAIN does not need matching rows, so placeholder ids are fine.
+    """
+    today = date.today()
+    month_start = today.replace(day=1)
+    return [
+        ('attendance for a class on a day', 'academics_attendancerecord',
+         AttendanceRecord.objects.filter(timetable_id=1, date=today)),
+        ('attendance for a class group and subject on a day', 'academics_attendancerecord',
+         AttendanceRecord.objects.filter(student_group_id=1, course_subject_id=1, date=today)),
+        ("a student's attendance in a subject", 'academics_attendancerecord',
+         AttendanceRecord.objects.filter(student_id=1, course_subject_id=1, status='Present')),
+        ('attendance marked by a faculty member on a day', 'academics_attendancerecord',
+         AttendanceRecord.objects.filter(marked_by_id=1, date=today)),
+        ('attendance by status on a day', 'academics_attendancerecord',
+         AttendanceRecord.objects.filter(date=today, status='Present')),
+        ('late comers for a month', 'academics_attendancerecord',
+         AttendanceRecord.objects.filter(is_late=True, date__range=(month_start, month_start + timedelta(days=30)))),
+        ("a faculty member's classes for a day", 'academics_timetable',
+         Timetable.objects.filter(day_of_week='Monday', faculty_id=1)),
+        ("a class's timetable for a day", 'academics_timetable',
+         Timetable.objects.filter(student_group_id=1, day_of_week='Monday')),
+        ('substitutions for a day', 'academics_dailysubstitution',
+         DailySubstitution.objects.filter(date=today)),
+        ("a substitute's classes for a day", 'academics_dailysubstitution',
+         DailySubstitution.objects.filter(substituted_by_id=1, date=today)),
+        ('recent cancellations', 'academics_classcancellation',
+         ClassCancellation.objects.filter(date__lte=today).order_by('-date')[:5]),
+        ("a subject's marks for a set of students", 'academics_mark',
+         Mark.objects.filter(subject_id=1, student_id__in=[1, 2, 3])),
+        ("a user's unread notifications", 'accounts_notification',
+         Notification.objects.filter(recipient_id=1, is_read=False).order_by('-timestamp')[:5]),
+    ]
+
+
+def find_full_scans(plan, table):
+    """Returns True if the EXPLAIN output reads every row of `table`."""
+    vendor = connection.vendor
+    if vendor == 'mysql':
+        def walk(node):
+            if isinstance(node, dict):
+                if node.get('table_name') == table and node.get('access_type') == 'ALL':
+                    return True
+                return any(walk(value) for value in node.values())
+            if isinstance(node, list):
+                return any(walk(value) for value in node)
+            return False
+        return walk(json.loads(plan))
+    if vendor == 'postgresql':
+        return re.search(rf'Seq Scan on {table}\b', plan) is not None
+    # SQLite: 'SCAN <table>' without an index is a full table scan
+    return re.search(rf'\bSCAN {table}\b(?! USING)', plan) is not None
+
+
+class Command(BaseCommand):
+    help = ('Runs EXPLAIN for the hot attendance queries and fails if any of them reads its '
+            'main table with a full scan.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='Print every query plan.')
+
+    def handle(self, *args, **options):
+        explain_options = {'format': 'JSON'} if connection.vendor == 'mysql' else {}
+        regressions = []
+        for name, table, queryset in get_hot_queries():
+            plan = queryset.explain(**explain_options)
+            full_scan = find_full_scans(plan, table)
+            if full_scan:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {name} ({table})"))
+            else:
+                self.stdout.write(f"ok         {name}")
+            if options['verbose_plans'] or full_scan:
+                self.stdout.write(plan)
+
+        if regressions:
+            raise CommandError(f"{len(regressions)} hot queries fall back to a full table scan: "
+                               + ', '.join(regressions))
+        self.stdout.write(self.style.SUCCESS("All hot queries use an index."))
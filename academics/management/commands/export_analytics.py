@@ -0,0 +1,22 @@
+# academics/management/commands/export_analytics.py
+from django.core.management.base import BaseCommand
+
+from academics.analytics_export import export_analytics, get_export_dir
+
+
+class Command(BaseCommand):
+    help = ('Exports attendance, marks, students, subjects and the timetable as partitioned Parquet '
+            'files for offline analysis. Only new or changed attendance months are rewritten.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Rewrite every attendance partition (also drops deleted records).')
+        parser.add_argument('--output', help='Export directory (defaults to settings.ANALYTICS_EXPORT_DIR).')
+
+    def handle(self, *args, **options):
+        export_dir = options['output'] or get_export_dir()
+        summary = export_analytics(full=options['full'], export_dir=export_dir)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {summary['attendance_rows']} attendance records in {summary['attendance_partitions']} "
+            f"partitions and {summary['marks_rows']} marks to {export_dir}."
+        ))
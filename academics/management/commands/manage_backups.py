@@ -37,6 +37,7 @@ class Command(BaseCommand):
             Criterion,
             MarkingScheme,
             UserNotificationStatus,
+            AnnouncementWatermark,
             Announcement,
             DailySubstitution,
             ClassCancellation,
@@ -88,6 +89,7 @@ class Command(BaseCommand):
             DailySubstitution,
             Announcement,
             UserNotificationStatus,
+            AnnouncementWatermark,
             MarkingScheme,
             Criterion,
             Mark,
@@ -150,6 +152,7 @@ class Command(BaseCommand):
             'academics.dailysubstitution',
             'academics.announcement',
             'academics.usernotificationstatus',
+            'academics.announcementwatermark',
             'academics.markingscheme',
             'academics.criterion',
             'academics.mark',
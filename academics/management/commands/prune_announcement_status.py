@@ -0,0 +1,55 @@
+# academics/management/commands/prune_announcement_status.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from academics.live_updates import sync_announcement_audiences
+from academics.models import Announcement, AnnouncementWatermark, UserNotificationStatus
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the announcement audience index and folds the per-announcement seen rows '
+            '(UserNotificationStatus) into per-user watermarks, then deletes those rows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-status', action='store_true',
+                            help='Create the watermarks but leave the old UserNotificationStatus rows in the '
+                                 'database as they are (they are not archived anywhere).')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Rebuilding the announcement audience index...")
+        for announcement in Announcement.objects.iterator(chunk_size=500):
+            sync_announcement_audiences(announcement)
+
+        self.stdout.write("Converting seen announcements into watermarks...")
+        last_seen = UserNotificationStatus.objects.values('user_id').annotate(
+            last_seen_id=Max('announcement_id')
+        ).order_by()
+
+        with transaction.atomic():
+            existing = dict(AnnouncementWatermark.objects.values_list('user_id', 'last_seen_announcement_id'))
+            new_watermarks, moved_watermarks = [], []
+            for row in last_seen:
+                current = existing.get(row['user_id'])
+                if current is None:
+                    new_watermarks.append(AnnouncementWatermark(
+                        user_id=row['user_id'], last_seen_announcement_id=row['last_seen_id']))
+                elif current < row['last_seen_id']:
+                    moved_watermarks.append(AnnouncementWatermark(
+                        user_id=row['user_id'], last_seen_announcement_id=row['last_seen_id']))
+
+            AnnouncementWatermark.objects.bulk_create(new_watermarks, batch_size=500)
+            for watermark in moved_watermarks:
+                AnnouncementWatermark.objects.filter(user_id=watermark.user_id).update(
+                    last_seen_announcement_id=watermark.last_seen_announcement_id)
+
+            if options['keep_status']:
+                outcome = f"kept {UserNotificationStatus.objects.count()} status rows"
+            else:
+                deleted, _ = UserNotificationStatus.objects.all().delete()
+                outcome = f"deleted {deleted} status rows"
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(new_watermarks)} and advanced {len(moved_watermarks)} watermarks; {outcome}."
+        ))
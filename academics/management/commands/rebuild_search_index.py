@@ -0,0 +1,14 @@
+# academics/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand
+
+from academics.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the global search index from all students, faculty, subjects and classes.'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write("Rebuilding the search index...")
+        document_count = rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt with {document_count} documents."))
@@ -0,0 +1,33 @@
+# academics/management/commands/rollup_attendance.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from academics.models import AttendanceRecord
+from academics.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the daily attendance rollups used by the heatmap and trend charts. Run nightly; '
+            'by default it recomputes the last 7 days so late edits are picked up.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Number of days back from today to rebuild.')
+        parser.add_argument('--since', help='Rebuild from this date (YYYY-MM-DD) up to today instead.')
+        parser.add_argument('--all', action='store_true', help='Rebuild from the first attendance record.')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['all']:
+            start = AttendanceRecord.objects.order_by('date').values_list('date', flat=True).first() or today
+        elif options['since']:
+            start = parse_date(options['since'])
+            if not start:
+                raise CommandError("--since must be a date in YYYY-MM-DD format.")
+        else:
+            start = today - timedelta(days=options['days'] - 1)
+
+        rows = rebuild_rollups(start, today)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} attendance rollups from {start} to {today}."))
@@ -0,0 +1,286 @@
+# In academics/marks_utils.py
+import csv
+import io
+import os
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import OuterRef, Subquery, F
+from openpyxl import load_workbook
+
+from accounts.models import Profile
+from .cache_versions import bump_scope_versions
+from .models import CourseSubject, Criterion, Mark, Timetable
+
+MARKS_IMPORT_HEADERS = ['student_username', 'subject_code', 'criterion_name', 'marks_obtained']
+
+GROUP_SUBJECT_MAP_CACHE_KEY = 'marks_entry_group_subject_map_{faculty_id}'
+GROUP_SUBJECT_MAP_CACHE_TIMEOUT = 60 * 60  # 1 hour; also cleared whenever the timetable changes
+
+
+def upsert_marks(marks, batch_size=500):
+    """
+    Inserts or updates a list of unsaved Mark objects in as few statements as possible.
+    Existing rows (same student, subject and criterion) get their marks_obtained overwritten.
+    """
+    if not marks:
+        return 0
+
+    # MySQL upserts on any unique key and refuses an explicit conflict target,
+    # while SQLite/PostgreSQL require one.
+    unique_fields = None
+    if connection.features.supports_update_conflicts_with_target:
+        unique_fields = ['student', 'subject', 'criterion']
+
+    Mark.objects.bulk_create(
+        marks,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=['marks_obtained'],
+    )
+
+    # bulk_create sends no signals; bump what the Mark post_save handler would have
+    student_ids = {mark.student_id for mark in marks}
+    group_ids = Profile.objects.filter(user_id__in=student_ids, student_group__isnull=False).values_list(
+        'student_group_id', flat=True).distinct()
+    bump_scope_versions(*[('student', student_id) for student_id in student_ids],
+                        *[('group', group_id) for group_id in group_ids])
+    return len(marks)
+
+
+def _clean_cell(value):
+    if value is None:
+        return ''
+    return str(value).strip()
+
+
+def _iter_csv_rows(uploaded_file):
+    # Wrap the underlying binary file so rows are decoded lazily instead of
+    # reading the whole upload into memory first. 'utf-8-sig' drops Excel's BOM.
+    text_stream = io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', newline='')
+    try:
+        for row in csv.DictReader(text_stream):
+            yield {key: _clean_cell(value) for key, value in row.items() if key}
+    finally:
+        # Detach so closing the wrapper doesn't close Django's upload handle.
+        text_stream.detach()
+
+
+def _iter_xlsx_rows(uploaded_file):
+    workbook = load_workbook(uploaded_file.file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [_clean_cell(cell) for cell in next(rows, [])]
+        for values in rows:
+            if values is None or all(cell is None for cell in values):
+                continue  # Skip blank lines, which are common at the end of sheets
+            yield {header: _clean_cell(cell) for header, cell in zip(headers, values) if header}
+    finally:
+        workbook.close()
+
+
+def iter_marks_file_rows(uploaded_file):
+    """
+    Streams the rows of an uploaded marks file (CSV or XLSX) as dictionaries keyed by header.
+    """
+    extension = os.path.splitext(uploaded_file.name)[1].lower()
+    if extension == '.xlsx':
+        return _iter_xlsx_rows(uploaded_file)
+    return _iter_csv_rows(uploaded_file)
+
+
+def import_marks_file(uploaded_file):
+    """
+    Validates and imports every row of a marks file in one go.
+
+    Students, subjects and criteria are resolved with one query each. A subject code is
+    resolved against the course of the student's class, and a criterion name against that
+    course's marking scheme, so the same code or criterion name in another course is never
+    picked up by mistake.
+
+    Returns a tuple (imported_count, error_list). Nothing is written if any row has an error.
+    """
+    try:
+        rows = list(enumerate(iter_marks_file_rows(uploaded_file), 2))
+    except (UnicodeDecodeError, csv.Error, ValueError, KeyError, OSError) as e:
+        return 0, [f"Could not read the uploaded file: {e}"]
+
+    if not rows:
+        return 0, ["The uploaded file does not contain any rows."]
+
+    missing_headers = [h for h in MARKS_IMPORT_HEADERS if h not in rows[0][1]]
+    if missing_headers:
+        return 0, [f"Missing required column(s): {', '.join(missing_headers)}."]
+
+    # Short rows (e.g. trailing empty cells in a spreadsheet) simply have blank values.
+    rows = [(row_num, {h: row.get(h, '') for h in MARKS_IMPORT_HEADERS}) for row_num, row in rows]
+
+    usernames = {row['student_username'] for _, row in rows}
+    subject_codes = {row['subject_code'] for _, row in rows}
+    criterion_names = {row['criterion_name'] for _, row in rows}
+
+    # --- 1. Students, together with the course their class belongs to ---
+    students = {
+        s['username']: s for s in User.objects.filter(
+            username__in=usernames, profile__role='student'
+        ).values('id', 'username', 'profile__student_group__course_id')
+    }
+
+    # --- 2. Course subjects, keyed by (course, subject code) ---
+    course_subjects = {
+        (cs['course_id'], cs['subject__code']): cs for cs in CourseSubject.objects.filter(
+            subject__code__in=subject_codes
+        ).values('id', 'course_id', 'subject__code', 'course__marking_scheme_id')
+    }
+
+    # --- 3. Criteria, keyed by (scheme, criterion name) ---
+    scheme_ids = {cs['course__marking_scheme_id'] for cs in course_subjects.values()} - {None}
+    criteria = {
+        (c['scheme_id'], c['name']): c for c in Criterion.objects.filter(
+            scheme_id__in=scheme_ids, name__in=criterion_names
+        ).values('id', 'scheme_id', 'name', 'max_marks')
+    }
+
+    marks_to_save = {}
+    error_list = []
+    for row_num, row in rows:
+        username = row['student_username']
+        subject_code = row['subject_code']
+        criterion_name = row['criterion_name']
+
+        student = students.get(username)
+        if not student:
+            error_list.append(f"Row {row_num}: Student '{username}' not found.")
+            continue
+
+        course_id = student['profile__student_group__course_id']
+        if not course_id:
+            error_list.append(f"Row {row_num}: Student '{username}' is not assigned to a class.")
+            continue
+
+        course_subject = course_subjects.get((course_id, subject_code))
+        if not course_subject:
+            error_list.append(f"Row {row_num}: Subject with code '{subject_code}' is not part of "
+                              f"{username}'s course.")
+            continue
+
+        criterion = criteria.get((course_subject['course__marking_scheme_id'], criterion_name))
+        if not criterion:
+            error_list.append(f"Row {row_num}: Criterion '{criterion_name}' not found in the marking scheme "
+                              f"for subject '{subject_code}'.")
+            continue
+
+        try:
+            marks = Decimal(row['marks_obtained'])
+        except InvalidOperation:
+            marks = None
+        if marks is None or not marks.is_finite():
+            error_list.append(f"Row {row_num}: '{row['marks_obtained']}' is not a valid mark.")
+            continue
+
+        if marks < 0 or marks > criterion['max_marks']:
+            error_list.append(f"Row {row_num}: Marks must be between 0 and {criterion['max_marks']} "
+                              f"for '{criterion_name}'.")
+            continue
+
+        key = (student['id'], course_subject['id'], criterion['id'])
+        if key in marks_to_save:
+            error_list.append(f"Row {row_num}: Duplicate entry for '{username}', '{subject_code}', "
+                              f"'{criterion_name}'.")
+            continue
+
+        marks_to_save[key] = Mark(
+            student_id=student['id'], subject_id=course_subject['id'],
+            criterion_id=criterion['id'], marks_obtained=marks
+        )
+
+    if error_list:
+        return 0, error_list
+
+    with transaction.atomic():
+        imported_count = upsert_marks(list(marks_to_save.values()))
+    return imported_count, []
+
+
+def get_faculty_group_subject_map(faculty):
+    """
+    Returns {group_id: [{'id': course_subject_id, 'name': subject_name}, ...]} for every class the
+    faculty teaches, limited to the subjects of that class's current (latest) semester.
+
+    Built with a single query and cached per faculty member.
+    """
+    cache_key = GROUP_SUBJECT_MAP_CACHE_KEY.format(faculty_id=faculty.pk)
+    group_subject_map = cache.get(cache_key)
+    if group_subject_map is not None:
+        return group_subject_map
+
+    latest_semester = CourseSubject.objects.filter(
+        course=OuterRef('student_group__course')
+    ).order_by('-semester').values('semester')[:1]
+
+    taught_subjects = Timetable.objects.filter(faculty=faculty).annotate(
+        latest_semester=Subquery(latest_semester)
+    ).filter(
+        subject__semester=F('latest_semester')
+    ).values(
+        'student_group_id', 'subject_id', 'subject__subject__name'
+    ).distinct().order_by('student_group_id', 'subject__subject__name')
+
+    group_subject_map = {}
+    for row in taught_subjects:
+        group_subject_map.setdefault(row['student_group_id'], []).append(
+            {'id': row['subject_id'], 'name': row['subject__subject__name']}
+        )
+
+    cache.set(cache_key, group_subject_map, GROUP_SUBJECT_MAP_CACHE_TIMEOUT)
+    return group_subject_map
+
+
+def invalidate_faculty_group_subject_map(faculty_id):
+    cache.delete(GROUP_SUBJECT_MAP_CACHE_KEY.format(faculty_id=faculty_id))
+
+
+def save_marks_grid(post_data, student_ids, course_subject, criteria, existing_marks):
+    """
+    Saves a students x criteria grid of marks posted from the marks entry form.
+
+    Only cells whose value differs from what is already stored are written, all of them in
+    one upsert. Cells left blank are ignored. `existing_marks` is the
+    {student_id: {criterion_id: marks}} map the form was rendered from.
+
+    Returns a tuple (saved_count, error_list). Nothing is written if any cell is invalid.
+    """
+    changed_marks = []
+    error_list = []
+    for student_id in student_ids:
+        saved_for_student = existing_marks.get(student_id, {})
+        for criterion in criteria:
+            marks_val = (post_data.get(f'marks-{student_id}-{criterion.id}') or '').strip()
+            if not marks_val:
+                continue
+
+            try:
+                marks = Decimal(marks_val)
+            except InvalidOperation:
+                marks = None
+            if marks is None or not marks.is_finite() or marks < 0 or marks > criterion.max_marks:
+                error_list.append(f"'{marks_val}' is not a valid mark for {criterion.name} "
+                                  f"(0 - {criterion.max_marks}).")
+                continue
+
+            if saved_for_student.get(criterion.id) == marks:
+                continue  # Unchanged cell, nothing to write
+
+            changed_marks.append(Mark(
+                student_id=student_id, subject=course_subject, criterion=criterion, marks_obtained=marks
+            ))
+
+    if error_list:
+        return 0, error_list
+
+    with transaction.atomic():
+        saved_count = upsert_marks(changed_marks)
+    return saved_count, []
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Composite indexes for the hot attendance and timetable lookups.
+
+    Only fields already known to the migration history are indexed here; the remaining
+    indexes declared on the models (extra classes, late marks, marks, substitutions,
+    cancellations and notifications) are generated together with those models' migrations.
+    """
+
+    dependencies = [
+        ('academics', '0003_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timetable',
+            index=models.Index(fields=['day_of_week', 'faculty'], name='timetable_day_faculty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='timetable',
+            index=models.Index(fields=['student_group', 'day_of_week'], name='timetable_group_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['timetable', 'date'], name='attendance_timetable_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['marked_by', 'date'], name='attendance_markedby_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+        ),
+    ]
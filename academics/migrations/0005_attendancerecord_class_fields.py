@@ -0,0 +1,65 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 5000
+
+
+def backfill_class_fields(apps, schema_editor):
+    """
+    Copies the class group and subject onto existing attendance records from their timetable
+    entry or extra class. Plain SQL with correlated subqueries (valid on MySQL, PostgreSQL and
+    SQLite), run in id ranges to keep each UPDATE short on large tables.
+    """
+    connection = schema_editor.connection
+    tables = connection.introspection.table_names()
+    sources = [('timetable_id', 'academics_timetable', 'student_group_id')]
+    if 'academics_extraclass' in tables:
+        sources.append(('extra_class_id', 'academics_extraclass', 'class_group_id'))
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT MIN(id), MAX(id) FROM academics_attendancerecord')
+        min_id, max_id = cursor.fetchone()
+        if min_id is None:
+            return
+        for column, source_table, group_column in sources:
+            for start in range(min_id, max_id + 1, BATCH_SIZE):
+                cursor.execute(
+                    f'UPDATE academics_attendancerecord SET '
+                    f'student_group_id = (SELECT s.{group_column} FROM {source_table} s '
+                    f'WHERE s.id = academics_attendancerecord.{column}), '
+                    f'course_subject_id = (SELECT s.subject_id FROM {source_table} s '
+                    f'WHERE s.id = academics_attendancerecord.{column}) '
+                    f'WHERE {column} IS NOT NULL AND id >= %s AND id < %s',
+                    [start, start + BATCH_SIZE]
+                )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0004_attendance_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='student_group',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='attendance_records', to='academics.studentgroup'),
+        ),
+        migrations.AddField(
+            model_name='attendancerecord',
+            name='course_subject',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='attendance_records', to='academics.coursesubject'),
+        ),
+        migrations.RunPython(backfill_class_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student_group', 'course_subject', 'date'], name='attendance_group_subject_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendancerecord',
+            index=models.Index(fields=['student', 'course_subject', 'status'], name='attendance_student_subject_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0005_attendancerecord_class_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('held', models.PositiveIntegerField(default=0)),
+                ('present', models.PositiveIntegerField(default=0)),
+                ('late', models.PositiveIntegerField(default=0)),
+                ('absent', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course_subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                     related_name='attendance_rollups', to='academics.coursesubject')),
+                ('student_group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE,
+                                                    related_name='attendance_rollups', to='academics.studentgroup')),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['student_group', 'date'], name='rollup_group_date_idx'),
+                    models.Index(fields=['course_subject', 'date'], name='rollup_subject_date_idx'),
+                ],
+                'constraints': [
+                    models.UniqueConstraint(fields=('date', 'student_group', 'course_subject'),
+                                            name='unique_attendance_rollup'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('academics', '0006_attendancedailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='attendancesettings',
+            name='activity_log_retention_days',
+            field=models.PositiveIntegerField(
+                default=90, help_text='User activity log entries older than this many days are moved to the archive.'),
+        ),
+    ]
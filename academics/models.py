@@ -3,6 +3,7 @@ from django.contrib.auth.models import Group, User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from django.db.models import Q
+from django.urls import reverse
 
 from academics.thread_local import get_current_session
 
@@ -198,6 +199,12 @@ class Timetable(models.Model):
         ]
         # Prevent double booking a teacher or a class group at the same time
         unique_together = (('day_of_week', 'time_slot', 'faculty'), ('day_of_week', 'time_slot', 'student_group'))
+        indexes = [
+            # A faculty member's classes for a day (schedule, dashboard, free-faculty lookups)
+            models.Index(fields=['day_of_week', 'faculty'], name='timetable_day_faculty_idx'),
+            # A class's timetable, usually for one day
+            models.Index(fields=['student_group', 'day_of_week'], name='timetable_group_day_idx'),
+        ]
 
     def __str__(self):
         return f"{self.student_group} | {self.subject.subject.name} | {self.day_of_week} at {self.time_slot}"
@@ -229,6 +236,10 @@ class AttendanceSettings(models.Model):
         default=3600,  # Default to 1 hour
         help_text="The number of seconds of inactivity before a user is automatically logged out."
     )
+    activity_log_retention_days = models.PositiveIntegerField(
+        default=90,
+        help_text="User activity log entries older than this many days are moved to the archive."
+    )
 
     email_host = models.CharField(max_length=255, blank=True, null=True, help_text="e.g., 'smtp.gmail.com'")
     email_port = models.PositiveIntegerField(default=587, help_text="e.g., 587 for TLS")
@@ -298,6 +309,25 @@ class AttendanceRecord(models.Model):
         limit_choices_to={'profile__role__in': ['faculty', 'admin']}
     )
 
+    # --- Denormalized from the timetable entry or extra class (see save()) ---
+    # Lets attendance be filtered by class and subject without joining, and OR-ing, both paths.
+    student_group = models.ForeignKey(
+        'StudentGroup',
+        on_delete=models.CASCADE,
+        related_name='attendance_records',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    course_subject = models.ForeignKey(
+        'CourseSubject',
+        on_delete=models.CASCADE,
+        related_name='attendance_records',
+        null=True,
+        blank=True,
+        editable=False
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -321,12 +351,83 @@ class AttendanceRecord(models.Model):
             models.UniqueConstraint(fields=['student', 'extra_class', 'date'], name='unique_student_extraclass_date',
                                     condition=Q(extra_class__isnull=False)),
         ]
+        # The unique constraints above lead with the student; these serve the per-class lookups
+        indexes = [
+            models.Index(fields=['timetable', 'date'], name='attendance_timetable_date_idx'),
+            models.Index(fields=['extra_class', 'date'], name='attendance_extraclass_date_idx'),
+            models.Index(fields=['marked_by', 'date'], name='attendance_markedby_date_idx'),
+            models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+            models.Index(fields=['is_late', 'date'], name='attendance_late_date_idx'),
+            # Per-subject stats: classes held for a class group, and a student's own records
+            models.Index(fields=['student_group', 'course_subject', 'date'], name='attendance_group_subject_idx'),
+            models.Index(fields=['student', 'course_subject', 'status'], name='attendance_student_subject_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The class the stored group and subject were copied from, so saving the record again
+        # does not have to load it (see fill_class_fields)
+        instance._class_source = (instance.__dict__.get('timetable_id'), instance.__dict__.get('extra_class_id'))
+        return instance
+
+    def fill_class_fields(self):
+        """
+        Copies the class group and subject from the timetable entry or extra class. Skipped
+        (saving a query) when the record still points at the class they were copied from.
+        """
+        source = (self.timetable_id, self.extra_class_id)
+        if getattr(self, '_class_source', None) == source and self.student_group_id and self.course_subject_id:
+            return
+        if self.timetable_id:
+            self.student_group_id = self.timetable.student_group_id
+            self.course_subject_id = self.timetable.subject_id
+        elif self.extra_class_id:
+            self.student_group_id = self.extra_class.class_group_id
+            self.course_subject_id = self.extra_class.subject_id
+        self._class_source = source
+
+    def save(self, *args, **kwargs):
+        self.fill_class_fields()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'student_group', 'course_subject'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         session_type = "Timetable" if self.timetable else "Extra Class"
         return f"{self.student.username} on {self.date} ({session_type}) - {self.status}"
 
 
+class AttendanceDailyRollup(models.Model):
+    """
+    Attendance totals for one class group and subject on one day, maintained from the
+    attendance records (see academics.rollups) so that long-range charts never scan them.
+    `held` counts classes; `present`, `late` and `absent` count students, with late
+    arrivals included in `present`.
+    """
+    date = models.DateField()
+    student_group = models.ForeignKey(StudentGroup, on_delete=models.CASCADE, related_name='attendance_rollups')
+    course_subject = models.ForeignKey(CourseSubject, on_delete=models.CASCADE, related_name='attendance_rollups')
+    held = models.PositiveIntegerField(default=0)
+    present = models.PositiveIntegerField(default=0)
+    late = models.PositiveIntegerField(default=0)
+    absent = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'student_group', 'course_subject'],
+                                    name='unique_attendance_rollup'),
+        ]
+        indexes = [
+            models.Index(fields=['student_group', 'date'], name='rollup_group_date_idx'),
+            models.Index(fields=['course_subject', 'date'], name='rollup_subject_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student_group} / {self.course_subject} on {self.date}"
+
+
 class ClassCancellation(models.Model):
     """
     A record to indicate that a scheduled class was not conducted on a specific day.
@@ -338,6 +439,9 @@ class ClassCancellation(models.Model):
     class Meta:
         # A class can only be cancelled once per day
         unique_together = ('timetable', 'date')
+        indexes = [
+            models.Index(fields=['date'], name='cancellation_date_idx'),
+        ]
 
     def __str__(self):
         return f"Cancelled: {self.timetable} on {self.date}"
@@ -355,6 +459,10 @@ class DailySubstitution(models.Model):
     class Meta:
         # A specific class period on a specific day can only have one substitute.
         unique_together = ('timetable', 'date')
+        indexes = [
+            # All substitutions for a day, or one substitute's classes for a day
+            models.Index(fields=['date', 'substituted_by'], name='substitution_date_faculty_idx'),
+        ]
 
     def __str__(self):
         return f"{self.timetable} on {self.date} substituted by {self.substituted_by.get_full_name()}"
@@ -394,6 +502,40 @@ class UserNotificationStatus(models.Model):
         unique_together = ('user', 'announcement')
 
 
+# AnnouncementAudience and AnnouncementWatermark have no migration in the repository yet: they
+# depend on Announcement, whose migration is not committed either. Generate them together with
+# Announcement's (makemigrations academics) before deploying.
+
+class AnnouncementAudience(models.Model):
+    """
+    Index of who an announcement was sent to, one row per audience: 'all_students',
+    'all_faculty' or 'group:<id>'. Kept in sync with Announcement by signals so the
+    newest announcement for a user is a range scan on (audience_key, announcement).
+    """
+    audience_key = models.CharField(max_length=50)
+    announcement = models.ForeignKey(Announcement, on_delete=models.CASCADE, related_name='audiences')
+
+    class Meta:
+        unique_together = ('audience_key', 'announcement')
+
+    def __str__(self):
+        return f"{self.audience_key}: {self.announcement_id}"
+
+
+class AnnouncementWatermark(models.Model):
+    """
+    The newest announcement a user has been shown. Everything at or below it counts as seen,
+    which replaces one UserNotificationStatus row per user and announcement.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                related_name='announcement_watermark')
+    last_seen_announcement_id = models.PositiveBigIntegerField(default=0)
+    last_seen_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user} saw up to announcement {self.last_seen_announcement_id}"
+
+
 class MarkingScheme(models.Model):
     """
     A scheme designed by the admin, containing various criteria for evaluation.
@@ -438,6 +580,10 @@ class Mark(models.Model):
     class Meta:
         unique_together = ('student', 'subject', 'criterion')
         ordering = ['subject', 'criterion']
+        indexes = [
+            # Marks grids and results read a subject's marks for a set of students
+            models.Index(fields=['subject', 'student'], name='mark_subject_student_idx'),
+        ]
         permissions = [
             ("view_own_marks", "Can view own marks"),
         ]
@@ -530,3 +676,49 @@ class StudentSubjectStatus(models.Model):
 
     def __str__(self):
         return f"{self.student.username} - {self.subject.subject.name} (Sem {self.semester}): {self.get_status_display()}"
+
+
+class SearchDocument(models.Model):
+    """
+    A denormalized, searchable copy of a student, faculty member, subject or class,
+    kept up to date by signals (see academics/search.py). The global search queries this
+    table instead of joining users, profiles and subjects on every keystroke.
+    """
+    DOC_TYPE_CHOICES = [
+        ('student', 'Student'),
+        ('faculty', 'Faculty'),
+        ('subject', 'Subject'),
+        ('group', 'Class'),
+    ]
+
+    doc_type = models.CharField(max_length=10, choices=DOC_TYPE_CHOICES)
+    object_id = models.PositiveIntegerField()
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    # Everything the document can be found by, lowercased. Covered by a FULLTEXT index on MySQL.
+    body = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('doc_type', 'object_id')
+        ordering = ['title']
+
+    def __str__(self):
+        return f"{self.get_doc_type_display()}: {self.title}"
+
+    def get_absolute_url(self):
+        if self.doc_type == 'student':
+            return reverse('academics:admin_student_attendance_detail', args=[self.object_id])
+        return None
+
+
+class SearchTrigram(models.Model):
+    """
+    Trigram index of SearchDocument.body, used for searching on databases without
+    a FULLTEXT index (e.g. SQLite in development and tests).
+    """
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='trigrams')
+    trigram = models.CharField(max_length=3, db_index=True)
+
+    class Meta:
+        unique_together = ('document', 'trigram')
@@ -0,0 +1,157 @@
+# In academics/navigation.py
+import hashlib
+
+from django.core.cache import cache
+
+from academics.registry import (
+    REGISTERED_NAV_ITEMS,
+    NAVIGATION_GROUPS,
+    SUBGROUP_DEFINITIONS,
+    SUBGROUP_MAPPING
+)
+
+NAV_TREE_CACHE_KEY = 'sidebar_nav_tree_{version}_{role}_{permissions_hash}'
+NAV_TREE_CACHE_TIMEOUT = 60 * 60 * 24
+NAV_VERSION_CACHE_KEY = 'sidebar_nav_version'
+
+_compiled_registry = None
+
+
+def _order(entry):
+    return entry.get('order', 99)
+
+
+def get_compiled_registry():
+    """
+    Returns the nav registry compiled into lookup-friendly form: the items sorted and bucketed
+    by group and subgroup, plus every permission the sidebar can ask about.
+
+    Built once per process, on first use, after all views have registered their items.
+    """
+    global _compiled_registry
+    if _compiled_registry is None or _compiled_registry['item_count'] != len(REGISTERED_NAV_ITEMS):
+        ungrouped = []
+        groups = {}
+        for item in sorted(REGISTERED_NAV_ITEMS, key=_order):
+            group_id = item.get('group')
+            if not group_id:
+                ungrouped.append(item)
+                continue
+            bucket = groups.setdefault(group_id, {'direct_items': [], 'subgroups': {}})
+            subgroup_id = SUBGROUP_MAPPING.get(item['url_name'])
+            if subgroup_id:
+                bucket['subgroups'].setdefault(subgroup_id, []).append(item)
+            else:
+                bucket['direct_items'].append(item)
+
+        _compiled_registry = {
+            'item_count': len(REGISTERED_NAV_ITEMS),
+            'ungrouped': ungrouped,
+            'groups': groups,
+            'permissions': frozenset(item['permission'] for item in REGISTERED_NAV_ITEMS if item.get('permission')),
+        }
+    return _compiled_registry
+
+
+def _is_visible(item, permissions, role):
+    if item.get('permission') and item['permission'] not in permissions:
+        return False
+    if item.get('role_required') and item['role_required'] != role:
+        return False
+    return True
+
+
+def build_nav_tree(permissions, role):
+    """
+    Builds the sidebar for a set of granted (nav-relevant) permissions and a role.
+    The result does not depend on the current page, so it can be cached and shared.
+    """
+    registry = get_compiled_registry()
+
+    nav_tree = [dict(item) for item in registry['ungrouped'] if _is_visible(item, permissions, role)]
+
+    for group_def in NAVIGATION_GROUPS:
+        group_id = group_def['id']
+        if group_def.get('role_required') and group_def['role_required'] != role:
+            continue
+
+        group_content = registry['groups'].get(group_id)
+        if not group_content:
+            continue
+
+        direct_items = [dict(item) for item in group_content['direct_items'] if _is_visible(item, permissions, role)]
+        subgroups = []
+        for subgroup_id, items in group_content['subgroups'].items():
+            visible_items = [dict(item) for item in items if _is_visible(item, permissions, role)]
+            if not visible_items:
+                continue
+            subgroup_def = SUBGROUP_DEFINITIONS.get(subgroup_id, {})
+            subgroups.append({
+                'id': f"subgroup-{group_id}-{subgroup_id}",
+                'title': subgroup_def.get('title', 'Subgroup'),
+                'order': subgroup_def.get('order', 99),
+                'items': visible_items,
+                'url_names': [item['url_name'] for item in visible_items],
+            })
+        if not direct_items and not subgroups:
+            continue
+        subgroups.sort(key=lambda x: x['order'])
+
+        group_copy = group_def.copy()
+        group_copy['submenu_content'] = {
+            'direct_items': direct_items,
+            'subgroups': subgroups,
+        }
+        group_copy['url_names'] = [item['url_name'] for item in direct_items] + [
+            url_name for subgroup in subgroups for url_name in subgroup['url_names']]
+        nav_tree.append(group_copy)
+
+    nav_tree.sort(key=lambda x: x.get('order', 0))
+    return nav_tree
+
+
+def get_nav_version():
+    return cache.get_or_set(NAV_VERSION_CACHE_KEY, 1, None)
+
+
+def invalidate_nav_cache():
+    """Drops every cached sidebar, e.g. after group permissions have been edited."""
+    try:
+        cache.incr(NAV_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(NAV_VERSION_CACHE_KEY, 1, None)
+
+
+def get_user_nav_tree(user, role):
+    """Returns the cached sidebar tree for the user's nav-relevant permissions and role."""
+    registry = get_compiled_registry()
+    if user.is_superuser:
+        permissions = registry['permissions']
+    else:
+        permissions = registry['permissions'] & user.get_all_permissions()
+
+    permissions_hash = hashlib.md5(','.join(sorted(permissions)).encode()).hexdigest()
+    cache_key = NAV_TREE_CACHE_KEY.format(version=get_nav_version(), role=role, permissions_hash=permissions_hash)
+    nav_tree = cache.get(cache_key)
+    if nav_tree is None:
+        nav_tree = build_nav_tree(permissions, role)
+        cache.set(cache_key, nav_tree, NAV_TREE_CACHE_TIMEOUT)
+    return nav_tree
+
+
+def mark_active(nav_tree, current_view_name):
+    """Flags the group and subgroup holding the current page. Works on copies of the cached tree."""
+    marked = []
+    for item in nav_tree:
+        item = dict(item)
+        if 'submenu_content' in item:
+            subgroups = [
+                dict(subgroup, is_active=current_view_name in subgroup['url_names'])
+                for subgroup in item['submenu_content']['subgroups']
+            ]
+            item['submenu_content'] = dict(item['submenu_content'], subgroups=subgroups)
+            item['is_active'] = current_view_name in item['url_names']
+        else:
+            item['is_active'] = item['url_name'] == current_view_name
+        marked.append(item)
+    return marked
@@ -0,0 +1,253 @@
+# In academics/publication_utils.py
+import logging
+import threading
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, Exists, OuterRef, Q
+from django.template.loader import render_to_string
+
+from .email_utils import get_database_email_connection, send_database_email
+from .models import AttendanceSettings, CourseSubject, Criterion, Mark, ResultPublication
+
+logger = logging.getLogger(__name__)
+
+# Job progress and locks live in the shared cache, so every worker sees them
+PUBLICATION_JOB_CACHE_KEY = 'result_publication_job_{job_id}'
+PUBLICATION_JOB_CACHE_TIMEOUT = 60 * 60 * 6  # Long enough for the admin to come back and check
+PUBLICATION_LOCK_CACHE_KEY = 'result_publication_lock_{group_id}_{semester}'
+# A running job refreshes its lock after every email; one that has not for this long has died
+# with its worker process, and its lock lapses so the rest can be sent again.
+PUBLICATION_JOB_STALL_SECONDS = 5 * 60
+PUBLICATION_SAVE_BATCH_SIZE = 25
+
+
+def get_publication_plan(student_group, semester):
+    """
+    Returns the publication status of every student of a group for a semester.
+
+    Marks entered and published state are annotated on the students in a single query.
+    Marks are complete when there is one for every subject of the semester and every
+    criterion of the course's marking scheme.
+    """
+    subjects_count = CourseSubject.objects.filter(course_id=student_group.course_id, semester=semester).count()
+    criteria_count = Criterion.objects.filter(scheme_id=student_group.course.marking_scheme_id).count()
+    required_marks_count = subjects_count * criteria_count
+
+    students = User.objects.filter(
+        profile__student_group=student_group
+    ).select_related('profile').annotate(
+        marks_entered=Count('marks', filter=Q(
+            marks__subject__course_id=student_group.course_id,
+            marks__subject__semester=semester,
+            marks__criterion__scheme_id=student_group.course.marking_scheme_id,
+        )),
+        is_published=Exists(ResultPublication.objects.filter(
+            student=OuterRef('pk'), student_group=student_group, semester=semester
+        )),
+    ).order_by('first_name', 'last_name')
+
+    plan = []
+    for student in students:
+        all_marks_entered = subjects_count > 0 and student.marks_entered >= required_marks_count
+        parent_email = student.profile.parent_email
+        plan.append({
+            'student': student,
+            'all_marks_entered': all_marks_entered,
+            'is_published': student.is_published,
+            'parent_email': parent_email,
+            'is_eligible': all_marks_entered and not student.is_published and bool(parent_email),
+        })
+    return plan
+
+
+def build_report_payloads(student_group, semester, students):
+    """
+    Builds the report card email context of each given student, keyed by student id.
+
+    All marks are loaded with one query and pivoted in memory into the
+    {subject: {criterion: {'obtained', 'max'}}} layout the report card template expects.
+    """
+    settings = AttendanceSettings.load()
+    subjects = list(CourseSubject.objects.filter(
+        course_id=student_group.course_id, semester=semester
+    ).select_related('subject').order_by('subject__name'))
+    all_criteria = list(Criterion.objects.filter(scheme_id=student_group.course.marking_scheme_id).order_by('id'))
+
+    student_ids = [student.id for student in students]
+    report_data = {student_id: {cs.id: {} for cs in subjects} for student_id in student_ids}
+    marks = Mark.objects.filter(
+        student_id__in=student_ids, subject__in=subjects
+    ).values_list('student_id', 'subject_id', 'criterion__name', 'criterion__max_marks', 'marks_obtained')
+    for student_id, subject_id, criterion_name, max_marks, obtained in marks:
+        report_data[student_id][subject_id][criterion_name] = {'obtained': obtained, 'max': max_marks}
+
+    payloads = {}
+    for student in students:
+        final_results = []
+        for cs in subjects:
+            criteria_marks = report_data[student.id][cs.id]
+            total_obtained = sum(v['obtained'] for v in criteria_marks.values())
+            total_max = sum(v['max'] for v in criteria_marks.values())
+            percentage = (total_obtained / total_max * 100) if total_max > 0 else 0
+            final_results.append({
+                'subject': cs.subject.name,
+                'criteria_marks': criteria_marks,
+                'total_obtained': total_obtained,
+                'total_max': total_max,
+                'status': "Pass" if percentage >= settings.passing_percentage else "Fail",
+            })
+
+        payloads[student.id] = {
+            'student': student, 'student_group': student_group, 'semester': semester,
+            'all_criteria': all_criteria,
+            'final_results': final_results,
+        }
+    return payloads
+
+
+def render_report_email(payload):
+    """Returns (subject, plain_text, html) for a report card payload."""
+    student = payload['student']
+    subject = f"Final Report Card for {student.get_full_name()} - Semester {payload['semester']}"
+    html_content = render_to_string('emails/parent_report_card_email.html', payload)
+    plain_text_content = f"Please find the attached report card for {student.get_full_name()}."
+    return subject, plain_text_content, html_content
+
+
+def get_publication_job(job_id):
+    """
+    Returns the progress of a publication job, or None if it is unknown or expired. A job
+    whose worker stopped reporting is returned as done and 'interrupted'.
+    """
+    job = cache.get(PUBLICATION_JOB_CACHE_KEY.format(job_id=job_id))
+    if job and not job['done'] and time.time() - job['updated_at'] > PUBLICATION_JOB_STALL_SECONDS:
+        job.update(done=True, interrupted=True)
+    return job
+
+
+def _lock_key(student_group_id, semester):
+    return PUBLICATION_LOCK_CACHE_KEY.format(group_id=student_group_id, semester=semester)
+
+
+def is_publication_running(student_group_id, semester):
+    """Whether a bulk publication job holds the lock of a group and semester."""
+    return cache.get(_lock_key(student_group_id, semester)) is not None
+
+
+def _save_publication_job(job):
+    job['updated_at'] = time.time()
+    cache.set(PUBLICATION_JOB_CACHE_KEY.format(job_id=job['id']), job, PUBLICATION_JOB_CACHE_TIMEOUT)
+    if not job['done']:
+        cache.touch(_lock_key(job['student_group_id'], job['semester']), PUBLICATION_JOB_STALL_SECONDS)
+
+
+def _release_lock(job):
+    lock_key = _lock_key(job['student_group_id'], job['semester'])
+    if cache.get(lock_key) == job['id']:
+        cache.delete(lock_key)
+
+
+def _save_publications(publications):
+    # ignore_conflicts keeps a parallel single send from failing the whole batch
+    ResultPublication.objects.bulk_create(publications, ignore_conflicts=True)
+
+
+def _run_publication_job(job, payloads, student_group, semester, published_by):
+    delivered = []
+    try:
+        connection = get_database_email_connection()
+        if connection is None:
+            logger.error("SMTP settings are not configured. Cannot publish results.")
+            job['failed'] = job['total']
+            return
+
+        with connection:
+            for payload in payloads:
+                student = payload['student']
+                subject, plain_text_content, html_content = render_report_email(payload)
+                success = send_database_email(subject, plain_text_content, [student.profile.parent_email],
+                                              html_message=html_content, connection=connection)
+                if success:
+                    # Only record the publication once the email has actually gone out
+                    delivered.append(ResultPublication(
+                        student=student, student_group=student_group,
+                        semester=semester, published_by=published_by
+                    ))
+                    job['sent'] += 1
+                else:
+                    job['failed'] += 1
+
+                if len(delivered) >= PUBLICATION_SAVE_BATCH_SIZE:
+                    _save_publications(delivered)
+                    delivered = []
+                _save_publication_job(job)
+    except Exception as e:
+        logger.error(f"Result publication job {job['id']} failed. Error: {e}")
+        job['failed'] = job['total'] - job['sent']
+    finally:
+        if delivered:
+            # Record what was already sent, even if the job stopped half way
+            _save_publications(delivered)
+        job['done'] = True
+        _save_publication_job(job)
+        # Only now are all the ResultPublication rows in, so another job would plan correctly
+        _release_lock(job)
+        # The worker thread has its own database connection, which nobody else will close
+        connections.close_all()
+
+
+def start_publication_job(student_group, semester, published_by):
+    """
+    Queues the report card emails of every eligible student of a group and sends them in the
+    background, over a single SMTP connection.
+
+    ResultPublication rows are bulk-inserted for the emails that were delivered. Returns
+    (job, created) like get_or_create: job is the dict whose 'id' can be passed to
+    get_publication_job() to follow its progress, or None if no student is eligible. Only one
+    job runs per group and semester; while one does, it is returned with created=False, so a
+    double submit or a second admin cannot email the same parents twice.
+    """
+    job_id = uuid.uuid4().hex
+    lock_key = _lock_key(student_group.id, semester)
+    if not cache.add(lock_key, job_id, PUBLICATION_JOB_STALL_SECONDS):
+        running = get_publication_job(cache.get(lock_key))
+        if running and not running['done']:
+            return running, False
+        # The lock outlived its job's progress entry; take it over
+        cache.set(lock_key, job_id, PUBLICATION_JOB_STALL_SECONDS)
+
+    job = {
+        'id': job_id,
+        'student_group_id': student_group.id,
+        'semester': semester,
+        'total': 0,
+        'sent': 0,
+        'failed': 0,
+        'done': False,
+    }
+    try:
+        # Planned under the lock, so students published by an earlier job are already excluded
+        eligible_students = [row['student'] for row in get_publication_plan(student_group, semester)
+                             if row['is_eligible']]
+        if not eligible_students:
+            _release_lock(job)
+            return None, False
+
+        payloads = build_report_payloads(student_group, semester, eligible_students)
+        job['total'] = len(eligible_students)
+        _save_publication_job(job)
+
+        worker = threading.Thread(
+            target=_run_publication_job,
+            args=(job, [payloads[s.id] for s in eligible_students], student_group, semester, published_by),
+            daemon=True,
+        )
+        worker.start()
+    except Exception:
+        _release_lock(job)
+        raise
+    return job, True
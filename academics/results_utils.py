@@ -0,0 +1,135 @@
+# In academics/results_utils.py
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import AttendanceSettings, CourseSubject, Mark, StudentGroup, StudentSubjectStatus
+
+
+def compute_subject_totals(semester, student_ids, subject_ids):
+    """
+    Returns {(student_id, subject_id): (total_obtained, total_max)} for the given students and
+    subjects, computed with a single aggregate query over Mark.
+    """
+    totals = Mark.objects.filter(
+        student_id__in=student_ids, subject_id__in=subject_ids, subject__semester=semester
+    ).values('student_id', 'subject_id').annotate(
+        total_obtained=Sum('marks_obtained'),
+        total_max=Sum('criterion__max_marks'),
+    ).order_by()
+
+    return {
+        (row['student_id'], row['subject_id']): (row['total_obtained'] or Decimal(0), row['total_max'] or 0)
+        for row in totals
+    }
+
+
+def get_result(total_obtained, total_max, passing_percentage):
+    """Turns a subject's totals into a percentage and a pass/fail flag."""
+    percentage = (Decimal(total_obtained) / total_max * 100) if total_max > 0 else Decimal(0)
+    return {
+        'total_obtained': total_obtained,
+        'total_max': total_max,
+        'percentage': round(percentage, 2),
+        'passed': percentage >= passing_percentage,
+    }
+
+
+def build_results_matrix(student_group, semester, passing_percentage=None):
+    """
+    Computes the pass/fail result of every student of a group in every subject of a semester.
+
+    Returns a dict with the ordered 'students' and 'subjects', a 'results' map keyed by
+    (student_id, subject_id) and 'rows', the same results as a list of
+    {'student': ..., 'results': [...]} in subject order for rendering as a table.
+    A student without marks for a subject counts as 0%.
+    """
+    if passing_percentage is None:
+        passing_percentage = AttendanceSettings.load().passing_percentage
+
+    subjects = list(CourseSubject.objects.filter(
+        course_id=student_group.course_id, semester=semester
+    ).select_related('subject').order_by('subject__name'))
+    students = list(User.objects.filter(
+        profile__student_group=student_group
+    ).order_by('first_name', 'last_name'))
+
+    totals = compute_subject_totals(semester, [s.id for s in students], [cs.id for cs in subjects])
+
+    results = {}
+    rows = []
+    for student in students:
+        student_results = []
+        for subject in subjects:
+            total_obtained, total_max = totals.get((student.id, subject.id), (Decimal(0), 0))
+            result = get_result(total_obtained, total_max, passing_percentage)
+            results[(student.id, subject.id)] = result
+            student_results.append(result)
+        rows.append({'student': student, 'results': student_results})
+
+    return {'students': students, 'subjects': subjects, 'results': results, 'rows': rows}
+
+
+def _statuses_to_create(matrix, semester):
+    """Flags each result of the matrix as 'finalized' or not; returns the statuses still missing."""
+    already_finalized = set(StudentSubjectStatus.objects.filter(
+        student__in=matrix['students'], subject__in=matrix['subjects'], semester=semester
+    ).values_list('student_id', 'subject_id'))
+
+    new_statuses = []
+    for (student_id, subject_id), result in matrix['results'].items():
+        result['finalized'] = (student_id, subject_id) in already_finalized
+        if result['finalized']:
+            continue
+        new_statuses.append(StudentSubjectStatus(
+            student_id=student_id, subject_id=subject_id, semester=semester,
+            status='PASSED' if result['passed'] else 'FAILED'
+        ))
+    return new_statuses, len(already_finalized)
+
+
+def finalize_results(student_group, semester, preview=False):
+    """
+    Finalizes the results of a group for a semester.
+
+    Computes every (student, subject) result in one aggregate query, skips the pairs that
+    already have a StudentSubjectStatus and creates the rest with a single bulk insert.
+    With preview=True nothing is written.
+
+    Returns (matrix, count) where matrix is the output of build_results_matrix() with a
+    'finalized' flag added to each result, and count is the number of statuses created (or,
+    with preview=True, that would be).
+    """
+    matrix = build_results_matrix(student_group, semester)
+    if preview:
+        new_statuses, _ = _statuses_to_create(matrix, semester)
+        return matrix, len(new_statuses)
+
+    with transaction.atomic():
+        # Two admins finalizing the same group wait for each other here, so the second one
+        # sees the first one's statuses as already finalized
+        list(StudentGroup.objects.select_for_update().filter(pk=student_group.pk).values_list('pk'))
+        new_statuses, finalized_count = _statuses_to_create(matrix, semester)
+        if not new_statuses:
+            return matrix, 0
+        # ignore_conflicts still skips statuses written outside finalize_results (e.g. in the
+        # admin site); bulk_create cannot say how many it skipped, so count what is there now
+        StudentSubjectStatus.objects.bulk_create(new_statuses, batch_size=500, ignore_conflicts=True)
+        created_count = StudentSubjectStatus.objects.filter(
+            student__in=matrix['students'], subject__in=matrix['subjects'], semester=semester
+        ).count() - finalized_count
+
+    return matrix, created_count
+
+
+def recompute_subject_result(student, course_subject):
+    """
+    Recomputes a single student's result in one subject, e.g. after a supplementary exam,
+    using the same aggregate as finalize_results().
+    """
+    settings = AttendanceSettings.load()
+    totals = compute_subject_totals(course_subject.semester, [student.id], [course_subject.id])
+    total_obtained, total_max = totals.get((student.id, course_subject.id), (Decimal(0), 0))
+    return get_result(total_obtained, total_max, settings.passing_percentage)
@@ -0,0 +1,142 @@
+# In academics/rollups.py
+"""
+Daily attendance rollups: one AttendanceDailyRollup row per (date, class group, subject).
+
+Rows are kept current from the attendance write path (academics.signals schedules a refresh
+of the affected row when the transaction commits, once per row per transaction) and rebuilt for
+whole date ranges by the nightly `rollup_attendance` command, which also repairs anything
+the signals cannot see (bulk updates, raw SQL).
+
+The heatmap and trend endpoints read only this table.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDay, TruncWeek, TruncMonth
+
+from .models import AttendanceRecord, AttendanceDailyRollup
+from .stats import ATTENDED_STATUSES
+from .transaction_utils import on_commit_batched
+
+ROLLUP_SCOPES = ('institution', 'course', 'group', 'subject')
+TREND_PERIODS = {30: 'day', 90: 'week', 365: 'month'}  # days -> bucket size
+
+
+def _rollup_totals(records):
+    """The rollup figures for a queryset of records, grouped by its current .values()."""
+    attended = Q(status__in=ATTENDED_STATUSES)
+    return records.annotate(
+        regular_held=Count('timetable', distinct=True),
+        extra_held=Count('extra_class', distinct=True),
+        present_count=Count('id', filter=attended),
+        late_count=Count('id', filter=attended & (Q(is_late=True) | Q(status='Late'))),
+        absent_count=Count('id', filter=~attended),
+    )
+
+
+# --- Writing ---
+
+def refresh_rollup(date, student_group_id, course_subject_id):
+    """Recomputes one rollup row from the attendance records (deleting it if none are left)."""
+    if not (student_group_id and course_subject_id):
+        return
+    totals = _rollup_totals(AttendanceRecord.objects.filter(
+        date=date, student_group_id=student_group_id, course_subject_id=course_subject_id
+    ).values('date')).order_by('date').first()
+    if not totals:
+        AttendanceDailyRollup.objects.filter(
+            date=date, student_group_id=student_group_id, course_subject_id=course_subject_id
+        ).delete()
+        return
+    AttendanceDailyRollup.objects.update_or_create(
+        date=date, student_group_id=student_group_id, course_subject_id=course_subject_id,
+        defaults={
+            'held': totals['regular_held'] + totals['extra_held'],
+            'present': totals['present_count'],
+            'late': totals['late_count'],
+            'absent': totals['absent_count'],
+        }
+    )
+
+
+def _refresh_rollups(keys):
+    for key in keys:
+        refresh_rollup(*key)
+
+
+def schedule_rollup_refresh(date, student_group_id, course_subject_id):
+    """
+    Refreshes a rollup row once the current transaction commits. Marking a class saves one
+    record per student; within a transaction the row is only refreshed once.
+    """
+    on_commit_batched('attendance_rollups', [(date, student_group_id, course_subject_id)], _refresh_rollups)
+
+
+def rebuild_rollups(start, end):
+    """Recomputes every rollup row between two dates (inclusive); returns the number of rows."""
+    totals = _rollup_totals(AttendanceRecord.objects.filter(
+        date__range=(start, end), student_group__isnull=False, course_subject__isnull=False
+    ).values('date', 'student_group_id', 'course_subject_id')).order_by()
+    rows = [
+        AttendanceDailyRollup(
+            date=row['date'], student_group_id=row['student_group_id'], course_subject_id=row['course_subject_id'],
+            held=row['regular_held'] + row['extra_held'], present=row['present_count'], late=row['late_count'],
+            absent=row['absent_count'],
+        )
+        for row in totals
+    ]
+    with transaction.atomic():
+        AttendanceDailyRollup.objects.filter(date__range=(start, end)).delete()
+        AttendanceDailyRollup.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+# --- Reading ---
+
+def scoped_rollups(scope, object_id=None):
+    """Rollup rows for the institution, a course, a class group or a course subject."""
+    rollups = AttendanceDailyRollup.objects.all()
+    if scope == 'course':
+        rollups = rollups.filter(student_group__course_id=object_id)
+    elif scope == 'group':
+        rollups = rollups.filter(student_group_id=object_id)
+    elif scope == 'subject':
+        rollups = rollups.filter(course_subject_id=object_id)
+    return rollups
+
+
+def _bucket_rows(rows, date_field):
+    series = []
+    for row in rows:
+        marked = row['present'] + row['absent']
+        series.append({
+            'date': row[date_field].isoformat(),
+            'held': row['held'],
+            'present': row['present'],
+            'late': row['late'],
+            'absent': row['absent'],
+            'percentage': round(row['present'] / marked * 100, 2) if marked else None,
+        })
+    return series
+
+
+def heatmap(scope, object_id, start, end):
+    """Per-day totals between two dates, for a calendar heatmap."""
+    rows = scoped_rollups(scope, object_id).filter(date__range=(start, end)).values('date').annotate(
+        held=Sum('held'), present=Sum('present'), late=Sum('late'), absent=Sum('absent')
+    ).order_by('date')
+    return _bucket_rows(rows, 'date')
+
+
+def trend(scope, object_id, days, today):
+    """Totals over the last `days` days, bucketed by day, week or month (see TREND_PERIODS)."""
+    bucket = TREND_PERIODS[days]
+    truncate = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}[bucket]
+    rows = scoped_rollups(scope, object_id).filter(
+        date__range=(today - timedelta(days=days - 1), today)
+    ).annotate(period=truncate('date'))
+    rows = rows.values('period').annotate(
+        held=Sum('held'), present=Sum('present'), late=Sum('late'), absent=Sum('absent')
+    ).order_by('period')
+    return bucket, _bucket_rows(rows, 'period')
@@ -0,0 +1,471 @@
+# In academics/scheduler.py
+"""
+Automatic weekly timetable scheduling for class groups.
+
+Each class group needs every subject of its current (latest) semester for a number of
+periods a week, derived from CourseSubject.required_hours, the teaching weeks in a semester
+and the length of a time slot. The scheduler:
+
+  1. picks one faculty member per (class group, subject): whoever already teaches it in the
+     group, otherwise the least loaded faculty member with the subject in their
+     field_of_expertise (any faculty member if nobody has it, as in the timetable form);
+  2. places the missing periods into schedulable (day, time slot) cells with a backtracking
+     search: the subject with the least room left goes next (fewest free cells per period
+     still needed), its cells are tried on the days where it has fewest periods, and every
+     placement is checked forward so a subject that can no longer fit fails at once. A search
+     that stalls is restarted with ties broken at random and a larger node budget.
+     Free cells are bitmasks, so a domain is two ANDs and a popcount.
+
+Existing timetable entries are never moved or deleted (attendance records hang off them);
+they are fixed, and only what is missing is added. Nothing in the result can double-book a
+class group or a faculty member. If the time budget runs out, or no complete timetable
+exists, the deepest partial timetable found is returned with the periods it could not place.
+
+A preview comes with a signed copy of its placements, so what the admin approves is saved
+as shown (see apply_schedule) rather than solved again: a search cut short by its time limit
+can end somewhere else on the next run.
+"""
+import hashlib
+import math
+import random
+import statistics
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.db import IntegrityError, transaction
+
+from .cache_versions import bump_scope_versions
+from .marks_utils import invalidate_faculty_group_subject_map
+from .models import CourseSubject, StudentGroup, Timetable, TimeSlot
+
+MAX_SUBJECT_PERIODS_PER_DAY = 2
+DEFAULT_TIME_LIMIT = 10  # seconds
+DEADLINE_CHECK_INTERVAL = 256  # search nodes
+RESTART_NODES = 4096  # search nodes past one per lesson before the first restart; doubled after each
+SCHEDULE_SIGNING_SALT = 'academics.scheduler.apply'
+SCHEDULE_PREVIEW_MAX_AGE = 60 * 60  # seconds
+
+
+def _bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class TimetableSolver:
+    """
+    Places lessons into a week of n_days x n_slots cells, numbered day * n_slots + slot.
+
+    `tasks` is a list of (group, subject, faculty, periods) with any hashable keys;
+    `busy_groups` and `busy_faculty` map keys to bitmasks of cells already taken.
+    """
+
+    def __init__(self, n_days, n_slots, tasks, busy_groups=None, busy_faculty=None,
+                 max_per_day=MAX_SUBJECT_PERIODS_PER_DAY):
+        self.n_days = n_days
+        self.n_slots = n_slots
+        week = (1 << (n_days * n_slots)) - 1
+        self.day_masks = [((1 << n_slots) - 1) << (day * n_slots) for day in range(n_days)]
+
+        self.tasks = tasks
+        self.week = week
+        self.busy_groups, self.busy_faculty = busy_groups or {}, busy_faculty or {}
+        self.max_per_day = [max(max_per_day, math.ceil(periods / n_days)) for _, _, _, periods in tasks]
+        self.nodes = 0
+        self.restarts = 0
+        self.timed_out = False
+        self.best = []
+        self._rng = random.Random(0)
+        self._priority = [0] * len(tasks)
+        self._reset()
+
+    def _reset(self):
+        self.remaining = [periods for _, _, _, periods in self.tasks]
+        self.allowed_days = [self.week] * len(self.tasks)
+        self.per_day = [[0] * self.n_days for _ in self.tasks]
+        self.group_free = {group: self.week & ~self.busy_groups.get(group, 0) for group, _, _, _ in self.tasks}
+        self.faculty_free = {faculty: self.week & ~self.busy_faculty.get(faculty, 0) for _, _, faculty, _ in self.tasks}
+        self.group_day_load = {group: [0] * self.n_days for group in self.group_free}
+        self.lessons_left = sum(self.remaining)
+
+    # --- Moves ---
+
+    def _domain(self, task):
+        group, _, faculty, _ = self.tasks[task]
+        return self.group_free[group] & self.faculty_free[faculty] & self.allowed_days[task]
+
+    def _place(self, task, cell):
+        group, _, faculty, _ = self.tasks[task]
+        bit = 1 << cell
+        day = cell // self.n_slots
+        self.group_free[group] &= ~bit
+        self.faculty_free[faculty] &= ~bit
+        self.group_day_load[group][day] += 1
+        self.per_day[task][day] += 1
+        if self.per_day[task][day] == self.max_per_day[task]:
+            self.allowed_days[task] &= ~self.day_masks[day]
+        self.remaining[task] -= 1
+        self.lessons_left -= 1
+
+    def _undo(self, task, cell):
+        group, _, faculty, _ = self.tasks[task]
+        bit = 1 << cell
+        day = cell // self.n_slots
+        self.group_free[group] |= bit
+        self.faculty_free[faculty] |= bit
+        self.group_day_load[group][day] -= 1
+        if self.per_day[task][day] == self.max_per_day[task]:
+            self.allowed_days[task] |= self.day_masks[day]
+        self.per_day[task][day] -= 1
+        self.remaining[task] += 1
+        self.lessons_left += 1
+
+    # --- Heuristics ---
+
+    def _select(self, partial=False):
+        """
+        The task with the least slack (free cells minus periods still needed) and its candidate
+        cells, best first; None if some task can no longer be completed. With partial=True,
+        tasks that cannot be completed are still placed as far as they go, and None means
+        nothing more can be placed.
+        """
+        best_task, best_key, best_domain = None, None, 0
+        for task, remaining in enumerate(self.remaining):
+            if not remaining:
+                continue
+            domain = self._domain(task)
+            slack = domain.bit_count() - remaining
+            if partial and not domain:
+                continue
+            if slack < 0 and not partial:
+                return None
+            key = (slack, -remaining, self._priority[task])
+            if best_key is None or key < best_key:
+                best_task, best_key, best_domain = task, key, domain
+        if best_task is None:
+            return None
+        group = self.tasks[best_task][0]
+        per_day, group_load = self.per_day[best_task], self.group_day_load[group]
+        # Spread the subject over the week, then the class's load, then earlier slots first
+        candidates = sorted(_bits(best_domain), key=lambda cell: (
+            per_day[cell // self.n_slots], group_load[cell // self.n_slots], cell % self.n_slots
+        ))
+        return best_task, candidates
+
+    # --- Search ---
+
+    def solve(self, time_limit=DEFAULT_TIME_LIMIT):
+        """
+        Searches until every lesson is placed, the search space is exhausted or `time_limit`
+        seconds pass. Returns True if complete; self.best holds the placements as (task, cell).
+
+        Chronological backtracking rarely recovers from a bad choice made early on, so a search
+        that runs past its node budget starts over with ties between tasks broken at random,
+        and a budget twice as large.
+
+        If the search fails, a greedy pass that skips what cannot be placed (rather than
+        backtracking) usually gets further than the deepest point of the search; the better
+        of the two is kept.
+        """
+        deadline = time.monotonic() + time_limit
+        budget = self.lessons_left + RESTART_NODES
+        while True:
+            found = self._search(deadline, self.nodes + budget)
+            if found is not None:
+                break
+            if self.timed_out:
+                found = False
+                break
+            self.restarts += 1
+            budget *= 2
+            self._priority = [self._rng.random() for _ in self.tasks]
+            self._reset()
+        if found:
+            return True
+        self._reset()
+        placements = []
+        while choice := self._select(partial=True):
+            task, candidates = choice
+            self._place(task, candidates[0])
+            placements.append((task, candidates[0]))
+        if len(placements) > len(self.best):
+            self.best = placements
+        return False
+
+    def _search(self, deadline, node_limit):
+        """True if complete, False if the search space is exhausted or the deadline passes,
+        None once `node_limit` search nodes have been used."""
+        frames = []  # [task, candidates, next candidate, placed cell]
+        descend = True
+        while True:
+            self.nodes += 1
+            if self.nodes % DEADLINE_CHECK_INTERVAL == 0 and time.monotonic() > deadline:
+                self.timed_out = True
+                return False
+            if self.nodes >= node_limit:
+                return None
+            if descend:
+                if not self.lessons_left:
+                    self.best = [(frame[0], frame[3]) for frame in frames]
+                    return True
+                choice = self._select()
+                frames.append([*choice, 0, None] if choice else [None, [], 0, None])
+
+            frame = frames[-1]
+            if frame[3] is not None:
+                self._undo(frame[0], frame[3])
+                frame[3] = None
+            if frame[2] < len(frame[1]):
+                cell = frame[1][frame[2]]
+                frame[2] += 1
+                self._place(frame[0], cell)
+                frame[3] = cell
+                if len(frames) > len(self.best):
+                    self.best = [(f[0], f[3]) for f in frames]
+                descend = True
+                continue
+
+            frames.pop()
+            descend = False
+            if not frames:
+                return False
+
+    def unplaced(self):
+        """(task, periods) for every task the best placement leaves short."""
+        placed = Counter(task for task, _ in self.best)
+        return [(task, periods - placed[task]) for task, (_, _, _, periods) in enumerate(self.tasks)
+                if placed[task] < periods]
+
+
+def assign_faculty(demands, eligible, capacity, current=None):
+    """
+    One faculty member per demand, as {(group, subject): faculty}.
+
+    `demands` maps (group, subject) to periods needed, `eligible` maps it to the candidate
+    faculty, `capacity` maps faculty to free cells and `current` maps a demand to whoever
+    already teaches it. Demands with the fewest candidates are assigned first, each to the
+    candidate with the most room left; demands nobody can take are left out. Anyone left
+    with more periods than free cells then hands demands to other candidates with room.
+    """
+    current = current or {}
+    load = Counter()
+    assignment = {}
+
+    def room(faculty):
+        return capacity.get(faculty, 0) - load[faculty]
+
+    for key in sorted(demands, key=lambda key: (len(eligible.get(key, ())), -demands[key], key)):
+        faculty = current.get(key)
+        if faculty is None:
+            candidates = eligible.get(key, ())
+            if not candidates:
+                continue
+            # Whoever has the most room left, preferring those the whole demand still fits
+            faculty = max(candidates, key=lambda f: (room(f) >= demands[key], room(f)))
+        assignment[key] = faculty
+        load[faculty] += demands[key]
+
+    moved = True
+    while moved:
+        moved = False
+        for key, faculty in sorted(assignment.items()):
+            if room(faculty) >= 0 or key in current:
+                continue
+            fits = [f for f in eligible.get(key, ()) if f != faculty and room(f) >= demands[key]]
+            if fits:
+                target = max(fits, key=room)
+                assignment[key] = target
+                load[faculty] -= demands[key]
+                load[target] += demands[key]
+                moved = True
+    return assignment
+
+
+# --- Django ---
+
+def get_scheduling_days():
+    return getattr(settings, 'AUTO_SCHEDULE_DAYS', ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday'])
+
+
+def periods_per_week(required_hours, slot_minutes):
+    """Weekly periods that cover `required_hours` over a semester's teaching weeks."""
+    weeks = getattr(settings, 'SEMESTER_TEACHING_WEEKS', 15)
+    return math.ceil(required_hours * 60 / (weeks * slot_minutes)) if slot_minutes else 0
+
+
+def _slot_minutes(slot):
+    start = datetime.combine(datetime.min, slot.start_time)
+    return (datetime.combine(datetime.min, slot.end_time) - start).seconds // 60
+
+
+def _fingerprint(rows):
+    """A digest of the timetable rows (pk first) the schedule was built on."""
+    return hashlib.sha256(repr(sorted(rows)).encode()).hexdigest()
+
+
+def _entries_saved(entries):
+    # bulk_create sends no signals; refresh what the post_save handlers would have
+    for faculty_id in {entry.faculty_id for entry in entries}:
+        invalidate_faculty_group_subject_map(faculty_id)
+    bump_scope_versions(*[(scope, entry.student_group_id) for entry in entries for scope in ('group', 'timetable')],
+                        *[(scope, entry.faculty_id) for entry in entries for scope in ('faculty', 'faculty_timetable')])
+
+
+def auto_schedule(groups=None, days=None, time_limit=DEFAULT_TIME_LIMIT, preview=False):
+    """
+    Adds the missing periods to the timetables of the given class groups (all if None).
+
+    Returns {'entries': [new Timetable entries], 'unplaced': [{'group', 'subject', 'faculty',
+    'periods'}], 'complete', 'timed_out', 'nodes', 'seconds', 'token'}. With preview=True
+    nothing is saved; the entries have their related objects attached so they can be rendered,
+    and 'token' is the signed placements for apply_schedule.
+    """
+    started = time.monotonic()
+    days = days or get_scheduling_days()
+    groups = list(StudentGroup.objects.all() if groups is None else groups)
+    slots = list(TimeSlot.objects.filter(is_schedulable=True))
+    slot_index = {slot.pk: i for i, slot in enumerate(slots)}
+    day_index = {day: i for i, day in enumerate(days)}
+    slot_minutes = statistics.median(_slot_minutes(slot) for slot in slots) if slots else 0
+
+    def cell_of(day, slot_id):
+        if day in day_index and slot_id in slot_index:
+            return day_index[day] * len(slots) + slot_index[slot_id]
+
+    # Everything already scheduled is fixed: it blocks its cell for its group and faculty
+    busy_groups, busy_faculty = defaultdict(int), defaultdict(int)
+    existing_periods, current_faculty = Counter(), defaultdict(Counter)
+    rows = list(Timetable.objects.values_list(
+        'pk', 'student_group_id', 'subject_id', 'faculty_id', 'day_of_week', 'time_slot_id'))
+    for _, group_id, subject_id, faculty_id, day, slot_id in rows:
+        cell = cell_of(day, slot_id)
+        if cell is not None:
+            busy_groups[group_id] |= 1 << cell
+            busy_faculty[faculty_id] |= 1 << cell
+        existing_periods[group_id, subject_id] += 1
+        current_faculty[group_id, subject_id][faculty_id] += 1
+
+    # Subjects of each group's latest semester and the periods still missing
+    subjects = {}
+    latest = {}
+    for cs in CourseSubject.objects.filter(course__in={group.course_id for group in groups}).select_related('subject'):
+        subjects[cs.pk] = cs
+        latest[cs.course_id] = max(latest.get(cs.course_id, 0), cs.semester)
+    demands = {}
+    for group in groups:
+        for cs in subjects.values():
+            if cs.course_id == group.course_id and cs.semester == latest[cs.course_id]:
+                missing = periods_per_week(cs.required_hours, slot_minutes) - existing_periods[group.pk, cs.pk]
+                if missing > 0:
+                    demands[group.pk, cs.pk] = missing
+
+    faculty = {user.pk: user for user in User.objects.filter(profile__role='faculty')}
+    experts = defaultdict(list)
+    for user_id, subject_id in User.objects.filter(profile__role='faculty').values_list(
+            'pk', 'profile__field_of_expertise'):
+        if subject_id:
+            experts[subject_id].append(user_id)
+    eligible = {key: experts.get(subjects[key[1]].subject_id) or list(faculty) for key in demands}
+    week = (1 << (len(days) * len(slots))) - 1
+    capacity = {user_id: (week & ~busy_faculty[user_id]).bit_count() for user_id in faculty}
+    current = {key: current_faculty[key].most_common(1)[0][0] for key in demands if current_faculty[key]}
+    assignment = assign_faculty(demands, eligible, capacity, current)
+
+    tasks = [(group_id, cs_id, assignment[group_id, cs_id], periods)
+             for (group_id, cs_id), periods in sorted(demands.items()) if (group_id, cs_id) in assignment]
+    solver = TimetableSolver(len(days), len(slots), tasks, busy_groups, busy_faculty)
+    complete = solver.solve(time_limit) if tasks else True
+
+    groups_by_id = {group.pk: group for group in groups}
+    entries = []
+    for task, cell in solver.best:
+        group_id, cs_id, faculty_id, _ = tasks[task]
+        entries.append(Timetable(
+            student_group=groups_by_id[group_id], subject=subjects[cs_id], faculty=faculty[faculty_id],
+            day_of_week=days[cell // len(slots)], time_slot=slots[cell % len(slots)],
+        ))
+    unplaced = [
+        {'group': groups_by_id[tasks[task][0]], 'subject': subjects[tasks[task][1]],
+         'faculty': faculty[tasks[task][2]], 'periods': periods}
+        for task, periods in solver.unplaced()
+    ] + [
+        {'group': groups_by_id[group_id], 'subject': subjects[cs_id], 'faculty': None, 'periods': periods}
+        for (group_id, cs_id), periods in sorted(demands.items()) if (group_id, cs_id) not in assignment
+    ]
+
+    token = None
+    if preview:
+        token = signing.dumps({
+            'timetable': _fingerprint(rows),
+            'entries': [[entry.student_group_id, entry.subject_id, entry.faculty_id, entry.day_of_week,
+                         entry.time_slot_id] for entry in entries],
+        }, salt=SCHEDULE_SIGNING_SALT, compress=True)
+    elif entries:
+        with transaction.atomic():
+            Timetable.objects.bulk_create(entries)
+        _entries_saved(entries)
+
+    return {
+        'entries': entries,
+        'unplaced': unplaced,
+        'complete': complete and not unplaced,
+        'timed_out': solver.timed_out,
+        'nodes': solver.nodes,
+        'seconds': round(time.monotonic() - started, 3),
+        'token': token,
+    }
+
+
+def apply_schedule(token, max_age=SCHEDULE_PREVIEW_MAX_AGE):
+    """
+    Saves the entries of a previewed schedule exactly as previewed. Returns the new entries, or
+    None if the timetable has changed since the preview (the preview must then be run again).
+    Raises signing.BadSignature for a token that is forged or older than `max_age` seconds.
+    """
+    data = signing.loads(token, salt=SCHEDULE_SIGNING_SALT, max_age=max_age)
+    entries = [Timetable(student_group_id=group_id, subject_id=subject_id, faculty_id=faculty_id,
+                         day_of_week=day, time_slot_id=slot_id)
+               for group_id, subject_id, faculty_id, day, slot_id in data['entries']]
+    try:
+        with transaction.atomic():
+            rows = Timetable.objects.select_for_update().values_list(
+                'pk', 'student_group_id', 'subject_id', 'faculty_id', 'day_of_week', 'time_slot_id')
+            if _fingerprint(rows) != data['timetable']:
+                return None
+            # The unique constraints still catch an entry added after the check
+            Timetable.objects.bulk_create(entries)
+    except IntegrityError:
+        return None
+    _entries_saved(entries)
+    return entries
+
+
+# --- Benchmark ---
+
+def synthetic_solver(n_groups=50, subjects_per_group=6, periods=5, n_faculty=60, experts_per_subject=3,
+                     n_days=5, n_slots=7, seed=0):
+    """
+    A solver for a synthetic institution (no database): groups in courses of 5 groups, each
+    course with its own subjects and a few faculty experts per subject. The defaults fill 30 of
+    each class's 35 cells, dense enough that the search has to backtrack and restart.
+    """
+    rng = random.Random(seed)
+    demands, eligible = {}, {}
+    for group in range(n_groups):
+        course = group // 5
+        for i in range(subjects_per_group):
+            subject = course * subjects_per_group + i
+            experts = random.Random(subject).sample(range(n_faculty), experts_per_subject)
+            demands[group, subject] = periods
+            eligible[group, subject] = experts
+    capacity = {faculty: n_days * n_slots for faculty in range(n_faculty)}
+    assignment = assign_faculty(demands, eligible, capacity)
+    tasks = [(group, subject, assignment[group, subject], periods)
+             for (group, subject), periods in demands.items() if (group, subject) in assignment]
+    rng.shuffle(tasks)
+    return TimetableSolver(n_days, n_slots, tasks)
@@ -0,0 +1,227 @@
+# In academics/search.py
+import math
+import re
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.expressions import RawSQL
+
+from .models import SearchDocument, SearchTrigram, StudentGroup, Subject
+
+SEARCHABLE_ROLES = {'student': 'student', 'faculty': 'faculty'}
+TYPEAHEAD_LIMIT = 8
+SEARCH_RESULTS_PER_PAGE = 20
+# Share of the query's trigrams a document must contain to count as a match
+TRIGRAM_MATCH_THRESHOLD = 0.6
+# InnoDB ignores shorter words (innodb_ft_min_token_size)
+FULLTEXT_MIN_TERM_LENGTH = 3
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def uses_fulltext():
+    """MySQL searches its FULLTEXT index; every other database uses the trigram table."""
+    return connection.vendor == 'mysql'
+
+
+def _terms(text):
+    return _TERM_RE.findall((text or '').lower())
+
+
+def _trigrams(text):
+    # Words are padded at the front only, so a half-typed word still matches
+    # the beginning of the full word.
+    trigrams = set()
+    for term in _terms(text):
+        padded = f"  {term}"
+        trigrams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return trigrams
+
+
+def _body(*values):
+    return ' '.join(str(value) for value in values if value).lower()
+
+
+# --- Building documents ---
+
+def _user_document(user):
+    profile = user.profile
+    doc_type = SEARCHABLE_ROLES.get(profile.role)
+    title = user.get_full_name() or user.username
+    if doc_type == 'student':
+        group_name = profile.student_group.name if profile.student_group_id else ''
+        return SearchDocument(
+            doc_type=doc_type, object_id=user.pk, title=title,
+            subtitle=f"ID: {profile.student_id_number or '-'} | Class: {group_name or '-'}",
+            body=_body(user.first_name, user.last_name, user.username, profile.student_id_number, group_name),
+        )
+    return SearchDocument(
+        doc_type=doc_type, object_id=user.pk, title=title,
+        subtitle=f"Username: {user.username}",
+        body=_body(user.first_name, user.last_name, user.username),
+    )
+
+
+def _subject_document(subject):
+    return SearchDocument(
+        doc_type='subject', object_id=subject.pk, title=subject.name,
+        subtitle=f"Code: {subject.code}",
+        body=_body(subject.name, subject.code),
+    )
+
+
+def _group_document(group):
+    return SearchDocument(
+        doc_type='group', object_id=group.pk, title=group.name,
+        subtitle=f"{group.course.name} ({group.start_year} - {group.passout_year})",
+        body=_body(group.name, group.course.name),
+    )
+
+
+def _searchable_users():
+    return User.objects.filter(
+        profile__role__in=SEARCHABLE_ROLES
+    ).select_related('profile__student_group')
+
+
+# --- Writing the index ---
+
+def index_documents(documents, replace=True):
+    """
+    Writes the given search documents (and their trigrams), replacing the stored copies.
+    Documents identical to the stored copy are skipped, so re-saving an unchanged user or
+    subject costs a single read. Pass replace=False when the table is known to be empty.
+    """
+    with transaction.atomic():
+        if replace:
+            stale_ids, unchanged = [], set()
+            for doc_type in {doc.doc_type for doc in documents}:
+                new_docs = {doc.object_id: doc for doc in documents if doc.doc_type == doc_type}
+                stored = SearchDocument.objects.filter(
+                    doc_type=doc_type, object_id__in=new_docs
+                ).values_list('id', 'object_id', 'title', 'subtitle', 'body')
+                for pk, object_id, title, subtitle, body in stored:
+                    doc = new_docs[object_id]
+                    if (doc.title, doc.subtitle, doc.body) == (title, subtitle, body):
+                        unchanged.add((doc_type, object_id))
+                    else:
+                        stale_ids.append(pk)
+            if stale_ids:
+                SearchDocument.objects.filter(pk__in=stale_ids).delete()
+            documents = [doc for doc in documents if (doc.doc_type, doc.object_id) not in unchanged]
+
+        documents = SearchDocument.objects.bulk_create(documents, batch_size=500)
+
+        if not uses_fulltext():
+            SearchTrigram.objects.bulk_create([
+                SearchTrigram(document=doc, trigram=trigram)
+                for doc in documents for trigram in _trigrams(doc.body)
+            ], batch_size=1000)
+
+
+def remove_documents(doc_type, object_ids):
+    SearchDocument.objects.filter(doc_type=doc_type, object_id__in=object_ids).delete()
+
+
+def index_users(user_ids):
+    """(Re)indexes the given users; users that are not students or faculty are dropped from the index."""
+    documents = [_user_document(user) for user in _searchable_users().filter(pk__in=user_ids)]
+    with transaction.atomic():
+        # Drop documents of users whose role changed or who are no longer searchable
+        stale = SearchDocument.objects.filter(doc_type__in=SEARCHABLE_ROLES.values(), object_id__in=user_ids)
+        for doc_type in SEARCHABLE_ROLES.values():
+            stale = stale.exclude(
+                doc_type=doc_type, object_id__in=[doc.object_id for doc in documents if doc.doc_type == doc_type]
+            )
+        stale.delete()
+        index_documents(documents)
+
+
+def index_subject(subject):
+    index_documents([_subject_document(subject)])
+
+
+def index_group(group):
+    """Indexes a class and re-indexes its students, whose documents include the class name."""
+    index_documents([_group_document(group)])
+    index_users(list(group.students.values_list('user_id', flat=True)))
+
+
+def index_course_groups(course):
+    """Re-indexes the classes of a course, whose documents include the course name."""
+    groups = StudentGroup.objects.unfiltered().filter(course=course).select_related('course')
+    index_documents([_group_document(group) for group in groups])
+
+
+def rebuild_search_index():
+    """Rebuilds the whole search index from scratch. Returns the number of documents written."""
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        documents = [_user_document(user) for user in _searchable_users().iterator(chunk_size=1000)]
+        documents += [_subject_document(subject) for subject in Subject.objects.iterator(chunk_size=1000)]
+        documents += [_group_document(group) for group in
+                      StudentGroup.objects.unfiltered().select_related('course').iterator(chunk_size=1000)]
+        index_documents(documents, replace=False)
+    return len(documents)
+
+
+# --- Querying the index ---
+
+def search(query, doc_type=None):
+    """
+    Returns the SearchDocuments matching a query, best match first, as a lazy queryset
+    that can be sliced or paginated. Each document is annotated with its 'score'.
+    """
+    documents = SearchDocument.objects.all()
+    if doc_type:
+        documents = documents.filter(doc_type=doc_type)
+
+    terms = _terms(query)
+    if not terms:
+        return documents.none()
+
+    if uses_fulltext():
+        long_terms = [term for term in terms if len(term) >= FULLTEXT_MIN_TERM_LENGTH]
+        if not long_terms:
+            # Too short for the FULLTEXT index; fall back to a prefix match on the title
+            return documents.filter(title__istartswith=' '.join(terms)).annotate(
+                score=RawSQL('1', ())
+            ).order_by('title')
+
+        # Every word must match, as a prefix so the typeahead works while typing
+        boolean_query = ' '.join(f'+{term}*' for term in long_terms)
+        return documents.annotate(
+            score=RawSQL(f'MATCH ({SearchDocument._meta.db_table}.body) AGAINST (%s IN BOOLEAN MODE)',
+                         (boolean_query,))
+        ).filter(score__gt=0).order_by('-score', 'title')
+
+    query_trigrams = _trigrams(query)
+    min_matches = max(1, math.ceil(len(query_trigrams) * TRIGRAM_MATCH_THRESHOLD))
+    return documents.filter(
+        trigrams__trigram__in=query_trigrams
+    ).annotate(
+        score=Count('trigrams')
+    ).filter(score__gte=min_matches).order_by('-score', 'title')
+
+
+def search_counts(query):
+    """Returns {doc_type: number of matches} for a query, counted in one grouped query."""
+    matches = search(query)
+    counts = SearchDocument.objects.filter(
+        pk__in=matches.values('pk')
+    ).values('doc_type').annotate(total=Count('pk')).order_by()
+    return {row['doc_type']: row['total'] for row in counts}
+
+
+def typeahead(query, limit=TYPEAHEAD_LIMIT):
+    """Returns the best few matches of a query as plain dicts for the top navigation search box."""
+    return [
+        {
+            'title': document.title,
+            'subtitle': document.subtitle,
+            'type': document.get_doc_type_display(),
+            'url': document.get_absolute_url(),
+        }
+        for document in search(query)[:limit]
+    ]
@@ -0,0 +1,356 @@
+# In academics/signals.py
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete, pre_save, pre_delete, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import Profile, Notification
+from . import live_updates, search
+from .cache_versions import bump_scope_versions
+from .rollups import schedule_rollup_refresh
+from .marks_utils import invalidate_faculty_group_subject_map
+from .models import Timetable, CourseSubject, Course, StudentGroup, Subject, Announcement, AttendanceRecord, \
+    ExtraClass, AttendanceSettings, ClassCancellation, DailySubstitution, Mark, ResultPublication, StudentSubjectStatus, \
+    TimeSlot
+from .thread_local import get_request_cache
+
+
+@receiver(pre_save, sender=Timetable)
+def invalidate_previous_faculty_subject_map(sender, instance, **kwargs):
+    """
+    If a timetable entry is reassigned to another faculty member, the previous
+    faculty's cached class/subject map for marks entry is no longer valid.
+    """
+    if instance.pk:
+        old_faculty_id = Timetable.objects.filter(pk=instance.pk).values_list('faculty_id', flat=True).first()
+        if old_faculty_id and old_faculty_id != instance.faculty_id:
+            invalidate_faculty_group_subject_map(old_faculty_id)
+
+
+@receiver(post_save, sender=Timetable)
+@receiver(post_delete, sender=Timetable)
+def invalidate_faculty_subject_map(sender, instance, **kwargs):
+    invalidate_faculty_group_subject_map(instance.faculty_id)
+
+
+@receiver(post_save, sender=CourseSubject)
+def invalidate_course_faculty_subject_maps(sender, instance, **kwargs):
+    """
+    Changing a course's subjects (e.g. moving one to another semester) changes which
+    subjects are 'current' for every faculty teaching that course.
+    """
+    faculty_ids = Timetable.objects.filter(
+        subject__course_id=instance.course_id
+    ).values_list('faculty_id', flat=True).distinct()
+    for faculty_id in faculty_ids:
+        invalidate_faculty_group_subject_map(faculty_id)
+
+
+# --- Denormalized attendance fields ---
+# AttendanceRecord copies the class group and subject of its timetable entry or extra class;
+# keep existing records in step when either is edited.
+
+@receiver(post_save, sender=Timetable)
+def update_timetable_attendance_fields(sender, instance, created, **kwargs):
+    if not created:
+        records = AttendanceRecord.objects.filter(timetable=instance).exclude(
+            student_group_id=instance.student_group_id, course_subject_id=instance.subject_id
+        )
+        _move_attendance_records(records, instance.student_group_id, instance.subject_id)
+
+
+@receiver(post_save, sender=ExtraClass)
+def update_extra_class_attendance_fields(sender, instance, created, **kwargs):
+    if not created:
+        records = AttendanceRecord.objects.filter(extra_class=instance).exclude(
+            student_group_id=instance.class_group_id, course_subject_id=instance.subject_id
+        )
+        _move_attendance_records(records, instance.class_group_id, instance.subject_id)
+
+
+def _move_attendance_records(records, student_group_id, course_subject_id):
+    old_keys = set(records.values_list('date', 'student_group_id', 'course_subject_id').distinct())
+    # update() skips auto_now; bump updated_at so the incremental analytics export sees the move
+    if records.update(student_group_id=student_group_id, course_subject_id=course_subject_id,
+                      updated_at=timezone.now()):
+        # update() sends no signals; bump the scopes bump_row_scopes would have
+        bump_scope_versions(*[('group', group_id) for group_id in {key[1] for key in old_keys} | {student_group_id}])
+        for date, old_group_id, old_subject_id in old_keys:
+            schedule_rollup_refresh(date, old_group_id, old_subject_id)
+            schedule_rollup_refresh(date, student_group_id, course_subject_id)
+
+
+# --- Attendance analytics ---
+# Cached attendance matrices are keyed on the group scope, which bump_row_scopes and
+# bump_profile_scopes below keep current.
+
+@receiver(post_save, sender=AttendanceRecord)
+@receiver(post_delete, sender=AttendanceRecord)
+def update_attendance_rollup(sender, instance, **kwargs):
+    schedule_rollup_refresh(instance.date, instance.student_group_id, instance.course_subject_id)
+
+
+# --- Search index ---
+# Saving a User always re-saves its Profile (see accounts.signals), so the Profile
+# signals cover changes to names and usernames as well.
+
+@receiver(post_save, sender=Profile)
+def index_profile(sender, instance, **kwargs):
+    search.index_users([instance.user_id])
+
+
+@receiver(post_delete, sender=Profile)
+@receiver(post_delete, sender=User)
+def remove_user_documents(sender, instance, **kwargs):
+    user_id = instance.pk if sender is User else instance.user_id
+    for doc_type in search.SEARCHABLE_ROLES.values():
+        search.remove_documents(doc_type, [user_id])
+
+
+@receiver(post_save, sender=Subject)
+def index_subject(sender, instance, **kwargs):
+    search.index_subject(instance)
+
+
+@receiver(post_delete, sender=Subject)
+def remove_subject_document(sender, instance, **kwargs):
+    search.remove_documents('subject', [instance.pk])
+
+
+@receiver(post_save, sender=StudentGroup)
+def index_student_group(sender, instance, **kwargs):
+    search.index_group(instance)
+
+
+@receiver(pre_delete, sender=StudentGroup)
+def remember_group_students(sender, instance, **kwargs):
+    # The students lose their class once it is deleted, so note who they are beforehand
+    instance._search_student_ids = list(instance.students.values_list('user_id', flat=True))
+
+
+@receiver(post_delete, sender=StudentGroup)
+def remove_student_group_document(sender, instance, **kwargs):
+    search.remove_documents('group', [instance.pk])
+    search.index_users(getattr(instance, '_search_student_ids', []))
+
+
+@receiver(post_save, sender=Course)
+def reindex_course_groups(sender, instance, created, **kwargs):
+    # Class documents include the course name
+    if not created:
+        search.index_course_groups(instance)
+
+
+# --- Cache scope versions ---
+# See academics.cache_versions. A row's scopes are bumped both as loaded and as saved, so
+# moving it (e.g. a timetable entry to another faculty member) refreshes both sides.
+
+# Attendance only bumps the group: everything cached per student (stats.dashboard_snapshot) is
+# also keyed on the student's class, and a student scope per record would cost a cache write
+# per student every time a class is marked.
+SCOPE_FIELDS = {
+    AttendanceRecord: (('group', 'student_group_id'),),
+    Timetable: (('group', 'student_group_id'), ('faculty', 'faculty_id'),
+                ('timetable', 'student_group_id'), ('faculty_timetable', 'faculty_id')),
+    ExtraClass: (('group', 'class_group_id'), ('faculty', 'teacher_id')),
+    StudentGroup: (('group', 'id'), ('course', 'course_id')),
+    Course: (('course', 'id'),),
+    CourseSubject: (('course', 'course_id'),),
+    ResultPublication: (('group', 'student_group_id'), ('student', 'student_id')),
+    StudentSubjectStatus: (('student', 'student_id'),),
+}
+PROFILE_SCOPE_FIELDS = ('user_id', 'role', 'student_group_id', 'student_id_number')
+
+
+def _profile_scopes(user_id, role, student_group_id):
+    if role == 'student':
+        return [('student', user_id), ('group', student_group_id)]
+    if role in ('faculty', 'hod'):
+        return [('faculty', user_id)]
+    return []
+
+
+def _student_group_id(student_id):
+    """The student's class group, looked up once per request."""
+    request_cache = get_request_cache()
+    groups = request_cache.setdefault('student_group_ids', {}) if request_cache is not None else {}
+    if student_id not in groups:
+        groups[student_id] = Profile.objects.filter(user_id=student_id).values_list(
+            'student_group_id', flat=True).first()
+    return groups[student_id]
+
+
+def remember_scope_fields(sender, instance, **kwargs):
+    # Read from __dict__ so a deferred field never costs a query here
+    fields = instance.__dict__
+    names = PROFILE_SCOPE_FIELDS if sender is Profile else [field for _, field in SCOPE_FIELDS[sender]]
+    instance._scope_state = {name: fields.get(name) for name in names} if instance.pk else {}
+
+
+def bump_row_scopes(sender, instance, **kwargs):
+    scopes = [(scope, getattr(instance, field)) for scope, field in SCOPE_FIELDS[sender]]
+    scopes += [(scope, instance._scope_state.get(field)) for scope, field in SCOPE_FIELDS[sender]]
+    bump_scope_versions(*scopes)
+    instance._scope_state = {field: getattr(instance, field) for _, field in SCOPE_FIELDS[sender]}
+
+
+for model in SCOPE_FIELDS:
+    post_init.connect(remember_scope_fields, sender=model, dispatch_uid=f'remember_scope_fields_{model.__name__}')
+    post_save.connect(bump_row_scopes, sender=model, dispatch_uid=f'bump_row_scopes_save_{model.__name__}')
+    post_delete.connect(bump_row_scopes, sender=model, dispatch_uid=f'bump_row_scopes_delete_{model.__name__}')
+
+
+@receiver(post_save, sender=ClassCancellation)
+@receiver(post_delete, sender=ClassCancellation)
+@receiver(post_save, sender=DailySubstitution)
+@receiver(post_delete, sender=DailySubstitution)
+def bump_timetable_change_scopes(sender, instance, **kwargs):
+    group_id, faculty_id = Timetable.objects.filter(pk=instance.timetable_id).values_list(
+        'student_group_id', 'faculty_id').first() or (None, None)
+    bump_scope_versions(('group', group_id), ('faculty', faculty_id),
+                        ('faculty', getattr(instance, 'substituted_by_id', None)))
+
+
+@receiver(post_save, sender=Mark)
+@receiver(post_delete, sender=Mark)
+def bump_mark_scopes(sender, instance, **kwargs):
+    bump_scope_versions(('student', instance.student_id), ('group', _student_group_id(instance.student_id)))
+
+
+@receiver(post_save, sender=AttendanceSettings)
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+def bump_settings_scope(sender, instance, **kwargs):
+    bump_scope_versions(('settings', 0))
+
+
+def _bump_timetable_scopes(entries):
+    """Bumps the class groups and faculty of some timetable entries, whose grids show each other's names."""
+    scopes = []
+    for group_id, faculty_id in entries.values_list('student_group_id', 'faculty_id').distinct():
+        scopes += [('group', group_id), ('faculty', faculty_id),
+                   ('timetable', group_id), ('faculty_timetable', faculty_id)]
+    bump_scope_versions(*scopes)
+
+
+@receiver(post_save, sender=Subject)
+def bump_subject_scopes(sender, instance, created, **kwargs):
+    if not created:
+        bump_scope_versions(*[('course', course_id) for course_id in CourseSubject.objects.filter(
+            subject=instance).values_list('course_id', flat=True)])
+        _bump_timetable_scopes(Timetable.objects.filter(subject__subject=instance))
+
+
+@receiver(post_save, sender=CourseSubject)
+def bump_course_subject_timetable_scopes(sender, instance, created, **kwargs):
+    # The timetable grids show the subject of each course subject
+    if not created:
+        _bump_timetable_scopes(Timetable.objects.filter(subject=instance))
+
+
+@receiver(post_save, sender=StudentGroup)
+def bump_renamed_group_faculty_scopes(sender, instance, created, **kwargs):
+    if not created:
+        _bump_timetable_scopes(Timetable.objects.filter(student_group=instance))
+
+
+@receiver(post_init, sender=Profile)
+def remember_profile_scope_fields(sender, instance, **kwargs):
+    remember_scope_fields(sender, instance)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def bump_profile_scopes(sender, instance, created=False, **kwargs):
+    """
+    Profiles are saved along with every User save (see accounts.signals), so scopes are only
+    bumped when a profile is added or removed or its role, class or ID number changes.
+    """
+    old = instance._scope_state
+    if old and kwargs['signal'] is post_save and all(
+            old.get(name) == getattr(instance, name) for name in PROFILE_SCOPE_FIELDS):
+        return
+    scopes = _profile_scopes(instance.user_id, instance.role, instance.student_group_id)
+    if old:
+        scopes += _profile_scopes(old['user_id'], old['role'], old['student_group_id'])
+    bump_scope_versions(*scopes)
+    instance._scope_state = {name: getattr(instance, name) for name in PROFILE_SCOPE_FIELDS}
+
+
+@receiver(post_save, sender=User)
+def bump_user_scopes(sender, instance, update_fields=None, **kwargs):
+    # Logging in only updates last_login
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    profile = Profile.objects.filter(user=instance).values_list('role', 'student_group_id').first()
+    if profile:
+        bump_scope_versions(*_profile_scopes(instance.pk, *profile))
+        if profile[0] in ('faculty', 'hod'):
+            _bump_timetable_scopes(Timetable.objects.filter(faculty=instance))
+
+
+@receiver(m2m_changed, sender=Course.subjects.through)
+def bump_course_subjects_scope(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        course_ids = [instance.pk]
+    elif action == 'pre_clear':
+        course_ids = instance.courses.values_list('pk', flat=True)
+    else:
+        course_ids = pk_set
+    bump_scope_versions(*[('course', course_id) for course_id in course_ids])
+
+
+@receiver(m2m_changed, sender=Announcement.target_student_groups.through)
+def bump_announcement_group_scopes(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        group_ids = [instance.pk]
+    elif action == 'pre_clear':
+        group_ids = instance.target_student_groups.values_list('pk', flat=True)
+    else:
+        group_ids = pk_set
+    bump_scope_versions(*[('group', group_id) for group_id in group_ids])
+
+
+@receiver(m2m_changed, sender=Profile.field_of_expertise.through)
+def bump_expertise_faculty_scopes(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        user_ids = [instance.user_id]
+    elif action == 'pre_clear':
+        user_ids = instance.profile_set.values_list('user_id', flat=True)
+    else:
+        user_ids = Profile.objects.filter(pk__in=pk_set).values_list('user_id', flat=True)
+    bump_scope_versions(*[('faculty', user_id) for user_id in user_ids])
+
+
+# --- Live updates ---
+# Events are published once the transaction commits, so a stream that reacts to them
+# always finds the new rows in the database.
+
+@receiver(post_save, sender=Announcement)
+def publish_new_announcement(sender, instance, created, **kwargs):
+    live_updates.sync_announcement_audiences(instance)
+    if created:
+        # Classes are added after the announcement is saved; they are published by the m2m signal
+        transaction.on_commit(lambda: live_updates.publish_announcement(instance, group_ids=[]))
+
+
+@receiver(m2m_changed, sender=Announcement.target_student_groups.through)
+def publish_announcement_to_groups(sender, instance, action, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        live_updates.sync_announcement_audiences(instance)
+    if action == 'post_add' and pk_set:
+        group_ids = list(pk_set)
+        transaction.on_commit(lambda: live_updates.publish_announcement(instance, group_ids=group_ids))
+
+
+@receiver(post_save, sender=Notification)
+def publish_new_notification(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: live_updates.publish_notification(instance))
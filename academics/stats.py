@@ -0,0 +1,247 @@
+# In academics/stats.py
+"""
+Attendance statistics shared by the student, profile, dashboard and class pages.
+
+One definition is used everywhere:
+  * a class is "held" when attendance was marked for it: one regular session per
+    (date, timetable entry), one per extra class;
+  * a student "attended" a class when their record's status is in ATTENDED_STATUSES.
+
+Everything is computed with grouped queries (no per-subject or per-student loops), returned
+as plain dicts and lists that can go straight into json.dumps, and memoized for the rest of
+the request, so a page that asks for the same numbers twice runs the queries once.
+"""
+import functools
+import math
+from collections import Counter
+
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+
+from .analytics import get_attendance_matrix
+from .cache_versions import cached_by_scope
+from .models import AttendanceRecord, AttendanceSettings, CourseSubject
+from .thread_local import get_request_cache
+
+ATTENDED_STATUSES = ('Present', 'Late')
+
+
+def request_memoized(func):
+    """
+    Caches a stats function's result for the current request (see AcademicSessionMiddleware).
+    Model instances are keyed by pk. Outside a request nothing is cached.
+    """
+    @functools.wraps(func)
+    def wrapper(*args):
+        cache = get_request_cache()
+        if cache is None:
+            return func(*args)
+        key = (func.__name__,) + tuple(getattr(arg, 'pk', arg) for arg in args)
+        if key not in cache:
+            cache[key] = func(*args)
+        return cache[key]
+    return wrapper
+
+
+def _percentage(attended, held):
+    return round(attended / held * 100, 2) if held else 0
+
+
+def _semester_subjects(group, semester):
+    return list(CourseSubject.objects.filter(course=group.course, semester=semester).select_related('subject'))
+
+
+def _held_classes(group, subject_ids, month=None):
+    """Classes held per course subject, as {course_subject_id: count}."""
+    records = AttendanceRecord.objects.filter(student_group=group, course_subject_id__in=subject_ids)
+    if month:
+        records = records.filter(date__year=month.year, date__month=month.month)
+    # One row per session rather than per record; counting them here avoids a
+    # COUNT(DISTINCT ...) over several columns, which not every backend supports
+    sessions = records.values_list('course_subject_id', 'date', 'timetable_id', 'extra_class_id').distinct()
+    return Counter(row[0] for row in sessions.order_by())
+
+
+def _subject_rows(subjects, held, attended):
+    rows = []
+    for cs in subjects:
+        total = held.get(cs.pk, 0)
+        if not total:
+            continue
+        present = min(attended.get(cs.pk, 0), total)
+        rows.append({
+            'subject_pk': cs.subject.pk,
+            'course_subject_pk': cs.pk,
+            'subject_name': cs.subject.name,
+            'attended_classes': present,
+            'absent_classes': total - present,
+            'total_classes': total,
+            'official_percentage': _percentage(present, total),
+        })
+    return rows
+
+
+def _totals(rows):
+    attended = sum(row['attended_classes'] for row in rows)
+    total = sum(row['total_classes'] for row in rows)
+    return {
+        'attended_classes': attended,
+        'absent_classes': total - attended,
+        'total_classes': total,
+        'percentage': _percentage(attended, total),
+    }
+
+
+def latest_semester(group):
+    """The highest semester with subjects in the class group's course, or None."""
+    if not group or not group.course_id:
+        return None
+    return CourseSubject.objects.filter(course=group.course).order_by('-semester').values_list(
+        'semester', flat=True).first()
+
+
+def classes_needed(attended, held, threshold):
+    """
+    Consecutive classes to attend to reach `threshold` percent: 0 if already there, None if it
+    can no longer be reached. AttendanceMatrix.classes_needed is the vectorized version.
+    """
+    shortfall = threshold * held - 100 * attended
+    if shortfall <= 0:
+        return 0
+    if threshold >= 100:
+        return None
+    return math.ceil(shortfall / (100 - threshold))
+
+
+@request_memoized
+def held_classes(group, semester):
+    """Total classes held for a class group in a semester."""
+    subject_ids = list(CourseSubject.objects.filter(
+        course_id=group.course_id, semester=semester
+    ).values_list('pk', flat=True))
+    return sum(_held_classes(group, subject_ids).values())
+
+
+def annotate_attended(students, group, semester):
+    """
+    Annotates a User queryset with `attended_classes`: each student's classes attended in the
+    class group's subjects for a semester, counted in the same query.
+    """
+    subject_ids = CourseSubject.objects.filter(course_id=group.course_id, semester=semester).values('pk')
+    return students.annotate(attended_classes=Count('attendance_records', filter=Q(
+        attendance_records__student_group=group,
+        attendance_records__course_subject__in=subject_ids,
+        attendance_records__status__in=ATTENDED_STATUSES,
+    )))
+
+
+@request_memoized
+def subject_breakdown(student, semester, month=None):
+    """
+    A student's attendance per subject of a semester, optionally limited to one month
+    (any date within it). Subjects with no classes held are left out.
+
+    Returns {'subjects': [...], 'attended_classes', 'absent_classes', 'total_classes', 'percentage'}.
+    """
+    group = student.profile.student_group if hasattr(student, 'profile') else None
+    if not group or not group.course_id or not semester:
+        return {'subjects': [], **_totals([])}
+
+    subjects = _semester_subjects(group, semester)
+    subject_ids = [cs.pk for cs in subjects]
+    held = _held_classes(group, subject_ids, month)
+
+    records = AttendanceRecord.objects.filter(
+        student=student, course_subject_id__in=subject_ids, status__in=ATTENDED_STATUSES
+    )
+    if month:
+        records = records.filter(date__year=month.year, date__month=month.month)
+    attended = dict(records.values_list('course_subject_id').annotate(n=Count('id')).order_by())
+
+    rows = _subject_rows(subjects, held, attended)
+    return {'subjects': rows, **_totals(rows)}
+
+
+@request_memoized
+def group_matrix(group, semester):
+    """
+    Every student of a class group against the subjects of a semester, from the cached
+    AttendanceMatrix (see academics.analytics).
+
+    Returns {'subjects': [...with total_classes], 'total_classes', 'students': {student_id: {...}}},
+    where each student has attended/absent/total classes, percentage, 'subjects' (course subject
+    id -> classes attended), absence streaks, trend and classes needed to reach the required
+    percentage.
+    """
+    subjects = _semester_subjects(group, semester) if group.course_id and semester else []
+    matrix = get_attendance_matrix(group, semester)
+    held = dict(zip(matrix.subject_ids.tolist(), matrix.held_per_subject().tolist()))
+    return {
+        'subjects': [
+            {'subject_pk': cs.subject.pk, 'course_subject_pk': cs.pk, 'subject_name': cs.subject.name,
+             'total_classes': held.get(cs.pk, 0)}
+            for cs in subjects
+        ],
+        'total_classes': int(matrix.codes.shape[1]),
+        'students': matrix.student_summaries(AttendanceSettings.load().required_percentage),
+    }
+
+
+@request_memoized
+def daily(student, date):
+    """A student's classes on a date (regular and extra), in time order."""
+    records = AttendanceRecord.objects.filter(student=student, date=date).select_related(
+        'course_subject__subject', 'timetable__time_slot', 'extra_class__time_slot'
+    )
+    classes = []
+    for record in records:
+        source = record.timetable or record.extra_class
+        if not source or not record.course_subject:
+            continue
+        start_time = source.time_slot.start_time
+        classes.append({
+            'subject_name': record.course_subject.subject.name,
+            'start_time': start_time.strftime('%H:%M'),
+            'end_time': source.time_slot.end_time.strftime('%H:%M'),
+            'start_time_display': start_time.strftime('%I:%M %p'),
+            'status': record.status,
+            'is_late': record.is_late,
+        })
+    classes.sort(key=lambda item: item['start_time'])
+    return classes
+
+
+@request_memoized
+def available_months(group, semester):
+    """Months in which attendance was marked for a class group in a semester, newest first."""
+    months = AttendanceRecord.objects.filter(
+        student_group=group, course_subject__semester=semester
+    ).annotate(month=TruncMonth('date')).values_list('month', flat=True).distinct().order_by('-month')
+    return [{'value': month.strftime('%Y-%m'), 'label': month.strftime('%B %Y')} for month in months]
+
+
+# --- Student dashboard snapshot ---
+
+@cached_by_scope(group='student.profile.student_group_id', course='student.profile.student_group.course_id',
+                 student='student', settings=True)
+def dashboard_snapshot(student):
+    """
+    A student's subject breakdown for the latest semester, with each subject flagged against the
+    required percentage. Cached per student until attendance is next marked for their class
+    group (or their course or the settings change); reading it is two cache round trips. Only
+    cached when the cache is shared by all workers, so a student never sees a snapshot from
+    before a write made in another worker.
+
+    Returns subject_breakdown's dict plus 'required_percentage' and 'subjects_below_threshold',
+    with 'below_threshold' set on every subject row.
+    """
+    group = student.profile.student_group if hasattr(student, 'profile') else None
+    required = AttendanceSettings.load().required_percentage
+    breakdown = subject_breakdown(student, latest_semester(group))
+    subjects = [{**row, 'below_threshold': row['official_percentage'] < required} for row in breakdown['subjects']]
+    return {
+        **breakdown,
+        'subjects': subjects,
+        'required_percentage': required,
+        'subjects_below_threshold': [row for row in subjects if row['below_threshold']],
+    }
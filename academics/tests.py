@@ -1,3 +1,188 @@
-from django.test import TestCase
+import random
+from collections import Counter
+from itertools import combinations, product
 
-# Create your tests here.
+import numpy as np
+from django.test import SimpleTestCase
+
+from .analytics import AttendanceMatrix
+from .scheduler import TimetableSolver, assign_faculty, synthetic_solver
+from . import stats
+
+P, A, L, N = 1, 0, 2, -1  # present, absent, late, not marked
+
+
+def make_matrix(codes, session_subjects, subject_ids=(10, 11)):
+    codes = np.array(codes, dtype=np.int8)
+    return AttendanceMatrix(
+        student_ids=np.arange(1, len(codes) + 1, dtype=np.int64),
+        subject_ids=np.array(subject_ids, dtype=np.int64),
+        session_subjects=np.array(session_subjects, dtype=np.int16),
+        session_dates=np.datetime64('2026-09-01') + np.arange(len(session_subjects)),
+        codes=codes,
+    )
+
+
+class AttendanceMatrixTests(SimpleTestCase):
+    def setUp(self):
+        # Six sessions of two subjects for three students
+        self.matrix = make_matrix([
+            [P, P, P, P, P, P],
+            [A, A, P, A, A, A],
+            [L, N, A, A, P, L],
+        ], session_subjects=[0, 1, 0, 1, 0, 0])
+
+    def test_per_subject_counts(self):
+        self.assertEqual(self.matrix.held_per_subject().tolist(), [4, 2])
+        self.assertEqual(self.matrix.attended_per_subject().tolist(), [[4, 2], [1, 0], [3, 0]])
+
+    def test_overall_percentages(self):
+        np.testing.assert_allclose(self.matrix.overall_percentages(), [100, 100 / 6, 50])
+
+    def test_absence_streaks(self):
+        current, longest = self.matrix.absence_streaks()
+        self.assertEqual(current.tolist(), [0, 3, 0])
+        self.assertEqual(longest.tolist(), [0, 3, 3])
+
+    def test_trend(self):
+        np.testing.assert_allclose(self.matrix.trend(window=3), [0, -100 / 6, 200 / 3 - 50])
+
+    def test_classes_needed(self):
+        self.assertEqual(self.matrix.classes_needed(75).tolist(), [0, 14, 6])
+        self.assertEqual(self.matrix.classes_needed(100).tolist(), [0, -1, -1])
+
+    def test_classes_needed_matches_scalar_version(self):
+        attended = self.matrix.attended.sum(axis=1)
+        held = self.matrix.codes.shape[1]
+        for threshold in (0, 1, 33, 50, 74, 75, 76, 99, 100):
+            expected = [stats.classes_needed(int(n), held, threshold) for n in attended]
+            expected = [-1 if needed is None else needed for needed in expected]
+            self.assertEqual(self.matrix.classes_needed(threshold).tolist(), expected, threshold)
+
+    def test_student_summaries(self):
+        summary = self.matrix.student_summaries(75)[2]
+        self.assertEqual(summary, {
+            'attended_classes': 1,
+            'absent_classes': 5,
+            'total_classes': 6,
+            'percentage': 16.67,
+            'subjects': {10: 1, 11: 0},
+            'current_absence_streak': 3,
+            'longest_absence_streak': 3,
+            'trend': 0.0,
+            'classes_needed': 14,
+        })
+
+    def test_no_sessions(self):
+        matrix = make_matrix(np.zeros((2, 0)), session_subjects=[])
+        current, longest = matrix.absence_streaks()
+        self.assertEqual(current.tolist(), [0, 0])
+        self.assertEqual(matrix.classes_needed(75).tolist(), [0, 0])
+        summary = matrix.student_summaries(75)[1]
+        self.assertIsNone(summary['percentage'])
+        self.assertIsNone(summary['trend'])
+        self.assertEqual(summary['subjects'], {10: 0, 11: 0})
+
+
+class TimetableSolverTests(SimpleTestCase):
+    def assertValid(self, solver):
+        """No class group or faculty member double-booked, busy cells and day limits respected."""
+        groups, faculty, per_day = set(), set(), Counter()
+        for task, cell in solver.best:
+            group, _, teacher, _ = solver.tasks[task]
+            self.assertNotIn((group, cell), groups)
+            self.assertNotIn((teacher, cell), faculty)
+            self.assertFalse(solver.busy_groups.get(group, 0) >> cell & 1)
+            self.assertFalse(solver.busy_faculty.get(teacher, 0) >> cell & 1)
+            groups.add((group, cell))
+            faculty.add((teacher, cell))
+            per_day[task, cell // solver.n_slots] += 1
+        for (task, _), periods in per_day.items():
+            self.assertLessEqual(periods, solver.max_per_day[task])
+        placed = Counter(task for task, _ in solver.best)
+        for task, (_, _, _, periods) in enumerate(solver.tasks):
+            self.assertLessEqual(placed[task], periods)
+
+    def brute_force(self, solver):
+        """Whether a complete timetable exists, by trying every combination of cells."""
+        cells = range(solver.n_days * solver.n_slots)
+        options = [combinations(cells, periods) for _, _, _, periods in solver.tasks]
+        for choice in product(*options):
+            taken, ok = set(), True
+            for task, task_cells in enumerate(choice):
+                group, _, teacher, _ = solver.tasks[task]
+                days = Counter(cell // solver.n_slots for cell in task_cells)
+                ok = max(days.values(), default=0) <= solver.max_per_day[task] and all(
+                    not solver.busy_groups.get(group, 0) >> cell & 1
+                    and not solver.busy_faculty.get(teacher, 0) >> cell & 1
+                    and ('g', group, cell) not in taken and ('f', teacher, cell) not in taken
+                    for cell in task_cells)
+                if not ok:
+                    break
+                taken.update(('g', group, cell) for cell in task_cells)
+                taken.update(('f', teacher, cell) for cell in task_cells)
+            if ok:
+                return True
+        return False
+
+    def test_complete_timetable(self):
+        tasks = [('A', 'maths', 'x', 3), ('A', 'physics', 'y', 3), ('B', 'maths', 'x', 3), ('B', 'physics', 'y', 3)]
+        solver = TimetableSolver(3, 3, tasks, busy_groups={'A': 0b1}, busy_faculty={'y': 0b10})
+        self.assertTrue(solver.solve())
+        self.assertEqual(len(solver.best), 12)
+        self.assertEqual(solver.unplaced(), [])
+        self.assertValid(solver)
+
+    def test_impossible_timetable_keeps_what_fits(self):
+        # Both classes need the same teacher for 3 periods in a 4-cell week
+        tasks = [('A', 'maths', 'x', 3), ('B', 'maths', 'x', 3)]
+        solver = TimetableSolver(2, 2, tasks)
+        self.assertFalse(solver.solve())
+        self.assertFalse(solver.timed_out)
+        self.assertEqual(len(solver.best), 4)
+        self.assertEqual(sum(periods for _, periods in solver.unplaced()), 2)
+        self.assertValid(solver)
+
+    def test_matches_brute_force_on_small_instances(self):
+        rng = random.Random(1)
+        for _ in range(150):
+            n_days, n_slots = rng.choice([(2, 2), (2, 3), (3, 2)])
+            tasks = [(rng.choice('AB'), subject, rng.choice('xy'), rng.randint(1, 3)) for subject in range(3)]
+            busy = {key: rng.getrandbits(n_days * n_slots) & rng.getrandbits(n_days * n_slots) for key in 'ABxy'}
+            solver = TimetableSolver(n_days, n_slots, tasks, busy_groups=busy, busy_faculty=busy, max_per_day=1)
+            self.assertEqual(solver.solve(), self.brute_force(solver), (n_days, n_slots, tasks, busy))
+            self.assertValid(solver)
+
+    def test_dense_instance_needs_restarts(self):
+        # Every class has 35 periods for the 35 cells of its week
+        solver = synthetic_solver(n_groups=10, subjects_per_group=7, periods=5, n_faculty=12, seed=1)
+        self.assertTrue(solver.solve())
+        self.assertGreater(solver.restarts, 0)
+        self.assertEqual(len(solver.best), 350)
+        self.assertValid(solver)
+
+
+class AssignFacultyTests(SimpleTestCase):
+    def test_keeps_current_faculty(self):
+        demands = {('A', 'maths'): 3}
+        self.assertEqual(assign_faculty(demands, {('A', 'maths'): ['x', 'y']}, {'x': 10, 'y': 10},
+                                        current={('A', 'maths'): 'y'}), {('A', 'maths'): 'y'})
+
+    def test_fewest_candidates_first(self):
+        # Only x can teach physics, so maths goes to y even though x has the most room
+        demands = {('A', 'maths'): 4, ('A', 'physics'): 4}
+        eligible = {('A', 'maths'): ['x', 'y'], ('A', 'physics'): ['x']}
+        self.assertEqual(assign_faculty(demands, eligible, {'x': 5, 'y': 4}),
+                         {('A', 'maths'): 'y', ('A', 'physics'): 'x'})
+
+    def test_moves_demands_off_overloaded_faculty(self):
+        demands = {('A', 'maths'): 3, ('B', 'maths'): 3, ('C', 'maths'): 3}
+        eligible = dict.fromkeys(demands, ['x', 'y'])
+        assignment = assign_faculty(demands, eligible, {'x': 6, 'y': 3})
+        load = Counter()
+        for key, faculty in assignment.items():
+            load[faculty] += demands[key]
+        self.assertEqual(load, {'x': 6, 'y': 3})
+
+    def test_leaves_out_demands_nobody_can_take(self):
+        self.assertEqual(assign_faculty({('A', 'maths'): 3}, {('A', 'maths'): []}, {'x': 10}), {})
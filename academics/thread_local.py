@@ -10,3 +10,16 @@ def set_current_session(session):
 
 def get_current_session():
     return getattr(_thread_locals, 'current_session', None)
+
+
+def start_request_cache():
+    _thread_locals.request_cache = {}
+
+
+def clear_request_cache():
+    _thread_locals.request_cache = None
+
+
+def get_request_cache():
+    """A dict that lives for the current request, or None outside of one."""
+    return getattr(_thread_locals, 'request_cache', None)
@@ -0,0 +1,66 @@
+# In academics/timetable_grid.py
+"""
+Weekly timetable grids for the manage, student and faculty timetable pages.
+
+A grid is built as a dense list of rows, one per time slot, each holding one cell per day
+(the entry or None), so templates just loop over it. The rendered table is cached as an
+HTML fragment under the version of the timetable it shows (see academics.cache_versions):
+the 'timetable' scope of a class group or the 'faculty_timetable' scope of a faculty member,
+bumped by the timetable's own entries and by renaming a subject, class group or faculty
+member shown in them; the time slots come from the 'settings' scope. Marking attendance or
+publishing results does not touch them. Grids are only cached when the cache is shared by
+all workers, so an edit in one worker is never hidden by another worker's copy.
+"""
+from django.template.loader import render_to_string
+
+from .cache_versions import cached_by_scope
+from .models import Timetable, TimeSlot
+
+DAYS_OF_WEEK = [day for day, _ in Timetable.DAY_CHOICES]
+GRID_TEMPLATE = 'partials/_timetable_grid.html'
+
+
+def build_grid(entries, timeslots):
+    """
+    [{'slot': TimeSlot, 'cells': [{'day', 'entry'}, ...]}, ...]: one row per time slot and one
+    cell per day of the week, with None where nothing is scheduled.
+    """
+    by_cell = {(entry.day_of_week, entry.time_slot_id): entry for entry in entries}
+    return [
+        {'slot': slot, 'cells': [{'day': day, 'entry': by_cell.get((day, slot.pk))} for day in DAYS_OF_WEEK]}
+        for slot in timeslots
+    ]
+
+
+def _render(rows, **context):
+    return render_to_string(GRID_TEMPLATE, {'rows': rows, 'days_of_week': DAYS_OF_WEEK, **context})
+
+
+@cached_by_scope(timetable='group', settings=True)
+def group_grid_html(group, editable=False):
+    """
+    A class group's weekly timetable. The editable grid (manage timetable) also shows the
+    break slots and links every cell to the entry create/update forms.
+    """
+    timeslots = TimeSlot.objects.all() if editable else TimeSlot.objects.filter(is_schedulable=True)
+    entries = Timetable.objects.filter(student_group=group).select_related('subject__subject', 'faculty')
+    return _render(build_grid(entries, timeslots), group=group, editable=editable, show='faculty')
+
+
+@cached_by_scope(faculty_timetable='faculty', settings=True)
+def faculty_grid_html(faculty):
+    """A faculty member's weekly timetable, showing the class group in each cell."""
+    entries = Timetable.objects.filter(faculty=faculty).select_related('subject__subject', 'student_group')
+    return _render(build_grid(entries, TimeSlot.objects.filter(is_schedulable=True)), show='group')
+
+
+def preview_grid_html(group, new_entries):
+    """
+    A class group's timetable with unsaved entries (e.g. from the auto-scheduler) added and
+    badged as new. Not cached.
+    """
+    for entry in new_entries:
+        entry.proposed = True
+    entries = list(Timetable.objects.filter(student_group=group).select_related('subject__subject', 'faculty'))
+    return _render(build_grid(entries + list(new_entries), TimeSlot.objects.filter(is_schedulable=True)),
+                   group=group, show='faculty')
@@ -0,0 +1,38 @@
+# In academics/transaction_utils.py
+from django.db import transaction
+
+
+class _CommitBatch:
+    def __init__(self, callback):
+        self.callback = callback
+        self.items = set()
+
+    def __call__(self):
+        self.callback(self.items)
+
+
+def on_commit_batched(name, items, callback):
+    """
+    Calls `callback(items)` once the current transaction commits, with the items of every
+    call made under the same `name` in that transaction collected into one set. Outside an
+    atomic block the callback runs at once.
+
+    A batch only collects items while its on_commit callback is still queued: when the
+    transaction (or the savepoint the batch was queued in) rolls back, Django drops the
+    callback, and the next call starts a new batch instead of assuming the items are on
+    their way.
+    """
+    items = set(items)
+    if not items:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        callback(items)
+        return
+
+    batches = connection.__dict__.setdefault('commit_batches', {})
+    batch = batches.get(name)
+    if batch is None or not any(func is batch for _, func, _ in connection.run_on_commit):
+        batch = batches[name] = _CommitBatch(callback)
+        transaction.on_commit(batch)
+    batch.items |= items
@@ -49,17 +49,21 @@ urlpatterns = [
     path('timetable-entry/update/<int:entry_id>/', views.timetable_entry_update_view, name='timetable_entry_update'),
     path('timetable-entry/delete/<int:entry_id>/', views.timetable_entry_delete_view, name='timetable_entry_delete'),
     path('manage_timetable/', views.manage_timetable_view, name='manage_timetable'),
+    path('manage_timetable/auto-schedule/', views.auto_schedule_view, name='auto_schedule'),
     path('manage-substitutions/', views.manage_substitutions_view, name='manage_substitutions'),
     path('assign-substitution/<int:timetable_id>/', views.assign_substitution_view, name='assign_substitution'),
     path('cancel-substitution/<int:timetable_id>/', views.cancel_substitution_view, name='cancel_substitution'),
     path('student/my-attendance/', views.student_my_attendance_view, name='student_my_attendance'),
     path('student/my-timetable/', views.student_timetable_view, name='student_timetable'),
+    path('faculty/my-timetable/', views.faculty_timetable_view, name='faculty_timetable'),
     path('reports/attendance/', views.attendance_report_view, name='attendance_report'),
     path('reports/attendance/download/', views.download_attendance_report_view, name='download_attendance_report'),
     path('announcements/', views.announcement_list_view, name='announcement_list'),
     path('announcements/create/', views.announcement_create_view, name='announcement_create'),
     path('api/check-announcements/', views.check_announcements_view, name='check_announcements'),
+    path('api/live-updates/', views.live_updates_view, name='live_updates'),
     path('search/', views.global_search_view, name='global_search'),
+    path('search/typeahead/', views.search_typeahead_view, name='search_typeahead'),
     path('late-comers/', views.late_comers_view, name='late_comers'),
     path('student/<int:student_id>/profile/', views.student_profile_view, name='student_profile'),
     path('schemes/', views.scheme_list_view, name='scheme_list'),
@@ -86,7 +90,10 @@ urlpatterns = [
     path('guide/', views.guide_view, name='guide'),
     path('ajax/teacher-class-subjects/', views.get_teacher_class_subjects_view, name='get_teacher_class_subjects'),
     path('ajax/subject-faculty/', views.get_subject_faculty_view, name='get_subject_faculty'),
+    path('ajax/attendance-heatmap/', views.attendance_heatmap_view, name='attendance_heatmap'),
+    path('ajax/attendance-trend/', views.attendance_trend_view, name='attendance_trend'),
     path('backup-restore/', views.backup_restore_view, name='backup_restore'),
+    path('analytics-export/', views.analytics_export_view, name='analytics_export'),
     path('settings/smtp/', views.smtp_settings_view, name='smtp_settings'),
     path('reports/', views.system_reports_view, name='system_reports'),
     path('update-status/', views.update_status_view, name='update_status'),
@@ -96,6 +103,7 @@ urlpatterns = [
          name='send_parent_report'),
     path('publish-results/bulk/<int:group_id>/<int:semester>/', views.bulk_publish_results_view,
          name='bulk_publish_results'),
+    path('publish-results/progress/<str:job_id>/', views.publication_progress_view, name='publication_progress'),
     path('academic-session/<int:pk>/delete/', views.academic_session_delete_view, name='academic_session_delete'),
     path('finalize-results/', views.finalize_results_view, name='finalize_results'),
     path('supplementary-exams/', views.supplementary_exam_management_view, name='supplementary_exam_management'),
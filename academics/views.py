@@ -3,7 +3,7 @@ import calendar
 import csv
 import json
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from itertools import chain
 
 from django import forms
@@ -11,15 +11,15 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
 from django.contrib.auth.models import User
+from django.core import signing
 from django.core.cache import cache
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist
 from django.core.management import call_command
+from django.core.paginator import Paginator
 from django.db import transaction
 from django.db.models import Count, Sum
-from django.db.models import Q
-from django.db.models.functions import TruncMonth
 from django.forms import inlineformset_factory, formset_factory
-from django.http import Http404, JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.template.loader import render_to_string
 from django.urls import reverse
@@ -32,14 +32,28 @@ from academics.forms import EditStudentForm, AttendanceSettingsForm, TimeSlotFor
     TimetableEntryForm, SubstitutionForm, AttendanceReportForm, AnnouncementForm, CriterionFormSet, MarkingSchemeForm, \
     MarkSelectForm, BulkMarksImportForm, MarksReportForm, ExtraClassForm, SmtpSettingsForm, BulkEmailForm, \
     AcademicSessionForm, AcademicSessionModelForm, SupplementaryMarkForm
+from accounts.activity_utils import activity_log_buffer
 from accounts.decorators import nav_item
 from accounts.models import Profile, UserActivityLog
 from .email_utils import send_database_email
 from .forms import StudentGroupForm, CourseForm, AddStudentForm, SubjectForm
+from .marks_utils import import_marks_file, get_faculty_group_subject_map, save_marks_grid
+from .results_utils import finalize_results, recompute_subject_result
+from . import rollups, stats, timetable_grid
+from .analytics_export import export_analytics, get_export_dir, read_manifest, zip_export
+from .scheduler import auto_schedule, apply_schedule
+from .search import search, search_counts, typeahead, SEARCH_RESULTS_PER_PAGE
+from .log_utils import LOG_LEVELS, DEFAULT_RECORD_LIMIT, get_log_file_path, tail_records, filter_records
+from .live_updates import (get_latest_unread_announcement, mark_announcement_seen, serialize_announcement,
+                           event_stream)
+from .publication_utils import (get_publication_plan, build_report_payloads, render_report_email,
+                                start_publication_job, get_publication_job, is_publication_running)
 from .models import StudentGroup, AttendanceSettings, Course, Subject, \
     Timetable, AttendanceRecord, CourseSubject, TimeSlot, ClassCancellation, DailySubstitution, Announcement, \
-    UserNotificationStatus, MarkingScheme, Mark, Criterion, ExtraClass, AcademicSession, ResultPublication, \
-    StudentSubjectStatus
+    MarkingScheme, Mark, Criterion, ExtraClass, AcademicSession, ResultPublication, \
+    StudentSubjectStatus, SearchDocument
+
+STUDENTS_PER_PAGE = 50
 
 
 # ... other views ...
@@ -127,63 +141,47 @@ def admin_student_list_view(request, group_id):
     students = User.objects.filter(
         profile__student_group=student_group, profile__role='student'
     ).select_related('profile').order_by('first_name', 'last_name')
+    total_students = students.count()
 
     settings = AttendanceSettings.load()
     required_percentage = settings.required_percentage
-
-    # Determine the latest semester to calculate attendance against
-    latest_semester_num = CourseSubject.objects.filter(
-        course=student_group.course
-    ).order_by('-semester').values_list('semester', flat=True).first()
-
-    students_with_attendance = []
-    if latest_semester_num:
-        for student in students:
-            # This logic calculates the attendance percentage for each student
-            subjects_for_semester = CourseSubject.objects.filter(
-                course=student_group.course, semester=latest_semester_num
-            )
-            total_classes = AttendanceRecord.objects.filter(
-                timetable__student_group=student_group,
-                timetable__subject__in=subjects_for_semester
-            ).values('date', 'timetable_id').distinct().count()
-
-            student_records = AttendanceRecord.objects.filter(
-                student=student, timetable__subject__in=subjects_for_semester
-            )
-            present_count = student_records.filter(status='Present').count()
-
-            percentage = (present_count / total_classes * 100) if total_classes > 0 else None
-
-            students_with_attendance.append({
-                'student': student,
-                'attendance_percentage': percentage
-            })
-    else:
-        # If no semester, just list students without attendance data
-        students_with_attendance = [{'student': s, 'attendance_percentage': None} for s in students]
-
-    # --- FIX STARTS HERE ---
-
-    # 1. Check the GET parameter from the form submission
     show_low_attendance_only = request.GET.get('low_attendance_filter') == 'on'
 
-    # 2. If the filter is active, rebuild the list with only matching students
+    # Attendance is calculated against the latest semester: the classes held are the same
+    # for every student, so they are counted once and each student's attended classes are
+    # annotated onto the page's rows
+    latest_semester_num = stats.latest_semester(student_group)
+    total_classes = stats.held_classes(student_group, latest_semester_num) if latest_semester_num else 0
+    if latest_semester_num:
+        students = stats.annotate_attended(students, student_group, latest_semester_num)
     if show_low_attendance_only:
-        students_with_attendance = [
-            item for item in students_with_attendance
-            if item['attendance_percentage'] is not None and item['attendance_percentage'] < required_percentage
-        ]
+        if total_classes:
+            students = students.filter(attended_classes__lt=required_percentage * total_classes / 100)
+        else:
+            students = students.none()
 
-    # --- FIX ENDS HERE ---
+    students_page = Paginator(students, STUDENTS_PER_PAGE).get_page(request.GET.get('page'))
+
+    # Absence streaks come from the cached class matrix (see academics.analytics)
+    streaks = stats.group_matrix(student_group, latest_semester_num)['students'] if total_classes else {}
+    students_with_attendance = []
+    for student in students_page:
+        attended = getattr(student, 'attended_classes', 0)
+        students_with_attendance.append({
+            'student': student,
+            'attendance_percentage': attended / total_classes * 100 if total_classes else None,
+            'classes_needed': stats.classes_needed(attended, total_classes, required_percentage) or 0,
+            'absence_streak': streaks.get(student.pk, {}).get('current_absence_streak', 0),
+        })
 
     context = {
         'student_group': student_group,
         'students_with_attendance': students_with_attendance,
-        'total_students': students.count(),
+        'students_page': students_page,
+        'total_students': total_students,
         'latest_semester_num': latest_semester_num,
         'required_percentage': required_percentage,
-        # 3. Pass the flag back to the template to keep the checkbox state
+        # Keeps the checkbox state
         'show_low_attendance_only': show_low_attendance_only,
     }
     return render(request, 'academics/admin_student_list.html', context)
@@ -208,10 +206,11 @@ def admin_select_class_view(request):
     return render(request, 'academics/admin_select_class.html', context)
 
 
-@login_required
-@permission_required('academics.view_attendancerecord')  # Or a more general permission
-def admin_student_attendance_detail_view(request, student_id):
-    student = get_object_or_404(User, pk=student_id, profile__role='student')
+def _attendance_detail_context(request, student):
+    """
+    Context for the attendance detail pages (the student's own page and the admin's view of a
+    student): semester, monthly, daily or marks, chosen with ?view_type=.
+    """
     student_group = student.profile.student_group if hasattr(student, 'profile') else None
 
     # --- Get view type and filters from request ---
@@ -220,7 +219,6 @@ def admin_student_attendance_detail_view(request, student_id):
     selected_month_str = request.GET.get('month')
     selected_date_str = request.GET.get('date', timezone.now().strftime('%Y-%m-%d'))
 
-    # --- Initialize context dictionary ---
     context = {
         'student': student, 'student_group': student_group, 'view_type': view_type,
         'available_semesters': [], 'selected_semester': None,
@@ -230,175 +228,75 @@ def admin_student_attendance_detail_view(request, student_id):
         'available_months': [], 'selected_month': selected_month_str,
         'overall_attended_month': 0, 'overall_absent_month': 0, 'overall_percentage_month': 0,
         'daily_attendance_data': [], 'selected_date': selected_date_str,
-        'marks_data': {}
+        'marks_data_list': []
     }
 
-    if student_group and student_group.course:
-        all_course_subjects_qs = CourseSubject.objects.filter(course=student_group.course)
-        context['available_semesters'] = all_course_subjects_qs.values_list('semester', flat=True).distinct().order_by(
-            'semester')
-
-        if not selected_semester and context['available_semesters']:
-            selected_semester = context['available_semesters'].last()
-        context['selected_semester'] = int(selected_semester) if selected_semester and str(
-            selected_semester).isdigit() else None
-
-        if context['selected_semester']:
-            # This base queryset gets ALL of the student's attendance records for the semester,
-            # regardless of whether they are from a regular class or an extra class.
-            student_records_sem = AttendanceRecord.objects.filter(
-                student=student
-            ).filter(
-                Q(timetable__subject__semester=context['selected_semester']) |
-                Q(extra_class__subject__semester=context['selected_semester'])
-            )
-
-            if view_type == 'semester':
-                subjects_for_semester = all_course_subjects_qs.filter(semester=context['selected_semester'])
-                for cs in subjects_for_semester:
-                    # Calculate total conducted classes by combining regular and extra classes.
-                    # This counts distinct sessions for which attendance was marked.
-                    regular_classes_count = AttendanceRecord.objects.filter(
-                        timetable__student_group=student_group, timetable__subject=cs
-                    ).values('date', 'timetable__time_slot').distinct().count()
-
-                    extra_classes_count = ExtraClass.objects.filter(
-                        class_group=student_group, subject=cs
-                    ).count()
-
-                    total_classes = regular_classes_count + extra_classes_count
-
-                    if total_classes > 0:
-                        # Count attended classes from the pre-filtered student records
-                        present_count = student_records_sem.filter(
-                            Q(timetable__subject=cs) | Q(extra_class__subject=cs),
-                            status__in=['Present', 'Late']
-                        ).count()
-                        absent_count = total_classes - present_count
-                        context['subject_attendance_data'].append({
-                            'subject_pk': cs.subject.pk, 'subject_name': cs.subject.name,
-                            'attended_classes': present_count, 'absent_classes': absent_count,
-                            'total_classes': total_classes,
-                            'official_percentage': round(
-                                (present_count / total_classes * 100) if total_classes > 0 else 0, 2)
-                        })
-
-                # Calculate overall semester stats after the loop
-                context['overall_attended_sem'] = sum(d['attended_classes'] for d in context['subject_attendance_data'])
-                total_sem = sum(d['total_classes'] for d in context['subject_attendance_data'])
-                context['overall_absent_sem'] = total_sem - context['overall_attended_sem']
-                context['overall_percentage_sem'] = round(
-                    (context['overall_attended_sem'] / total_sem * 100) if total_sem > 0 else 0, 2)
-                context['subject_attendance_data_json'] = json.dumps(context['subject_attendance_data'])
-
-            elif view_type == 'monthly':
-                # Get all records for the group in the semester to determine available months
-                all_group_records = AttendanceRecord.objects.filter(
-                    Q(timetable__student_group=student_group) | Q(extra_class__class_group=student_group),
-                    Q(timetable__subject__semester=context['selected_semester']) | Q(
-                        extra_class__subject__semester=context['selected_semester'])
-                ).distinct()
-
-                context['available_months'] = all_group_records.annotate(month=TruncMonth('date')).values(
-                    'month').distinct().order_by('-month')
-
-                if not selected_month_str and context['available_months']:
-                    selected_month_str = context['available_months'][0]['month'].strftime('%Y-%m')
-                context['selected_month'] = selected_month_str
-
-                if selected_month_str:
-                    year, month = map(int, selected_month_str.split('-'))
-                    subjects_for_semester = all_course_subjects_qs.filter(semester=context['selected_semester'])
-                    for cs in subjects_for_semester:
-                        # Calculate total classes for the month (regular + extra)
-                        regular_classes_month = AttendanceRecord.objects.filter(
-                            timetable__student_group=student_group, timetable__subject=cs, date__year=year,
-                            date__month=month
-                        ).values('date', 'timetable__time_slot').distinct().count()
-
-                        extra_classes_month = ExtraClass.objects.filter(
-                            class_group=student_group, subject=cs, date__year=year, date__month=month
-                        ).count()
-
-                        total_classes_month = regular_classes_month + extra_classes_month
-
-                        if total_classes_month > 0:
-                            # Calculate present count for the month (regular + extra)
-                            present_count_month = student_records_sem.filter(
-                                Q(timetable__subject=cs) | Q(extra_class__subject=cs),
-                                status__in=['Present', 'Late'], date__year=year, date__month=month
-                            ).count()
-                            absent_count_month = total_classes_month - present_count_month
-                            context['monthly_subject_data'].append({
-                                'subject_pk': cs.subject.pk, 'subject_name': cs.subject.name,
-                                'attended_classes': present_count_month, 'absent_classes': absent_count_month,
-                                'total_classes': total_classes_month,
-                                'official_percentage': round(
-                                    (present_count_month / total_classes_month * 100) if total_classes_month > 0 else 0,
-                                    2)
-                            })
-
-                    # Calculate overall monthly stats after the loop
-                    context['overall_attended_month'] = sum(
-                        d['attended_classes'] for d in context['monthly_subject_data'])
-                    total_month = sum(d['total_classes'] for d in context['monthly_subject_data'])
-                    context['overall_absent_month'] = total_month - context['overall_attended_month']
-                    context['overall_percentage_month'] = round(
-                        (context['overall_attended_month'] / total_month * 100) if total_month > 0 else 0, 2)
-                    context['monthly_subject_data_json'] = json.dumps(context['monthly_subject_data'])
-
-            elif view_type == 'daily':
-                try:
-                    selected_date = datetime.strptime(selected_date_str, '%Y-%m-%d').date()
-                    # Fetch all records for the day and prefetch related data for efficiency
-                    daily_records = student_records_sem.filter(date=selected_date).select_related(
-                        'timetable__subject__subject', 'timetable__time_slot',
-                        'extra_class__subject__subject', 'extra_class__time_slot'
-                    )
-
-                    unified_daily_data = []
-                    for record in daily_records:
-                        if record.timetable:
-                            unified_daily_data.append({
-                                'subject_name': record.timetable.subject.subject.name,
-                                'time_slot': record.timetable.time_slot,
-                                'status': record.status,
-                                'is_late': record.is_late
-                            })
-                        elif record.extra_class:
-                            unified_daily_data.append({
-                                'subject_name': record.extra_class.subject.subject.name,
-                                'time_slot': record.extra_class.time_slot,
-                                'status': record.status,
-                                'is_late': record.is_late
-                            })
-
-                    # Sort the final list by the start time of the time slot
-                    unified_daily_data.sort(key=lambda x: x['time_slot'].start_time)
-                    context['daily_attendance_data'] = unified_daily_data
-
-                except (ValueError, TypeError):
-                    pass  # Ignore invalid date formats
-
+    if not (student_group and student_group.course):
+        return context
 
-            elif view_type == 'marks':
-
-                # Pass the ordered queryset of marks directly to the template.
-
-                # The .order_by() is important for grouping in the template.
+    context['available_semesters'] = CourseSubject.objects.filter(
+        course=student_group.course
+    ).values_list('semester', flat=True).distinct().order_by('semester')
+
+    if not selected_semester and context['available_semesters']:
+        selected_semester = context['available_semesters'].last()
+    context['selected_semester'] = int(selected_semester) if selected_semester and str(
+        selected_semester).isdigit() else None
+    semester = context['selected_semester']
+    if not semester:
+        return context
+
+    if view_type == 'semester':
+        breakdown = stats.subject_breakdown(student, semester)
+        context.update({
+            'subject_attendance_data': breakdown['subjects'],
+            'subject_attendance_data_json': json.dumps(breakdown['subjects']),
+            'overall_attended_sem': breakdown['attended_classes'],
+            'overall_absent_sem': breakdown['absent_classes'],
+            'overall_percentage_sem': breakdown['percentage'],
+        })
 
-                context['marks_data_list'] = Mark.objects.filter(
+    elif view_type == 'monthly':
+        context['available_months'] = stats.available_months(student_group, semester)
+        if not selected_month_str and context['available_months']:
+            selected_month_str = context['available_months'][0]['value']
+        context['selected_month'] = selected_month_str
 
-                    student=student,
+        if selected_month_str:
+            try:
+                month = datetime.strptime(selected_month_str, '%Y-%m').date()
+            except ValueError:
+                return context
+            breakdown = stats.subject_breakdown(student, semester, month)
+            context.update({
+                'monthly_subject_data': breakdown['subjects'],
+                'monthly_subject_data_json': json.dumps(breakdown['subjects']),
+                'overall_attended_month': breakdown['attended_classes'],
+                'overall_absent_month': breakdown['absent_classes'],
+                'overall_percentage_month': breakdown['percentage'],
+            })
 
-                    subject__semester=context['selected_semester']
+    elif view_type == 'daily':
+        try:
+            selected_date = datetime.strptime(selected_date_str, '%Y-%m-%d').date()
+        except (ValueError, TypeError):
+            return context  # Ignore invalid date formats
+        context['daily_attendance_data'] = stats.daily(student, selected_date)
 
-                ).select_related(
+    elif view_type == 'marks':
+        # The ordering matters: the template groups the marks by subject
+        context['marks_data_list'] = Mark.objects.filter(
+            student=student, subject__semester=semester
+        ).select_related('subject__subject', 'criterion').order_by('subject__subject__name', 'criterion__name')
 
-                    'subject__subject', 'criterion'
+    return context
 
-                ).order_by('subject__subject__name', 'criterion__name')
 
+@login_required
+@permission_required('academics.view_attendancerecord')  # Or a more general permission
+def admin_student_attendance_detail_view(request, student_id):
+    student = get_object_or_404(User, pk=student_id, profile__role='student')
+    context = _attendance_detail_context(request, student)
     return render(request, 'academics/admin_student_attendance_detail.html', context)
 
 
@@ -1140,30 +1038,61 @@ def timetable_entry_delete_view(request, entry_id):
 def manage_timetable_view(request):
     student_groups = StudentGroup.objects.all()
     selected_group = None
-    timetable_grid = {}
+    timetable_grid_html = ''
 
     group_id = request.GET.get('group_id')
     if group_id:
         selected_group = get_object_or_404(StudentGroup, pk=group_id)
-
-        entries = Timetable.objects.filter(student_group=selected_group).select_related('subject__subject', 'faculty',
-                                                                                        'time_slot')
-
-        for entry in entries:
-            if entry.day_of_week not in timetable_grid:
-                timetable_grid[entry.day_of_week] = {}
-            timetable_grid[entry.day_of_week][entry.time_slot.id] = entry
+        timetable_grid_html = timetable_grid.group_grid_html(selected_group, editable=True)
 
     context = {
         'student_groups': student_groups,
         'selected_group': selected_group,
-        'timeslots': TimeSlot.objects.all(),
-        'days_of_week': [day[0] for day in Timetable.DAY_CHOICES],
-        'timetable_grid': timetable_grid,
+        'timetable_grid_html': timetable_grid_html,
     }
     return render(request, 'academics/manage_timetable.html', context)
 
 
+@login_required
+@permission_required('academics.add_timetable', raise_exception=True)
+def auto_schedule_view(request):
+    """
+    Fills in the missing periods of the selected classes' timetables (see academics.scheduler).
+    "Preview" shows the proposed timetables without saving anything; "Apply" then saves the
+    previewed periods exactly as shown.
+    """
+    student_groups = StudentGroup.objects.select_related('course')
+    context = {'student_groups': student_groups}
+
+    if request.method == 'POST' and 'schedule' in request.POST:
+        try:
+            entries = apply_schedule(request.POST['schedule'])
+        except signing.BadSignature:
+            messages.error(request, "This preview has expired or is invalid. Preview the timetables again.")
+            return redirect('academics:auto_schedule')
+        if entries is None:
+            messages.error(request, "The timetable has changed since this preview. Preview it again.")
+            return redirect('academics:auto_schedule')
+        messages.success(request, f"Added {len(entries)} periods to the timetable.")
+        return redirect('academics:manage_timetable')
+
+    if request.method == 'POST':
+        group_ids = request.POST.getlist('student_groups')
+        groups = list(student_groups.filter(pk__in=group_ids)) if group_ids else list(student_groups)
+        result = auto_schedule(groups, preview=True)
+        new_entries = {}
+        for entry in result['entries']:
+            new_entries.setdefault(entry.student_group, []).append(entry)
+        context.update({
+            'result': result,
+            'selected_group_ids': [group.pk for group in groups] if group_ids else [],
+            'previews': [(group, timetable_grid.preview_grid_html(group, entries))
+                         for group, entries in new_entries.items()],
+        })
+
+    return render(request, 'academics/auto_schedule.html', context)
+
+
 @login_required
 @permission_required('academics.add_dailysubstitution', raise_exception=True)
 @nav_item(title="Manage Substitutions", icon="iconsminds-shuffle-1", url_name="academics:manage_substitutions",
@@ -1241,180 +1170,7 @@ def student_my_attendance_view(request):
     correctly includes attendance from both regular and extra classes.
     """
     student = request.user
-    student_group = student.profile.student_group if hasattr(student, 'profile') else None
-
-    # --- Get view type and filters from request ---
-    view_type = request.GET.get('view_type', 'semester')
-    selected_semester = request.GET.get('semester')
-    selected_month_str = request.GET.get('month')
-    selected_date_str = request.GET.get('date', timezone.now().strftime('%Y-%m-%d'))
-
-    # --- Initialize a comprehensive context dictionary ---
-    context = {
-        'student': student,
-        'view_type': view_type,
-        'available_semesters': [],
-        'selected_semester': None,
-        'subject_attendance_data': [],
-        'subject_attendance_data_json': '[]',
-        'overall_attended_sem': 0,
-        'overall_absent_sem': 0,
-        'overall_percentage_sem': 0,
-        'monthly_subject_data': [],
-        'monthly_subject_data_json': '[]',
-        'available_months': [],
-        'selected_month': selected_month_str,
-        'overall_attended_month': 0,
-        'overall_absent_month': 0,
-        'overall_percentage_month': 0,
-        'daily_attendance_data': [],
-        'selected_date': selected_date_str,
-        'marks_data_list': []
-    }
-
-    if student_group and student_group.course:
-        all_course_subjects_qs = CourseSubject.objects.filter(course=student_group.course)
-        context['available_semesters'] = all_course_subjects_qs.values_list('semester', flat=True).distinct().order_by(
-            'semester')
-
-        if not selected_semester and context['available_semesters']:
-            selected_semester = context['available_semesters'].last()
-        context['selected_semester'] = int(selected_semester) if selected_semester and str(
-            selected_semester).isdigit() else None
-
-        if context['selected_semester']:
-            # Base queryset for ALL of the student's attendance records for the semester
-            student_records_sem = AttendanceRecord.objects.filter(
-                student=student
-            ).filter(
-                Q(timetable__subject__semester=context['selected_semester']) |
-                Q(extra_class__subject__semester=context['selected_semester'])
-            )
-
-            if view_type == 'semester':
-                subjects_for_semester = all_course_subjects_qs.filter(semester=context['selected_semester'])
-                for cs in subjects_for_semester:
-                    # Calculate total classes by combining regular and extra classes
-                    regular_classes_count = AttendanceRecord.objects.filter(
-                        timetable__student_group=student_group, timetable__subject=cs
-                    ).values('date', 'timetable__time_slot').distinct().count()
-                    extra_classes_count = ExtraClass.objects.filter(
-                        class_group=student_group, subject=cs
-                    ).count()
-                    total_classes = regular_classes_count + extra_classes_count
-
-                    if total_classes > 0:
-                        # Count attended classes from both regular and extra class records
-                        present_count = student_records_sem.filter(
-                            Q(timetable__subject=cs) | Q(extra_class__subject=cs),
-                            status__in=['Present', 'Late']
-                        ).count()
-                        absent_count = total_classes - present_count
-                        context['subject_attendance_data'].append({
-                            'subject_pk': cs.subject.pk,
-                            'subject_name': cs.subject.name,
-                            'attended_classes': present_count,
-                            'absent_classes': absent_count,
-                            'total_classes': total_classes,
-                            'official_percentage': round(
-                                (present_count / total_classes * 100) if total_classes > 0 else 0, 2)
-                        })
-
-                context['overall_attended_sem'] = sum(d['attended_classes'] for d in context['subject_attendance_data'])
-                total_sem = sum(d['total_classes'] for d in context['subject_attendance_data'])
-                context['overall_absent_sem'] = total_sem - context['overall_attended_sem']
-                context['overall_percentage_sem'] = round(
-                    (context['overall_attended_sem'] / total_sem * 100) if total_sem > 0 else 0, 2)
-                context['subject_attendance_data_json'] = json.dumps(context['subject_attendance_data'])
-
-            elif view_type == 'monthly':
-                all_records_in_sem = AttendanceRecord.objects.filter(
-                    Q(timetable__student_group=student_group) | Q(extra_class__class_group=student_group),
-                    Q(timetable__subject__semester=context['selected_semester']) | Q(
-                        extra_class__subject__semester=context['selected_semester'])
-                ).distinct()
-                context['available_months'] = all_records_in_sem.annotate(month=TruncMonth('date')).values(
-                    'month').distinct().order_by('-month')
-
-                if not selected_month_str and context['available_months']:
-                    selected_month_str = context['available_months'][0]['month'].strftime('%Y-%m')
-                context['selected_month'] = selected_month_str
-
-                if selected_month_str:
-                    year, month = map(int, selected_month_str.split('-'))
-                    subjects_for_semester = all_course_subjects_qs.filter(semester=context['selected_semester'])
-                    for cs in subjects_for_semester:
-                        regular_classes_month = AttendanceRecord.objects.filter(
-                            timetable__student_group=student_group, timetable__subject=cs, date__year=year,
-                            date__month=month
-                        ).values('date', 'timetable__time_slot').distinct().count()
-                        extra_classes_month = ExtraClass.objects.filter(
-                            class_group=student_group, subject=cs, date__year=year, date__month=month
-                        ).count()
-                        total_classes_month = regular_classes_month + extra_classes_month
-
-                        if total_classes_month > 0:
-                            present_count_month = student_records_sem.filter(
-                                Q(timetable__subject=cs) | Q(extra_class__subject=cs),
-                                status__in=['Present', 'Late'], date__year=year, date__month=month
-                            ).count()
-                            absent_count_month = total_classes_month - present_count_month
-                            context['monthly_subject_data'].append({
-                                'subject_pk': cs.subject.pk,
-                                'subject_name': cs.subject.name,
-                                'attended_classes': present_count_month,
-                                'absent_classes': absent_count_month,
-                                'total_classes': total_classes_month,
-                                'official_percentage': round(
-                                    (present_count_month / total_classes_month * 100) if total_classes_month > 0 else 0,
-                                    2)
-                            })
-
-                    context['overall_attended_month'] = sum(
-                        d['attended_classes'] for d in context['monthly_subject_data'])
-                    total_month = sum(d['total_classes'] for d in context['monthly_subject_data'])
-                    context['overall_absent_month'] = total_month - context['overall_attended_month']
-                    context['overall_percentage_month'] = round(
-                        (context['overall_attended_month'] / total_month * 100) if total_month > 0 else 0, 2)
-                    context['monthly_subject_data_json'] = json.dumps(context['monthly_subject_data'])
-
-            elif view_type == 'daily':
-                try:
-                    selected_date = datetime.strptime(selected_date_str, '%Y-%m-%d').date()
-                    daily_records = student_records_sem.filter(date=selected_date).select_related(
-                        'timetable__subject__subject', 'timetable__time_slot',
-                        'extra_class__subject__subject', 'extra_class__time_slot'
-                    )
-
-                    unified_daily_data = []
-                    for record in daily_records:
-                        session_info = {
-                            'status': record.status,
-                            'is_late': record.is_late
-                        }
-                        if record.timetable:
-                            session_info['subject_name'] = record.timetable.subject.subject.name
-                            session_info['time_slot'] = record.timetable.time_slot
-                        elif record.extra_class:
-                            session_info['subject_name'] = record.extra_class.subject.subject.name
-                            session_info['time_slot'] = record.extra_class.time_slot
-
-                        if 'time_slot' in session_info:
-                            unified_daily_data.append(session_info)
-
-                    unified_daily_data.sort(key=lambda x: x['time_slot'].start_time)
-                    context['daily_attendance_data'] = unified_daily_data
-                except (ValueError, TypeError):
-                    pass  # Ignore invalid date formats
-
-            elif view_type == 'marks':
-                context['marks_data_list'] = Mark.objects.filter(
-                    student=student,
-                    subject__semester=context['selected_semester']
-                ).select_related(
-                    'subject__subject', 'criterion'
-                ).order_by('subject__subject__name', 'criterion__name')
-
+    context = _attendance_detail_context(request, student)
     return render(request, 'academics/student_my_attendance.html', context)
 
 
@@ -1464,21 +1220,15 @@ def student_timetable_view(request):
         messages.error(request,
                        "CRITICAL: A profile for your user account does not exist. Please contact an administrator.")
         # Return a completely empty page if there's no profile
-        return render(request, 'academics/student_timetable.html', {'timetable_grid': {}})
+        return render(request, 'academics/student_timetable.html', {'timetable_grid_html': ''})
 
-    timetable_grid = {}
+    timetable_grid_html = ''
     extra_classes_today = []
 
     # Only try to fetch timetable and extra classes if the student is assigned to a group.
     if student_group:
-        # Get the regular weekly timetable entries
-        entries = Timetable.objects.filter(student_group=student_group).select_related(
-            'subject__subject', 'faculty', 'time_slot'
-        )
-        for entry in entries:
-            if entry.day_of_week not in timetable_grid:
-                timetable_grid[entry.day_of_week] = {}
-            timetable_grid[entry.day_of_week][entry.time_slot.id] = entry
+        # The regular weekly timetable, cached until it changes (see academics.timetable_grid)
+        timetable_grid_html = timetable_grid.group_grid_html(student_group)
 
         # Get extra classes for today
         current_date = timezone.now().date()
@@ -1493,14 +1243,24 @@ def student_timetable_view(request):
 
     context = {
         'student_group': student_group,
-        'timeslots': TimeSlot.objects.filter(is_schedulable=True),
-        'days_of_week': [day[0] for day in Timetable.DAY_CHOICES],
-        'timetable_grid': timetable_grid,
+        'timetable_grid_html': timetable_grid_html,
         'extra_classes_today': extra_classes_today,  # Add extra classes to the context
     }
     return render(request, 'academics/student_timetable.html', context)
 
 
+@login_required
+@permission_required('academics.add_attendancerecord', raise_exception=True)
+@nav_item(title="Weekly Timetable", icon="iconsminds-calendar-4", url_name="academics:faculty_timetable",
+          permission='academics.add_attendancerecord', group='faculty_tools', order=15)
+def faculty_timetable_view(request):
+    """The logged-in faculty member's classes for the whole week."""
+    context = {
+        'timetable_grid_html': timetable_grid.faculty_grid_html(request.user),
+    }
+    return render(request, 'academics/faculty_timetable.html', context)
+
+
 @login_required
 @permission_required('academics.view_attendancerecord')  # Admin permission
 @nav_item(title="Attendance Reports", icon="simple-icon-printer", url_name="academics:attendance_report",
@@ -1524,8 +1284,9 @@ def download_attendance_report_view(request):
 
     # Fetch all attendance records for the specific subject, class, and month
     records = AttendanceRecord.objects.filter(
-        timetable__student_group=student_group,
-        timetable__subject__subject=subject,
+        student_group=student_group,
+        course_subject__subject=subject,
+        timetable__isnull=False,
         date__year=year,
         date__month=month
     ).order_by('date')  # Order by date to process chronologically
@@ -1606,85 +1367,77 @@ def check_announcements_view(request):
     """
     Checks for the single latest unread announcement for the user.
     If found, returns its data and marks it as seen to prevent future pop-ups.
+
+    Kept for clients that cannot use the live updates stream below.
     """
     user = request.user
 
-    # Admins don't get pop-ups
-    if not hasattr(user, 'profile') or user.profile.role == 'admin':
+    # Find the latest announcement that the user has NOT seen yet
+    latest_unread = get_latest_unread_announcement(user)
+    if latest_unread is None:
+        # No unread announcements found (or the user gets no pop-ups), which is a normal case
         return JsonResponse({'announcement': None})
 
-    # Determine which announcements are relevant to this user
-    target_filter = Q()
-    if user.profile.role == 'student' and user.profile.student_group:
-        target_filter = Q(send_to_all_students=True) | Q(target_student_groups=user.profile.student_group)
-    elif user.profile.role == 'faculty':
-        target_filter = Q(send_to_all_faculty=True)
-
-    if not target_filter:
-        return JsonResponse({'announcement': None})
+    # Mark this announcement as seen immediately so it doesn't pop up again
+    mark_announcement_seen(user, latest_unread)
+    return JsonResponse({'announcement': serialize_announcement(latest_unread)})
 
-    # Find the latest announcement that the user has NOT seen yet
-    try:
-        latest_unread = Announcement.objects.filter(target_filter).exclude(
-            usernotificationstatus__user=user
-        ).latest('created_at')  # .latest() gets the single newest one
-
-        # Mark this announcement as seen immediately so it doesn't pop up again
-        UserNotificationStatus.objects.create(user=user, announcement=latest_unread)
-
-        # Prepare the data to send to the frontend
-        announcement_data = {
-            'title': latest_unread.title,
-            'content': latest_unread.content,
-            'timestamp': latest_unread.created_at.strftime('%b %d, %Y, %I:%M %p'),
-        }
-        return JsonResponse({'announcement': announcement_data})
 
-    except Announcement.DoesNotExist:
-        # No unread announcements found, which is a normal case
-        return JsonResponse({'announcement': None})
+@login_required
+async def live_updates_view(request):
+    """
+    Server-Sent Events stream pushing new announcements and notifications to the user.
+    Only served under ASGI (settings.LIVE_UPDATES_SSE), where an open stream does not hold a
+    worker thread; otherwise pages poll check_announcements_view instead.
+    """
+    if not settings.LIVE_UPDATES_SSE:
+        # 204 tells an EventSource (e.g. a tab opened before a switch to WSGI) not to reconnect
+        return HttpResponse(status=204)
+    user = await request.auser()
+    response = StreamingHttpResponse(
+        event_stream(user, request.headers.get('Last-Event-ID')),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
 
 
 @login_required
 def global_search_view(request):
     """
     Handles the global search query from the top navigation bar.
-    Searches for Students, Faculty, and Subjects.
+    Searches the search index for Students, Faculty, Subjects and Classes.
     """
-    query = request.GET.get('q', '')
-    students_found = User.objects.none()
-    faculty_found = User.objects.none()
-    subjects_found = Subject.objects.none()
+    query = request.GET.get('q', '').strip()
+    doc_type = request.GET.get('type', '')
+    if doc_type not in dict(SearchDocument.DOC_TYPE_CHOICES):
+        doc_type = ''
 
+    results_page = None
+    type_counts = {}
     if query:
-        # Search for students by name, username, or student ID
-        students_found = User.objects.filter(
-            Q(profile__role='student') &
-            (Q(first_name__icontains=query) | Q(last_name__icontains=query) | Q(username__icontains=query) | Q(
-                profile__student_id_number__icontains=query))
-        ).distinct()
-
-        # Search for faculty by name or username
-        faculty_found = User.objects.filter(
-            Q(profile__role='faculty') &
-            (Q(first_name__icontains=query) | Q(last_name__icontains=query) | Q(username__icontains=query))
-        ).distinct()
-
-        # Search for subjects by name or code
-        subjects_found = Subject.objects.filter(
-            Q(name__icontains=query) | Q(code__icontains=query)
-        )
+        type_counts = search_counts(query)
+        paginator = Paginator(search(query, doc_type or None), SEARCH_RESULTS_PER_PAGE)
+        results_page = paginator.get_page(request.GET.get('page'))
 
     context = {
         'query': query,
-        'students': students_found,
-        'faculty': faculty_found,
-        'subjects': subjects_found,
-        'result_count': len(students_found) + len(faculty_found) + len(subjects_found)
+        'doc_type': doc_type,
+        'results_page': results_page,
+        'type_tabs': [(key, label, type_counts.get(key, 0)) for key, label in SearchDocument.DOC_TYPE_CHOICES],
+        'result_count': sum(type_counts.values()),
     }
     return render(request, 'academics/search_results.html', context)
 
 
+@login_required
+def search_typeahead_view(request):
+    """Returns the best few search matches as JSON for the top navigation search box."""
+    query = request.GET.get('q', '').strip()
+    return JsonResponse({'results': typeahead(query) if query else []})
+
+
 @login_required
 @permission_required('academics.view_attendancerecord', raise_exception=True)
 @nav_item(title="Late Comers", icon="simple-icon-clock", url_name="academics:late_comers",
@@ -1698,11 +1451,14 @@ def late_comers_view(request):
     late_comers_data = []
     if selected_group_id:
         student_group = get_object_or_404(StudentGroup, pk=selected_group_id)
+        # A date range rather than date__month, so the (is_late, date) index can be used
+        year, month = int(selected_year), int(selected_month)
         late_records = AttendanceRecord.objects.filter(
-            timetable__student_group=student_group,
+            student_group=student_group,
+            timetable__isnull=False,
             is_late=True,  # This is the correct filter
-            date__month=selected_month,
-            date__year=selected_year
+            date__range=(datetime(year, month, 1).date(),
+                         datetime(year, month, calendar.monthrange(year, month)[1]).date())
         ).values('student__id', 'student__first_name', 'student__last_name').annotate(late_count=Count('student'))
 
         for record in late_records:
@@ -1747,17 +1503,7 @@ def student_profile_view(request, student_id):
             total_subjects = subjects_for_semester.count()
 
             # --- Attendance Calculation ---
-            total_classes = AttendanceRecord.objects.filter(
-                timetable__student_group=student_group,
-                timetable__subject__in=subjects_for_semester
-            ).values('date', 'timetable__time_slot').distinct().count()
-            present_count = AttendanceRecord.objects.filter(
-                student=student,
-                timetable__subject__in=subjects_for_semester,
-                status__in=['Present', 'Late']
-            ).count()
-            if total_classes > 0:
-                overall_attendance = round((present_count / total_classes) * 100, 1)
+            overall_attendance = round(stats.subject_breakdown(student, current_semester)['percentage'], 1)
 
             # --- Marks Calculation ---
             marks_qs = Mark.objects.filter(student=student, subject__in=subjects_for_semester)
@@ -1860,8 +1606,7 @@ def scheme_delete_view(request, pk):
           permission='academics.add_mark', group='faculty_tools', order=30)
 def marks_entry_view(request):
     # Get all unique classes the faculty teaches
-    taught_entries = Timetable.objects.filter(faculty=request.user).select_related('student_group',
-                                                                                   'subject__subject').distinct()
+    taught_entries = Timetable.objects.filter(faculty=request.user)
     group_ids = taught_entries.values_list('student_group_id', flat=True).distinct()
     groups_queryset = StudentGroup.objects.filter(id__in=group_ids)
 
@@ -1869,40 +1614,18 @@ def marks_entry_view(request):
     subjects_queryset = CourseSubject.objects.none()
     form = MarkSelectForm(request.GET or None, groups_queryset=groups_queryset, subjects_queryset=subjects_queryset)
 
-    # Create a map of groups to their current semester's subjects for the dynamic dropdown
-    group_subject_map = {}
-    # Eager load the course to avoid extra queries inside the loop
-    for group in groups_queryset.select_related('course'):
-        # Find the latest (current) semester for the group's course
-        latest_semester_num = CourseSubject.objects.filter(
-            course=group.course
-        ).order_by('-semester').values_list('semester', flat=True).first()
-
-        # If no semester is defined for the course, there are no subjects to show
-        if not latest_semester_num:
-            group_subject_map[group.id] = []
-            continue
-
-        # Get all subject IDs the faculty teaches for this specific group - THIS IS THE KEY FIX
-        subject_ids = taught_entries.filter(
-            student_group=group
-        ).values_list('subject_id', flat=True).distinct()
-
-        # Filter the subjects to only include those from the current semester AND taught by this faculty
-        current_semester_subjects = CourseSubject.objects.filter(
-            id__in=subject_ids,
-            semester=latest_semester_num
-        ).select_related('subject')
-
-        # Build the map for the dependent dropdown
-        group_subject_map[group.id] = [
-            {'id': s.id, 'name': s.subject.name} for s in current_semester_subjects
-        ]
+    # Map of groups to the current semester's subjects this faculty teaches, for the dynamic dropdown.
+    # Built with one grouped query and cached per faculty.
+    group_subject_map = get_faculty_group_subject_map(request.user)
 
     students, criteria, existing_marks = None, None, {}
     student_group_id = request.GET.get('student_group')
     course_subject_id = request.GET.get('course_subject')
 
+    if request.method == 'POST' and not (student_group_id and course_subject_id):
+        messages.error(request, "Please select a class and subject before saving marks.")
+        return redirect('academics:marks_entry')
+
     if student_group_id and course_subject_id:
         # Verify that the faculty member actually teaches this subject to this class
         if not taught_entries.filter(
@@ -1912,46 +1635,33 @@ def marks_entry_view(request):
             messages.error(request, "You are not authorized to enter marks for this subject and class combination.")
             return redirect('academics:marks_entry')
 
-        students = User.objects.filter(profile__student_group_id=student_group_id, profile__role='student').order_by(
-            'first_name')
-        course_subject = get_object_or_404(CourseSubject, pk=course_subject_id)
-        active_scheme = course_subject.course.marking_scheme
+        students = list(User.objects.filter(profile__student_group_id=student_group_id,
+                                            profile__role='student').order_by('first_name'))
+        course_subject = get_object_or_404(CourseSubject.objects.select_related('course'), pk=course_subject_id)
+        active_scheme_id = course_subject.course.marking_scheme_id
 
-        if active_scheme:
-            criteria = active_scheme.criteria.all()
+        if active_scheme_id:
+            criteria = list(Criterion.objects.filter(scheme_id=active_scheme_id))
             marks_qs = Mark.objects.filter(
-                student__in=students,
+                student__in=[s.id for s in students],
                 subject=course_subject,
-                criterion__in=criteria
-            )
+                criterion__in=[c.id for c in criteria]
+            ).values_list('student_id', 'criterion_id', 'marks_obtained')
             # Create a nested dictionary for easy lookup in the template
-            for mark in marks_qs:
-                if mark.student_id not in existing_marks:
-                    existing_marks[mark.student_id] = {}
-                existing_marks[mark.student_id][mark.criterion_id] = mark.marks_obtained
-
-    if request.method == 'POST':
-        # Additional verification for POST requests
-        if not taught_entries.filter(
-                student_group_id=student_group_id,
-                subject_id=course_subject_id
-        ).exists():
-            messages.error(request, "You are not authorized to enter marks for this subject and class combination.")
-            return redirect('academics:marks_entry')
+            for student_id, criterion_id, marks_obtained in marks_qs:
+                existing_marks.setdefault(student_id, {})[criterion_id] = marks_obtained
 
-        subject = get_object_or_404(CourseSubject, pk=course_subject_id)
-        active_scheme = subject.course.marking_scheme
-        if active_scheme and students:
-            for student in students:
-                for criterion in active_scheme.criteria.all():
-                    input_name = f'marks-{student.id}-{criterion.id}'
-                    marks_val = request.POST.get(input_name)
-                    if marks_val:
-                        Mark.objects.update_or_create(
-                            student=student, subject=subject, criterion=criterion,
-                            defaults={'marks_obtained': marks_val}
-                        )
-            messages.success(request, "Marks have been saved successfully.")
+        if request.method == 'POST' and criteria and students:
+            # Only the cells that actually changed are written, in a single upsert
+            saved_count, error_list = save_marks_grid(
+                request.POST, [s.id for s in students], course_subject, criteria, existing_marks
+            )
+            if error_list:
+                messages.error(request, f"Marks were not saved. {' '.join(error_list)}")
+            elif saved_count:
+                messages.success(request, f"Marks have been saved successfully ({saved_count} updated).")
+            else:
+                messages.info(request, "No changes to save.")
             return redirect(request.get_full_path())
 
     context = {
@@ -1990,54 +1700,14 @@ def bulk_marks_import_view(request):
     if request.method == 'POST':
         form = BulkMarksImportForm(request.POST, request.FILES)
         if form.is_valid():
-            csv_file = request.FILES['file']
-            decoded_file = csv_file.read().decode('utf-8').splitlines()
-            reader = csv.DictReader(decoded_file)
-
-            success_count = 0
-            error_list = []
-
-            try:
-                with transaction.atomic():
-                    for row_num, row in enumerate(reader, 2):
-                        username = row.get('student_username')
-                        subject_code = row.get('subject_code')
-                        criterion_name = row.get('criterion_name')
-                        marks = row.get('marks_obtained')
-
-                        try:
-                            student = User.objects.get(username=username)
-                            subject = CourseSubject.objects.get(subject__code=subject_code)
-                            criterion = Criterion.objects.get(name=criterion_name)
-
-                            Mark.objects.update_or_create(
-                                student=student,
-                                subject=subject,
-                                criterion=criterion,
-                                defaults={'marks_obtained': marks}
-                            )
-                            success_count += 1
-
-                        except User.DoesNotExist:
-                            error_list.append(f"Row {row_num}: Student '{username}' not found.")
-                        except CourseSubject.DoesNotExist:
-                            error_list.append(f"Row {row_num}: Subject with code '{subject_code}' not found.")
-                        except Criterion.DoesNotExist:
-                            error_list.append(f"Row {row_num}: Criterion '{criterion_name}' not found.")
-                        except Exception as e:
-                            error_list.append(f"Row {row_num}: An unexpected error occurred - {e}")
-
-                    if error_list:
-                        raise Exception("Import failed, rolling back transaction.")
-
-            except Exception as e:
-                messages.error(request, str(e))
+            # The whole file is validated up front and saved with a single upsert,
+            # so either every row is imported or nothing is.
+            success_count, error_list = import_marks_file(request.FILES['file'])
 
             if not error_list:
                 messages.success(request, f"Successfully imported marks for {success_count} records.")
             else:
-                messages.warning(request,
-                                 f"Import completed with errors. Successfully imported: {success_count}. Failed: {len(error_list)}.")
+                messages.error(request, f"Import failed with {len(error_list)} errors. No marks were saved.")
 
             return render(request, 'academics/bulk_marks_import.html',
                           {'form': BulkMarksImportForm(), 'errors': error_list})
@@ -2219,17 +1889,7 @@ def my_profile_view(request):
                 total_subjects = subjects_for_semester.count()
 
                 # --- Attendance Calculation ---
-                total_classes = AttendanceRecord.objects.filter(
-                    timetable__student_group=student_group,
-                    timetable__subject__in=subjects_for_semester
-                ).values('date', 'timetable__time_slot').distinct().count()
-                present_count = AttendanceRecord.objects.filter(
-                    student=student,
-                    timetable__subject__in=subjects_for_semester,
-                    status__in=['Present', 'Late']
-                ).count()
-                if total_classes > 0:
-                    overall_attendance = round((present_count / total_classes) * 100, 1)
+                overall_attendance = round(stats.subject_breakdown(student, current_semester)['percentage'], 1)
 
                 # --- Marks Calculation ---
                 marks_qs = Mark.objects.filter(student=student, subject__in=subjects_for_semester)
@@ -2485,10 +2145,7 @@ def student_report_card_html_view(request, student_id):
             )
 
             # Get attendance and marks for this semester
-            all_records = AttendanceRecord.objects.filter(student=student).filter(
-                Q(timetable__subject__in=subjects_for_semester) |
-                Q(extra_class__subject__in=subjects_for_semester)
-            )
+            all_records = AttendanceRecord.objects.filter(student=student, course_subject__in=subjects_for_semester)
             all_marks = Mark.objects.filter(student=student, subject__in=subjects_for_semester)
 
             performance_data = []
@@ -2499,14 +2156,10 @@ def student_report_card_html_view(request, student_id):
 
             for cs in subjects_for_semester:
                 subject_total_held = AttendanceRecord.objects.filter(
-                    (Q(timetable__student_group=student_group) & Q(timetable__subject=cs)) |
-                    (Q(extra_class__class_group=student_group) & Q(extra_class__subject=cs))
+                    student_group=student_group, course_subject=cs
                 ).values('date', 'timetable_id', 'extra_class_id').distinct().count()
 
-                subject_attended = all_records.filter(
-                    (Q(timetable__subject=cs) | Q(extra_class__subject=cs)) &
-                    Q(status__in=['Present', 'Late'])
-                ).count()
+                subject_attended = all_records.filter(course_subject=cs, status__in=['Present', 'Late']).count()
 
                 subject_marks = all_marks.filter(subject=cs)
                 subject_marks_obtained = subject_marks.aggregate(total=Sum('marks_obtained'))['total'] or 0
@@ -2703,6 +2356,56 @@ def get_subject_faculty_view(request):
     return JsonResponse({'faculty': faculty_data})
 
 
+def _rollup_scope_from_request(request):
+    """
+    Reads ?scope= and ?id= for the rollup endpoints. Staff with attendance access may ask for
+    any scope; a student only for their own class group.
+    """
+    scope = request.GET.get('scope', 'institution')
+    if scope not in rollups.ROLLUP_SCOPES:
+        raise Http404("Unknown scope.")
+    object_id = None
+    if scope != 'institution':
+        try:
+            object_id = int(request.GET.get('id', ''))
+        except ValueError:
+            raise Http404("A numeric id is required for this scope.")
+
+    if not request.user.has_perm('academics.view_attendancerecord'):
+        profile = getattr(request.user, 'profile', None)
+        if not (scope == 'group' and profile and profile.student_group_id == object_id):
+            raise PermissionDenied
+    return scope, object_id
+
+
+@login_required
+def attendance_heatmap_view(request):
+    """Per-day attendance between ?start= and ?end= (default: the last year), from the daily rollups."""
+    scope, object_id = _rollup_scope_from_request(request)
+    today = timezone.localdate()
+    try:
+        end = datetime.strptime(request.GET['end'], '%Y-%m-%d').date() if request.GET.get('end') else today
+        start = (datetime.strptime(request.GET['start'], '%Y-%m-%d').date() if request.GET.get('start')
+                 else end - timedelta(days=364))
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be in YYYY-MM-DD format.'}, status=400)
+    return JsonResponse({
+        'scope': scope, 'id': object_id, 'start': start.isoformat(), 'end': end.isoformat(),
+        'days': rollups.heatmap(scope, object_id, start, end),
+    })
+
+
+@login_required
+def attendance_trend_view(request):
+    """Attendance over the last ?days= (30, 90 or 365) days, from the daily rollups."""
+    scope, object_id = _rollup_scope_from_request(request)
+    days = request.GET.get('days', '30')
+    if not days.isdigit() or int(days) not in rollups.TREND_PERIODS:
+        return JsonResponse({'error': 'days must be one of 30, 90 or 365.'}, status=400)
+    bucket, series = rollups.trend(scope, object_id, int(days), timezone.localdate())
+    return JsonResponse({'scope': scope, 'id': object_id, 'days': int(days), 'bucket': bucket, 'series': series})
+
+
 @login_required
 @permission_required('academics.add_backup')
 @nav_item(title="Backup & Restore", icon="simple-icon-cloud-download", url_name="academics:backup_restore",
@@ -2806,11 +2509,35 @@ def backup_restore_view(request):
 
     context = {
         'backup_files': backup_files,
+        'analytics_export': read_manifest(get_export_dir()),
         'page_title': 'Database Backup & Restore'
     }
     return render(request, 'academics/backup_restore.html', context)
 
 
+
+@login_required
+@permission_required('academics.add_backup')
+def analytics_export_view(request):
+    """
+    POST brings the Parquet analytics export up to date (see academics.analytics_export);
+    GET downloads the exported files as a zip.
+    """
+    if request.method == 'POST':
+        try:
+            summary = export_analytics(full='full_export' in request.POST)
+            messages.success(request, f"Analytics export updated: {summary['attendance_partitions']} attendance "
+                                      f"partitions and {summary['marks_rows']} marks written.")
+        except Exception as e:
+            messages.error(request, f"An error occurred during the analytics export: {e}")
+        return redirect('academics:backup_restore')
+
+    if not read_manifest(get_export_dir()):
+        messages.error(request, "There is no analytics export yet. Run one first.")
+        return redirect('academics:backup_restore')
+    filename = f"analytics_export_{timezone.now().strftime('%Y-%m-%d')}.zip"
+    return FileResponse(zip_export(), as_attachment=True, filename=filename)
+
 @login_required
 @permission_required("academics.change_smtp_settings")
 @nav_item(title="SMTP Settings", icon="simple-icon-envelope-letter", url_name="academics:smtp_settings",
@@ -2838,21 +2565,45 @@ def smtp_settings_view(request):
 @nav_item(title="System Reports", icon="simple-icon-chart", url_name="academics:system_reports",
           permission='academics.view_accesslog', group='application_settings', order=70)
 def system_reports_view(request):
+    # Write out this worker's buffered entries first, so recent activity shows up
+    activity_log_buffer.flush()
     # Fetch the last 100 access logs, showing the newest first
     activity_logs = UserActivityLog.objects.all().order_by('-timestamp')[:100]
-    log_file_path = os.path.join(settings.BASE_DIR, 'debug.log')
-    log_content = []
+
+    # Log records: the plain tail of the file, or a filtered view through the line index
+    log_filters = {
+        'level': request.GET.get('level') if request.GET.get('level') in LOG_LEVELS else '',
+        'module': request.GET.get('module', '').strip(),
+        'start': request.GET.get('start', ''),
+        'end': request.GET.get('end', ''),
+    }
+    log_records = []
+    log_error = None
+    try:
+        start = datetime.fromisoformat(log_filters['start']) if log_filters['start'] else None
+        end = datetime.fromisoformat(log_filters['end']) if log_filters['end'] else None
+        if end and len(log_filters['end']) == len('YYYY-MM-DDTHH:MM'):
+            end = end.replace(second=59)  # The whole minute picked in the form
+    except ValueError:
+        start = end = None
+        log_error = "Invalid time range."
     try:
-        with open(log_file_path, 'r') as f:
-            # Read the last 100 lines for efficiency
-            log_content = f.readlines()[-100:]
+        log_file_path = get_log_file_path()
+        if any(log_filters.values()):
+            log_records = filter_records(log_file_path, level=log_filters['level'] or None,
+                                         module=log_filters['module'] or None, start=start, end=end)
+        else:
+            log_records = tail_records(log_file_path, DEFAULT_RECORD_LIMIT)
     except FileNotFoundError:
-        log_content = ["Log file not found. It will be created when the first log message is written."]
+        log_error = "Log file not found. It will be created when the first log message is written."
 
     context = {
         'page_title': 'System Reports',
         'activity_logs': activity_logs,
-        'log_content': log_content,
+        'log_records': log_records,
+        'log_error': log_error,
+        'log_filters': log_filters,
+        'log_levels': LOG_LEVELS,
     }
     return render(request, 'academics/system_reports.html', context)
 
@@ -2950,38 +2701,13 @@ def publish_results_view(request):
             selected_group = get_object_or_404(StudentGroup, pk=group_id)
             selected_semester = int(semester_str)
 
-            # Get all subjects for the selected course and semester
-            subjects_in_semester = CourseSubject.objects.filter(
-                course=selected_group.course, semester=selected_semester
-            )
-            total_subjects_count = subjects_in_semester.count()
-
-            # Get all students in the group
-            students_in_group = User.objects.filter(profile__student_group=selected_group)
-
-            for student in students_in_group:
-                # Count how many marks have been entered for this student for this semester's subjects
-                marks_entered_count = Mark.objects.filter(
-                    student=student,
-                    subject__in=subjects_in_semester
-                ).count()
-
-                # Check if results have already been published for this student/semester
-                is_published = ResultPublication.objects.filter(
-                    student=student,
-                    student_group=selected_group,
-                    semester=selected_semester
-                ).exists()
-
-                # Determine status
-                all_marks_entered = marks_entered_count >= total_subjects_count
-
-                student_statuses.append({
-                    'student': student,
-                    'all_marks_entered': all_marks_entered,
-                    'is_published': is_published,
-                    'parent_email': student.profile.parent_email
-                })
+            # Marks completeness and published state for the whole group in one query
+            student_statuses = get_publication_plan(selected_group, selected_semester)
+
+    # A bulk publication started from this page, so its progress can be shown
+    publication_job = None
+    if request.GET.get('job'):
+        publication_job = get_publication_job(request.GET['job'])
 
     context = {
         'page_title': 'Publish Student Results',
@@ -2989,6 +2715,7 @@ def publish_results_view(request):
         'selected_group': selected_group,
         'selected_semester': selected_semester,
         'student_statuses': student_statuses,
+        'publication_job': publication_job,
     }
     return render(request, 'academics/publish_results.html', context)
 
@@ -3005,27 +2732,19 @@ def send_parent_report_email_view(request, student_id, group_id, semester):
             messages.error(request, f"No parent email found for {student.get_full_name()}.")
             return redirect(request.META.get('HTTP_REFERER'))
 
+        # A bulk publication of the class may be about to email this parent too
+        if is_publication_running(student_group.pk, semester):
+            messages.warning(request, "Report cards for this class and semester are already being sent.")
+            return redirect(request.META.get('HTTP_REFERER'))
+
         # Check if already published to prevent duplicate sending
         if ResultPublication.objects.filter(student=student, student_group=student_group, semester=semester).exists():
             messages.warning(request, f"Results for {student.get_full_name()} have already been published.")
             return redirect(request.META.get('HTTP_REFERER'))
 
-        # Get all marks for the report card
-        subjects_in_semester = CourseSubject.objects.filter(course=student_group.course, semester=semester)
-        marks = Mark.objects.filter(student=student, subject__in=subjects_in_semester)
-        settings = AttendanceSettings.load()
-
-        # Prepare email content
-        subject = f"Final Report Card for {student.get_full_name()} - Semester {semester}"
-        email_context = {
-            'student': student,
-            'student_group': student_group,
-            'semester': semester,
-            'marks': marks,
-            'passing_percentage': settings.passing_percentage,
-        }
-        html_content = render_to_string('emails/parent_report_card_email.html', email_context)
-        plain_text_content = f"Please find the attached report card for {student.get_full_name()}."  # Fallback text
+        # Build the report card the same way the bulk publication does
+        payload = build_report_payloads(student_group, semester, [student])[student.id]
+        subject, plain_text_content, html_content = render_report_email(payload)
 
         # Send the email
         success = send_database_email(
@@ -3058,152 +2777,75 @@ def bulk_publish_results_view(request, group_id, semester):
     if request.method == 'POST':
         student_group = get_object_or_404(StudentGroup, pk=group_id)
 
-        # Get all subjects for the semester
-        subjects_in_semester = CourseSubject.objects.filter(course=student_group.course, semester=semester)
-        # Get all possible grading criteria for this course's marking scheme
-        all_criteria = Criterion.objects.filter(scheme=student_group.course.marking_scheme).order_by('id')
-
-        students_in_group = User.objects.filter(profile__student_group=student_group)
-        settings = AttendanceSettings.load()
-
-        published_count = 0
-        error_count = 0
-
-        for student in students_in_group:
-            # --- Check eligibility for this student ---
-            is_already_published = ResultPublication.objects.filter(student=student, student_group=student_group,
-                                                                    semester=semester).exists()
-            marks_entered_count = Mark.objects.filter(student=student, subject__in=subjects_in_semester).count()
-
-            # This check ensures we have a mark for every subject-criterion pair
-            required_marks_count = subjects_in_semester.count() * all_criteria.count()
-
-            if marks_entered_count >= required_marks_count and not is_already_published and student.profile.parent_email:
-                # --- DYNAMICALLY PIVOT THE DATA FOR THE EMAIL TEMPLATE ---
-                all_marks = Mark.objects.filter(student=student, subject__in=subjects_in_semester).select_related(
-                    'subject__subject', 'criterion')
-
-                # Create a nested dictionary to hold the pivoted data: {subject_name: {criterion_name: marks, ...}, ...}
-                report_data = {s.subject.name: {} for s in subjects_in_semester}
-
-                for mark in all_marks:
-                    subject_name = mark.subject.subject.name
-                    criterion_name = mark.criterion.name
-                    report_data[subject_name][criterion_name] = {
-                        'obtained': mark.marks_obtained,
-                        'max': mark.criterion.max_marks
-                    }
-
-                # Calculate totals and pass/fail status for each subject
-                final_results = []
-                for subject_name, criteria_marks in report_data.items():
-                    total_obtained = sum(v['obtained'] for v in criteria_marks.values())
-                    total_max = sum(v['max'] for v in criteria_marks.values())
-                    percentage = (total_obtained / total_max * 100) if total_max > 0 else 0
-                    status = "Pass" if percentage >= settings.passing_percentage else "Fail"
-
-                    final_results.append({
-                        'subject': subject_name,
-                        'criteria_marks': criteria_marks,  # Pass the detailed breakdown
-                        'total_obtained': total_obtained,
-                        'total_max': total_max,
-                        'status': status
-                    })
-                # --- END OF DYNAMIC PIVOT LOGIC ---
-
-                subject = f"Final Report Card for {student.get_full_name()} - Semester {semester}"
-                email_context = {
-                    'student': student, 'student_group': student_group, 'semester': semester,
-                    'all_criteria': all_criteria,  # Pass the list of criteria for the headers
-                    'final_results': final_results,
-                }
-                html_content = render_to_string('emails/parent_report_card_email.html', email_context)
-                plain_text_content = f"Please find the attached report card for {student.get_full_name()}."
-
-                success = send_database_email(subject, plain_text_content, [student.profile.parent_email],
-                                              html_message=html_content)
-
-                if success:
-                    ResultPublication.objects.create(
-                        student=student, student_group=student_group,
-                        semester=semester, published_by=request.user
-                    )
-                    published_count += 1
-                else:
-                    error_count += 1
-
-        # --- Provide summary feedback to the admin ---
-        if published_count > 0:
-            messages.success(request, f"Successfully published and sent {published_count} report cards.")
-        if error_count > 0:
-            messages.error(request, f"Failed to send {error_count} report cards. Please check SMTP settings.")
-        if published_count == 0 and error_count == 0:
+        # Emails are sent in the background; the publish page follows the job's progress
+        job, created = start_publication_job(student_group, semester, request.user)
+        if job is None:
             messages.info(request, "No new eligible students found to publish results for at this time.")
+            return redirect(f"{reverse('academics:publish_results')}?student_group={group_id}&semester={semester}")
 
-        return redirect('academics:publish_results')
+        if created:
+            messages.success(request, f"Sending report cards to the parents of {job['total']} students.")
+        else:
+            messages.warning(request, "Report cards for this class and semester are already being sent.")
+        return redirect(f"{reverse('academics:publish_results')}?student_group={group_id}&semester={semester}"
+                        f"&job={job['id']}")
 
     return redirect('academics:publish_results')
 
 
+@login_required
+@permission_required('academics.publish_results')
+def publication_progress_view(request, job_id):
+    job = get_publication_job(job_id)
+    if job is None:
+        return JsonResponse({'success': False, 'message': 'Unknown or expired publication job.'}, status=404)
+    return JsonResponse({'success': True, **job})
+
+
 @login_required
 @permission_required('academics.finalize_results')
 @nav_item(title="Finalize Results", icon="simple-icon-check", url_name="academics:finalize_results",
           permission='academics.finalize_results', group='admin_management', order=100)
 def finalize_results_view(request):
+    student_groups = StudentGroup.objects.all()
+    context = {
+        'page_title': 'Finalize Semester Results',
+        'student_groups': student_groups,
+    }
+
     if request.method == 'POST':
         group_id = request.POST.get('student_group')
         semester_str = request.POST.get('semester')
 
         if group_id and semester_str:
             student_group = get_object_or_404(StudentGroup, pk=group_id)
-            semester = int(semester_str)
-            settings = AttendanceSettings.load()
-
-            # Get all subjects and students for the selected group/semester
-            subjects_in_semester = CourseSubject.objects.filter(course=student_group.course, semester=semester)
-            students_in_group = User.objects.filter(profile__student_group=student_group)
-
-            finalized_count = 0
-            for student in students_in_group:
-                for subject in subjects_in_semester:
-                    # Check if a status for this subject has already been finalized to avoid duplicates
-                    is_finalized = StudentSubjectStatus.objects.filter(student=student, subject=subject,
-                                                                       semester=semester).exists()
-                    if is_finalized:
-                        continue
-
-                    # Calculate the total marks and percentage for this subject
-                    marks_for_subject = Mark.objects.filter(student=student, subject=subject)
-                    total_obtained = sum(m.marks_obtained for m in marks_for_subject)
-                    total_max = sum(m.criterion.max_marks for m in marks_for_subject)
-                    percentage = (total_obtained / total_max * 100) if total_max > 0 else 0
-
-                    # Determine the final status
-                    final_status = 'PASSED' if percentage >= settings.passing_percentage else 'FAILED'
-
-                    # Create the final status record
-                    StudentSubjectStatus.objects.create(
-                        student=student,
-                        subject=subject,
-                        semester=semester,
-                        status=final_status
-                    )
-                    finalized_count += 1
+            try:
+                semester = int(semester_str)
+            except ValueError:
+                messages.error(request, "Please enter a valid semester number.")
+                return redirect('academics:finalize_results')
+
+            preview = 'preview' in request.POST
+            matrix, count = finalize_results(student_group, semester, preview=preview)
+
+            if preview:
+                # Show the pass/fail matrix without writing anything
+                context.update({
+                    'matrix': matrix,
+                    'selected_group': student_group,
+                    'selected_semester': semester,
+                    'pending_count': count,
+                })
+                return render(request, 'academics/finalize_results.html', context)
 
-            if finalized_count > 0:
+            if count:
                 messages.success(request,
-                                 f"Successfully finalized results for {finalized_count} student-subject records.")
+                                 f"Successfully finalized results for {count} student-subject records.")
             else:
                 messages.info(request, "All results for this group/semester have already been finalized.")
 
         return redirect('academics:finalize_results')
 
-    # For a GET request, get student groups from the current session to populate the dropdown
-    student_groups = StudentGroup.objects.all()
-    context = {
-        'page_title': 'Finalize Semester Results',
-        'student_groups': student_groups,
-    }
     return render(request, 'academics/finalize_results.html', context)
 
 
@@ -3253,14 +2895,10 @@ def enter_supplementary_marks_view(request, status_pk):
             mark_to_update.save()
 
             # --- Recalculate the total percentage ---
-            settings = AttendanceSettings.load()
-            all_marks_for_subject = Mark.objects.filter(student=status_record.student, subject=status_record.subject)
-            total_obtained = sum(m.marks_obtained for m in all_marks_for_subject)
-            total_max = sum(m.criterion.max_marks for m in all_marks_for_subject)
-            percentage = (total_obtained / total_max * 100) if total_max > 0 else 0
+            result = recompute_subject_result(status_record.student, status_record.subject)
 
             # --- Update the final status ---
-            if percentage >= settings.passing_percentage:
+            if result['passed']:
                 status_record.status = 'PASSED_SUPPLEMENTARY'
             else:
                 status_record.status = 'FAILED_SUPPLEMENTARY'
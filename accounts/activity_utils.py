@@ -0,0 +1,83 @@
+# In accounts/activity_utils.py
+"""
+Buffered writer for UserActivityLog.
+
+Logins, logouts and session timeouts are collected in memory per worker process and
+written with a single bulk_create once ACTIVITY_LOG_BUFFER_SIZE events have piled up,
+ACTIVITY_LOG_FLUSH_SECONDS after the first pending event, or when the process exits.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import UserActivityLog
+
+logger = logging.getLogger(__name__)
+
+
+class ActivityLogBuffer:
+    def __init__(self, max_events, max_delay):
+        self.max_events = max_events
+        self.max_delay = max_delay
+        self._pending = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, entry):
+        with self._lock:
+            self._pending.append(entry)
+            full = len(self._pending) >= self.max_events
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self._flush_from_timer)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Writes all pending events. Returns the number written."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not pending:
+            return 0
+        try:
+            UserActivityLog.objects.bulk_create(pending)
+        except Exception:
+            logger.exception("Could not write %d buffered activity log entries", len(pending))
+            return 0
+        return len(pending)
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        finally:
+            # The timer thread has its own database connection; don't leave it open
+            connection.close()
+
+
+activity_log_buffer = ActivityLogBuffer(
+    max_events=getattr(settings, 'ACTIVITY_LOG_BUFFER_SIZE', 50),
+    max_delay=getattr(settings, 'ACTIVITY_LOG_FLUSH_SECONDS', 5),
+)
+atexit.register(activity_log_buffer.flush)
+
+
+def log_activity(action, username, user=None, request=None):
+    """Queues a UserActivityLog entry; it is written with the next flush of the buffer."""
+    meta = request.META if request is not None else {}
+    activity_log_buffer.add(UserActivityLog(
+        user=user,
+        username=username,
+        action=action,
+        # Set now rather than at flush time, so entries keep the time the event happened
+        timestamp=timezone.now(),
+        ip_address=meta.get('REMOTE_ADDR'),
+        user_agent=meta.get('HTTP_USER_AGENT'),
+    ))
@@ -0,0 +1,100 @@
+# In accounts/backends.py
+import time
+
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+
+from academics.cache_versions import cache_is_shared
+
+USER_PERMISSIONS_CACHE_KEY = 'user_permissions_{user_id}'
+USER_PERMISSIONS_CACHE_TIMEOUT = 60 * 60  # 1 hour; also dropped whenever the user's groups or permissions change
+GROUP_PERMISSIONS_VERSION_KEY = 'group_permissions_version'
+
+
+def _initial_version():
+    # Starting from the clock means a version key lost from the cache can never come back
+    # with a value an older cached entry was stamped with.
+    return time.time_ns()
+
+
+def bump_group_permissions_version():
+    """
+    Marks every cached permission set as stale after a group's permissions change. Group
+    permissions are edited rarely, so one version for all groups is enough, and lets a
+    permission check read the entry and the version in a single cache round trip.
+    """
+    try:
+        cache.incr(GROUP_PERMISSIONS_VERSION_KEY)
+    except ValueError:
+        cache.set(GROUP_PERMISSIONS_VERSION_KEY, _initial_version(), None)
+
+
+def invalidate_user_permissions(*user_ids):
+    """Drops the cached permission sets of users whose groups or own permissions changed."""
+    cache.delete_many([USER_PERMISSIONS_CACHE_KEY.format(user_id=user_id) for user_id in user_ids])
+
+
+def _load_permissions(user_obj):
+    user_permissions = Permission.objects.filter(user=user_obj)
+    group_permissions = Permission.objects.filter(group__user=user_obj)
+    return {
+        'user': {f"{app_label}.{codename}" for app_label, codename in
+                 user_permissions.values_list('content_type__app_label', 'codename')},
+        'group': {f"{app_label}.{codename}" for app_label, codename in
+                  group_permissions.values_list('content_type__app_label', 'codename')},
+    }
+
+
+def get_cached_permissions(user_obj):
+    """
+    Returns {'user', 'group'} permission-name sets for a user from the shared cache.
+
+    The cached entry is stamped with the group permissions version, and both are read with
+    one get_many, so a cached check costs a single cache round trip (ModelBackend makes two
+    queries). Editing any group's permissions invalidates every entry at once; changes to
+    the user's own memberships or permissions drop the entry directly.
+    """
+    cache_key = USER_PERMISSIONS_CACHE_KEY.format(user_id=user_obj.pk)
+    found = cache.get_many([cache_key, GROUP_PERMISSIONS_VERSION_KEY])
+    version = found.get(GROUP_PERMISSIONS_VERSION_KEY)
+    if version is None:
+        cache.add(GROUP_PERMISSIONS_VERSION_KEY, _initial_version(), None)
+        version = cache.get(GROUP_PERMISSIONS_VERSION_KEY)
+    entry = found.get(cache_key)
+    if entry is None or entry['version'] != version:
+        entry = {'version': version, **_load_permissions(user_obj)}
+        cache.set(cache_key, entry, USER_PERMISSIONS_CACHE_TIMEOUT)
+    return entry
+
+
+class CachedPermissionBackend(ModelBackend):
+    """
+    ModelBackend whose permission lookups are shared across requests and workers.
+
+    ModelBackend only memoizes permissions on the user object, which lives for a single
+    request. This backend keeps each user's effective permissions in the shared cache;
+    superusers, inactive users and object-level checks fall through to ModelBackend.
+
+    A revoked permission must stop working in every worker at once, so with a per-process
+    cache (LocMemCache) nothing is cached and this behaves exactly like ModelBackend.
+    """
+
+    def _uses_shared_cache(self, user_obj, obj):
+        return (user_obj.is_active and not user_obj.is_anonymous and not user_obj.is_superuser and obj is None
+                and cache_is_shared())
+
+    def _get_shared_permissions(self, user_obj):
+        if not hasattr(user_obj, '_shared_perm_cache'):
+            user_obj._shared_perm_cache = get_cached_permissions(user_obj)
+        return user_obj._shared_perm_cache
+
+    def get_user_permissions(self, user_obj, obj=None):
+        if not self._uses_shared_cache(user_obj, obj):
+            return super().get_user_permissions(user_obj, obj)
+        return self._get_shared_permissions(user_obj)['user']
+
+    def get_group_permissions(self, user_obj, obj=None):
+        if not self._uses_shared_cache(user_obj, obj):
+            return super().get_group_permissions(user_obj, obj)
+        return self._get_shared_permissions(user_obj)['group']
@@ -1,7 +1,9 @@
 # accounts/context_processors.py
 
+from django.conf import settings
 from django.core.cache import cache
-from .models import Notification, Profile
+
+from .notification_utils import LazyUserSummary
 
 
 def custom_context_processor(request):
@@ -13,22 +15,21 @@ def custom_context_processor(request):
     }
 
     if request.user.is_authenticated:
-        # --- Your existing notification logic ---
-        unread_count = Notification.objects.filter(recipient=request.user, is_read=False).count()
-        recent_notifications = Notification.objects.filter(recipient=request.user, is_read=False)[:5]
-        context['unread_notification_count'] = unread_count
-        context['recent_notifications'] = recent_notifications
+        # --- Notifications and role flags ---
+        # Handed over as callables: nothing is loaded unless a template actually uses them,
+        # and then everything comes from one cached per-user summary.
+        summary = LazyUserSummary(request.user)
+        context['unread_notification_count'] = summary.unread_count
+        context['recent_notifications'] = summary.recent_notifications
+        context['is_admin'] = summary.is_admin
+        context['is_faculty'] = summary.is_faculty
+        context['is_student'] = summary.is_student
 
         # --- New logic for the update count ---
         # Get the update count from the cache, defaulting to 0 if not found
         context['update_count'] = cache.get('git_update_count', 0)
-        try:
-            profile = request.user.profile
-            context['is_admin'] = profile.role == 'admin'
-            context['is_faculty'] = profile.role == 'faculty'
-            context['is_student'] = profile.role == 'student'
-        except Profile.DoesNotExist:
-            # Defaults are already False
-            pass
+
+        # Announcements are pushed over Server-Sent Events under ASGI, polled otherwise
+        context['live_updates_sse'] = settings.LIVE_UPDATES_SSE
 
     return context
@@ -0,0 +1,177 @@
+# In accounts/dashboard_tiles.py
+"""
+Cached stat tiles for the admin dashboard.
+
+Each tile is computed by a provider registered with @register_tile and cached with a TTL.
+Once the TTL has passed, the next reader still gets the cached (stale) value straight away and
+the tile is recomputed in a background thread (stale-while-revalidate); only a tile that is
+missing altogether is computed inline. Stale copies are kept for DASHBOARD_TILE_STALE_SECONDS
+after they expire.
+
+The "attendance today" tile is also kept current between refreshes: every attendance write
+adjusts its counts (see adjust_attendance_today and accounts.signals). The periodic refresh
+corrects any drift from concurrent writers or other worker processes.
+"""
+import itertools
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from academics.models import AttendanceRecord, Course, StudentGroup
+from academics.transaction_utils import on_commit_batched
+from .models import Profile
+
+logger = logging.getLogger(__name__)
+
+DASHBOARD_TILE_CACHE_KEY = 'dashboard_tile_{name}'
+DASHBOARD_TILE_REFRESH_LOCK_KEY = 'dashboard_tile_refreshing_{name}'
+DASHBOARD_TILE_STALE_SECONDS = getattr(settings, 'DASHBOARD_TILE_STALE_SECONDS', 60 * 60)
+
+_tiles = {}
+_change_ids = itertools.count()  # keeps identical moves apart in a batch
+
+
+def register_tile(name, ttl):
+    """Registers the decorated function as the provider of a dashboard tile, fresh for `ttl` seconds."""
+    def decorator(provider):
+        _tiles[name] = {'provider': provider, 'ttl': ttl}
+        return provider
+    return decorator
+
+
+def _store(name, value):
+    ttl = _tiles[name]['ttl']
+    cache.set(DASHBOARD_TILE_CACHE_KEY.format(name=name),
+              {'value': value, 'fresh_until': time.time() + ttl}, ttl + DASHBOARD_TILE_STALE_SECONDS)
+
+
+def refresh_tile(name):
+    value = _tiles[name]['provider']()
+    _store(name, value)
+    return value
+
+
+def _refresh_in_background(name):
+    lock_key = DASHBOARD_TILE_REFRESH_LOCK_KEY.format(name=name)
+    # One refresh at a time per tile; the lock expires on its own if a refresh dies
+    if not cache.add(lock_key, True, 60):
+        return
+
+    def run():
+        try:
+            refresh_tile(name)
+        except Exception:
+            logger.exception("Could not refresh dashboard tile %s", name)
+        finally:
+            cache.delete(lock_key)
+            # The thread has its own database connection; don't leave it open
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
+
+
+def get_tiles(*names):
+    """Returns {name: value} for the given tiles (all registered tiles if none are named)."""
+    names = names or tuple(_tiles)
+    entries = cache.get_many([DASHBOARD_TILE_CACHE_KEY.format(name=name) for name in names])
+    now = time.time()
+    values = {}
+    for name in names:
+        entry = entries.get(DASHBOARD_TILE_CACHE_KEY.format(name=name))
+        if entry is None:
+            values[name] = refresh_tile(name)
+            continue
+        if entry['fresh_until'] < now:
+            _refresh_in_background(name)
+        values[name] = entry['value']
+    return values
+
+
+def invalidate_tile(name):
+    cache.delete(DASHBOARD_TILE_CACHE_KEY.format(name=name))
+
+
+# --- Tiles ---
+
+@register_tile('total_students', ttl=10 * 60)
+def total_students_tile():
+    return Profile.objects.filter(role='student').count()
+
+
+@register_tile('total_faculty', ttl=10 * 60)
+def total_faculty_tile():
+    return Profile.objects.filter(role='faculty').count()
+
+
+@register_tile('total_courses', ttl=30 * 60)
+def total_courses_tile():
+    return Course.objects.count()
+
+
+@register_tile('total_classes', ttl=30 * 60)
+def total_classes_tile():
+    return StudentGroup.objects.count()
+
+
+def _attendance_bucket(status, is_late):
+    if status in ('Present', 'Late'):
+        return 'late' if is_late or status == 'Late' else 'present'
+    return 'absent'
+
+
+@register_tile('attendance_today', ttl=10 * 60)
+def attendance_today_tile():
+    """Today's attendance records split into present (on time), late and absent."""
+    today = timezone.localdate()
+    counts = {'date': today.isoformat(), 'present': 0, 'late': 0, 'absent': 0}
+    rows = AttendanceRecord.objects.filter(date=today).values_list('status', 'is_late').annotate(
+        n=Count('id')).order_by()
+    for status, is_late, n in rows:
+        counts[_attendance_bucket(status, is_late)] += n
+    return counts
+
+
+def get_attendance_today():
+    counts = get_tiles('attendance_today')['attendance_today']
+    if counts['date'] != timezone.localdate().isoformat():
+        # Yesterday's counts; start the day afresh
+        counts = refresh_tile('attendance_today')
+    return counts
+
+
+def adjust_attendance_today(record_date, old=None, new=None):
+    """
+    Moves one record between the buckets of the cached "attendance today" tile. `old` and
+    `new` are (status, is_late) before and after the write; None for a created or deleted record.
+
+    The move is made once the transaction commits (a rolled-back write must not move the
+    counts), together with every other move of the transaction in one cache read and write.
+    """
+    on_commit_batched('attendance_today', [(next(_change_ids), record_date, old, new)], _apply_attendance_changes)
+
+
+def _apply_attendance_changes(changes):
+    key = DASHBOARD_TILE_CACHE_KEY.format(name='attendance_today')
+    entry = cache.get(key)
+    if entry is None:
+        return  # Computed from the database on the next read
+    counts = dict(entry['value'])
+    for _, record_date, old, new in changes:
+        if record_date.isoformat() != counts['date']:
+            continue
+        if old is not None:
+            counts[_attendance_bucket(*old)] -= 1
+        if new is not None:
+            counts[_attendance_bucket(*new)] += 1
+    for bucket in ('present', 'late', 'absent'):
+        counts[bucket] = max(counts[bucket], 0)
+    if counts == entry['value']:
+        return
+    entry['value'] = counts
+    cache.set(key, entry, max(entry['fresh_until'] - time.time(), 0) + DASHBOARD_TILE_STALE_SECONDS)
@@ -1,52 +1,75 @@
 import time
 
+from django.conf import settings
 from django.contrib.auth import logout
+from django.core.cache import cache
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.deprecation import MiddlewareMixin
 
 from academics.models import AttendanceSettings, AcademicSession
-from academics.thread_local import set_current_session
-from accounts.models import UserActivityLog
+from academics.thread_local import set_current_session, start_request_cache, clear_request_cache
+from accounts.activity_utils import log_activity
+
+
+SESSION_TIMEOUT_CACHE_KEY = 'session_timeout_seconds'
+SESSION_TIMEOUT_CACHE_TIMEOUT = 60 * 5  # 5 minutes; also cleared when the settings are saved
+
+
+def get_session_timeout_seconds():
+    timeout_seconds = cache.get(SESSION_TIMEOUT_CACHE_KEY)
+    if timeout_seconds is None:
+        timeout_seconds = AttendanceSettings.load().session_timeout_seconds
+        cache.set(SESSION_TIMEOUT_CACHE_KEY, timeout_seconds, SESSION_TIMEOUT_CACHE_TIMEOUT)
+    return timeout_seconds
+
+
+def invalidate_session_timeout():
+    cache.delete(SESSION_TIMEOUT_CACHE_KEY)
 
 
 class SessionTimeoutMiddleware:
+    """
+    Logs users out after the configured period of inactivity.
+
+    The last activity is only written back to the session once it has moved on by more than
+    settings.SESSION_ACTIVITY_GRANULARITY seconds, so most page views leave the session
+    untouched and cause no session write. Timeouts are therefore accurate to that granularity.
+    """
+
+    # URLs that should NOT reset the session timeout
+    # These are typically AJAX calls or background requests
+    EXCLUDED_URL_NAMES = [
+        'academics:check_announcements',
+        'academics:live_updates',
+        'accounts:mark_notifications_as_read',
+        # Add other AJAX endpoints here as needed
+    ]
+
     def __init__(self, get_response):
         self.get_response = get_response
+        self.granularity = getattr(settings, 'SESSION_ACTIVITY_GRANULARITY', 60)
+        # Resolved once; compared against path_info so a deployment prefix does not matter
+        self.excluded_paths = frozenset(reverse(url_name) for url_name in self.EXCLUDED_URL_NAMES)
 
     def __call__(self, request):
         if request.user.is_authenticated:
-            # Get timeout setting from database
-            attendance_settings = AttendanceSettings.load()
-            timeout_seconds = attendance_settings.session_timeout_seconds
+            timeout_seconds = get_session_timeout_seconds()
 
             now = timezone.now().timestamp()
             last_activity = request.session.get('last_activity')
 
-            # URLs that should NOT reset the session timeout
-            # These are typically AJAX calls or background requests
-            excluded_urls = [
-                reverse('academics:check_announcements'),
-                reverse('accounts:mark_notifications_as_read'),
-                # Add other AJAX endpoints here as needed
-            ]
-
             if last_activity:
                 # Check if session has expired
                 if now - last_activity > timeout_seconds:
-                    UserActivityLog.objects.create(
-                        user=request.user,
-                        username=request.user.username,
-                        action='session_timeout',
-                        ip_address=request.META.get('REMOTE_ADDR'),
-                        user_agent=request.META.get('HTTP_USER_AGENT')
-                    )
+                    log_activity('session_timeout', request.user.username, user=request.user, request=request)
                     logout(request)
                     return redirect('accounts:login')
 
-            # Only update last_activity for non-excluded URLs
-            if request.path not in excluded_urls:
+            # Only update last_activity for non-excluded URLs, and only once it has moved on enough
+            if request.path_info not in self.excluded_paths and (
+                    not last_activity or now - last_activity > self.granularity):
                 request.session['last_activity'] = now
 
         response = self.get_response(request)
@@ -82,3 +105,9 @@ class AcademicSessionMiddleware(MiddlewareMixin):
 
         # Store the found session in a thread-safe local storage
         set_current_session(current_session)
+        # Per-request memo for academics.stats
+        start_request_cache()
+
+    def process_response(self, request, response):
+        clear_request_cache()
+        return response
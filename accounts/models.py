@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from academics.models import StudentGroup, Department, Subject  # Import the new models
 
 
@@ -81,6 +82,10 @@ class Notification(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            # A user's unread notifications, newest first
+            models.Index(fields=['recipient', 'is_read', 'timestamp'], name='notification_unread_idx'),
+        ]
 
 
 class UserActivityLog(models.Model):
@@ -94,7 +99,9 @@ class UserActivityLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     username = models.CharField(max_length=150, help_text="The username used in the action.")
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Entries are written in batches (see accounts.activity_utils), so the time is set when
+    # the event happens rather than on insert. Indexed for the archival range scans.
+    timestamp = models.DateTimeField(default=timezone.now, db_index=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(null=True, blank=True)
 
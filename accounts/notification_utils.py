@@ -0,0 +1,78 @@
+# In accounts/notification_utils.py
+from django.core.cache import cache
+
+from .models import Notification, Profile
+
+USER_SUMMARY_CACHE_KEY = 'user_context_summary_{user_id}'
+USER_SUMMARY_CACHE_TIMEOUT = 60 * 5  # 5 minutes; also cleared whenever the user's notifications change
+RECENT_NOTIFICATIONS_LIMIT = 5
+
+
+def _build_summary(user):
+    unread = Notification.objects.filter(recipient=user, is_read=False)
+    try:
+        role = user.profile.role
+    except Profile.DoesNotExist:
+        role = None
+
+    # Stored as plain tuples to keep the cached value small
+    return {
+        'unread_count': unread.count(),
+        'recent': list(unread.values_list('id', 'message', 'url', 'timestamp')[:RECENT_NOTIFICATIONS_LIMIT]),
+        'role': role,
+    }
+
+
+def get_user_summary(user):
+    """
+    Returns the cached {'unread_count', 'recent', 'role'} summary shown in the top navigation
+    for a user, building it with two notification queries on a cache miss.
+    """
+    cache_key = USER_SUMMARY_CACHE_KEY.format(user_id=user.pk)
+    summary = cache.get(cache_key)
+    if summary is None:
+        summary = _build_summary(user)
+        cache.set(cache_key, summary, USER_SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def invalidate_user_summary(user_id):
+    cache.delete(USER_SUMMARY_CACHE_KEY.format(user_id=user_id))
+
+
+class LazyUserSummary:
+    """
+    Loads a user's summary on first use, so templates that never show the notification
+    bell or check the role flags don't touch the cache or the database at all.
+
+    The properties are handed to templates as callables, which the template engine calls
+    only when the variable is actually used.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._summary = None
+
+    @property
+    def summary(self):
+        if self._summary is None:
+            self._summary = get_user_summary(self.user)
+        return self._summary
+
+    def unread_count(self):
+        return self.summary['unread_count']
+
+    def recent_notifications(self):
+        return [
+            {'id': pk, 'message': message, 'url': url, 'timestamp': timestamp}
+            for pk, message, url, timestamp in self.summary['recent']
+        ]
+
+    def is_admin(self):
+        return self.summary['role'] == 'admin'
+
+    def is_faculty(self):
+        return self.summary['role'] == 'faculty'
+
+    def is_student(self):
+        return self.summary['role'] == 'student'
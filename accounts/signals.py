@@ -1,11 +1,19 @@
+from functools import partial
+
 from django.contrib.auth import user_login_failed, user_logged_in
 from django.contrib.auth.models import User, Group
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_init, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.urls import reverse
 
-from academics.models import DailySubstitution
-from .models import Profile, Notification, UserActivityLog
+from academics.models import DailySubstitution, AttendanceSettings, AttendanceRecord, Course, StudentGroup
+from .activity_utils import log_activity
+from .backends import bump_group_permissions_version, invalidate_user_permissions
+from .dashboard_tiles import adjust_attendance_today, invalidate_tile
+from .middleware import invalidate_session_timeout
+from .models import Profile, Notification
+from .notification_utils import invalidate_user_summary
 
 
 @receiver(post_save, sender=User)
@@ -45,6 +53,7 @@ def add_user_to_group(sender, instance, **kwargs):
 
     # Add the user to their correct group
     target_group.user_set.add(user)
+    invalidate_user_permissions(user.pk)
 
 
 @receiver(post_save, sender=DailySubstitution)
@@ -66,36 +75,113 @@ def create_substitution_notification(sender, instance, created, **kwargs):
         )
 
 
-def get_client_info(request):
-    """Helper function to get IP and User Agent"""
-    ip = request.META.get('REMOTE_ADDR')
-    user_agent = request.META.get('HTTP_USER_AGENT')
-    return ip, user_agent
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def invalidate_recipient_summary(sender, instance, **kwargs):
+    """Clears the recipient's cached notification summary shown in the top navigation."""
+    invalidate_user_summary(instance.recipient_id)
+
+
+@receiver(post_save, sender=Profile)
+def invalidate_profile_summary(sender, instance, **kwargs):
+    # The cached summary also holds the user's role
+    invalidate_user_summary(instance.user_id)
+
+
+# --- Shared permission cache (see accounts.backends) ---
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permissions(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_group_permissions_version()
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_member_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        invalidate_user_permissions(instance.pk)
+    elif action == 'pre_clear':
+        # Clearing from the group/permission side; the members are only known beforehand
+        invalidate_user_permissions(*instance.user_set.values_list('pk', flat=True))
+    else:
+        invalidate_user_permissions(*pk_set)
+
+
+@receiver(post_delete, sender=Group)
+def invalidate_deleted_group_permissions(sender, instance, **kwargs):
+    # Memberships are removed by cascade, without m2m signals
+    bump_group_permissions_version()
+
+
+@receiver(post_save, sender=AttendanceSettings)
+def clear_cached_session_timeout(sender, instance, **kwargs):
+    invalidate_session_timeout()
+
+
+# --- Admin dashboard tiles ---
+
+@receiver(post_init, sender=AttendanceRecord)
+def remember_dashboard_attendance_state(sender, instance, **kwargs):
+    """Keeps the record's state as loaded, so a save can move it between the dashboard's buckets."""
+    # Read from __dict__ so a deferred field never costs a query here
+    fields = instance.__dict__
+    if instance.pk and all(name in fields for name in ('date', 'status', 'is_late')):
+        instance._dashboard_state = (fields['date'], fields['status'], fields['is_late'])
+    else:
+        instance._dashboard_state = None
+
+
+# The tiles are only touched once the write commits: a rolled-back write must not move the
+# counts, and a tile recomputed before the commit would not see it. adjust_attendance_today
+# defers itself.
+
+@receiver(post_save, sender=AttendanceRecord)
+def update_dashboard_attendance_today(sender, instance, created, **kwargs):
+    old_state = None if created else instance._dashboard_state
+    if old_state and old_state[0] != instance.date:
+        adjust_attendance_today(old_state[0], old=old_state[1:])
+        old_state = None
+    adjust_attendance_today(instance.date, old=old_state[1:] if old_state else None,
+                            new=(instance.status, instance.is_late))
+    instance._dashboard_state = (instance.date, instance.status, instance.is_late)
+
+
+@receiver(post_delete, sender=AttendanceRecord)
+def remove_dashboard_attendance_today(sender, instance, **kwargs):
+    adjust_attendance_today(instance.date, old=(instance.status, instance.is_late))
+
+
+@receiver(post_save, sender=Course)
+def invalidate_course_count_tile(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(invalidate_tile, 'total_courses'))
+
+
+@receiver(post_save, sender=StudentGroup)
+def invalidate_class_count_tile(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(partial(invalidate_tile, 'total_classes'))
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=StudentGroup)
+def invalidate_deleted_count_tiles(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_tile, 'total_courses' if sender is Course else 'total_classes'))
 
 
 @receiver(user_logged_in)
 def log_user_login_success(sender, request, user, **kwargs):
     """Log successful login attempts."""
-    ip, user_agent = get_client_info(request)
-    UserActivityLog.objects.create(
-        user=user,
-        username=user.username,
-        action='login_success',
-        ip_address=ip,
-        user_agent=user_agent
-    )
+    log_activity('login_success', user.username, user=user, request=request)
 
 
 @receiver(user_login_failed)
 def log_user_login_failure(sender, credentials, request, **kwargs):
     """Log failed login attempts."""
-    ip, user_agent = get_client_info(request)
-    UserActivityLog.objects.create(
-        username=credentials.get('username', 'N/A'),
-        action='login_failed',
-        ip_address=ip,
-        user_agent=user_agent
-    )
+    log_activity('login_failed', credentials.get('username', 'N/A'), request=request)
 
 
 def add_superuser_to_admin_group(sender, instance, created, **kwargs):
@@ -15,14 +15,20 @@ from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
 
+from academics import stats
 from academics.email_utils import send_database_email
+from academics.navigation import invalidate_nav_cache
 from academics.models import Course, StudentGroup, Subject, Timetable, AttendanceRecord, DailySubstitution, \
-    ClassCancellation, AttendanceSettings, CourseSubject, Mark, Criterion, MarkingScheme, ExtraClass, ResultPublication, \
+    ClassCancellation, AttendanceSettings, Mark, Criterion, MarkingScheme, ExtraClass, ResultPublication, \
     LowAttendanceNotification
+from . import dashboard_tiles
+from .activity_utils import log_activity
+from .backends import bump_group_permissions_version
 from .decorators import nav_item
 from .forms import AddTeacherForm, EditTeacherForm, UserUpdateForm, ProfileUpdateForm, BulkImportForm, \
     CustomPasswordResetForm
 from .models import Profile, Notification, UserActivityLog
+from .notification_utils import invalidate_user_summary
 
 
 class CustomAuthenticationForm(AuthenticationForm):
@@ -65,13 +71,7 @@ def login_view(request):
 
 
 def logout_view(request):
-    UserActivityLog.objects.create(
-        user=request.user,
-        username=request.user.username,
-        action='logout',
-        ip_address=request.META.get('REMOTE_ADDR'),
-        user_agent=request.META.get('HTTP_USER_AGENT')
-    )
+    log_activity('logout', request.user.username, user=request.user, request=request)
     auth_logout(request)
     messages.info(request, "You have successfully logged out.")
     return redirect('accounts:login')
@@ -237,6 +237,9 @@ def group_permission_edit_view(request, group_id):
         selected_permission_ids = request.POST.getlist('permissions')
         selected_permissions = Permission.objects.filter(pk__in=selected_permission_ids)
         group.permissions.set(selected_permissions)
+        # Members' cached permissions and sidebars were built from the old permissions
+        bump_group_permissions_version()
+        invalidate_nav_cache()
         messages.success(request, f"Permissions for group '{group.name}' updated successfully.")
         return redirect('accounts:group_permission_list')
 
@@ -256,37 +259,24 @@ def group_permission_edit_view(request, group_id):
 def admin_dashboard_view(request):
     today = timezone.now().date()
 
-    # Top Row Stats
-    total_students = Profile.objects.filter(role='student').count()
-    total_faculty = Profile.objects.filter(role='faculty').count()
-    total_courses = Course.objects.count()
-    total_classes = StudentGroup.objects.count()
+    # Top row stats and today's attendance come from the cached tiles (see accounts.dashboard_tiles)
+    tiles = dashboard_tiles.get_tiles('total_students', 'total_faculty', 'total_courses', 'total_classes')
+    attendance_today = dashboard_tiles.get_attendance_today()
 
-    # --- FIX: Provide the exact variables the script needs ---
-    todays_records = AttendanceRecord.objects.filter(date=today)
-    present_today = todays_records.filter(status='Present').count()
-    on_duty_today = todays_records.filter(status='On Duty').count()
-
-    # For the chart, consider all other statuses as 'absent'
-    absent_today = todays_records.exclude(status__in=['Present', 'On Duty']).count()
-
-    effective_total = present_today + absent_today  # Exclude On Duty from percentage
-    attendance_today_percentage = (present_today / effective_total * 100) if effective_total > 0 else 0
-    # --- END FIX ---
+    attended_today = attendance_today['present'] + attendance_today['late']
+    marked_today = attended_today + attendance_today['absent']
+    attendance_today_percentage = (attended_today / marked_today * 100) if marked_today > 0 else 0
 
     recent_cancellations = ClassCancellation.objects.filter(date__lte=today).order_by('-date')[:5]
     recent_substitutions = DailySubstitution.objects.filter(date__lte=today).order_by('-date')[:5]
 
     context = {
-        'total_students': total_students,
-        'total_faculty': total_faculty,
-        'total_courses': total_courses,
-        'total_classes': total_classes,
+        **tiles,
 
         # Pass data with variable names expected by the script's "Overall Chart" call
-        'overall_attended': present_today,
-        'overall_absent': absent_today,
-        'overall_on_duty': on_duty_today,
+        'overall_attended': attendance_today['present'],
+        'overall_absent': attendance_today['absent'],
+        'overall_late': attendance_today['late'],
         'overall_official_percentage': attendance_today_percentage,
 
         'recent_cancellations': recent_cancellations,
@@ -339,71 +329,22 @@ def student_dashboard_view(request):
     student_group = student_user.profile.student_group
 
     # --- IMPLEMENTATION: Calculate real attendance data ---
-    subject_attendance_data = []
-    settings = AttendanceSettings.load()
-
-    if student_group and student_group.course:
-        # Default to the latest semester for the dashboard view
-        latest_semester_num = CourseSubject.objects.filter(
-            course=student_group.course
-        ).order_by('-semester').values_list('semester', flat=True).first()
-
-        if latest_semester_num:
-            subjects_for_semester = CourseSubject.objects.filter(
-                course=student_group.course, semester=latest_semester_num
-            )
-            for course_subject in subjects_for_semester:
-                total_classes = AttendanceRecord.objects.filter(
-                    timetable__student_group=student_group,
-                    timetable__subject=course_subject
-                ).values('date', 'timetable_id').distinct().count()
-
-                student_records = AttendanceRecord.objects.filter(
-                    student=student_user,
-                    timetable__subject=course_subject
-                )
-                present_count = student_records.filter(status='Present').count()
-                on_duty_count = student_records.filter(status='On Duty').count()
-                absent_count = total_classes - (present_count + on_duty_count)
-                effective_total = total_classes - on_duty_count
-                official_percentage = (present_count / effective_total * 100) if effective_total > 0 else 0
-
-                subject_attendance_data.append({
-                    'subject_pk': course_subject.subject.pk,
-                    'subject_name': course_subject.subject.name,
-                    'attended_classes': present_count,
-                    'absent_classes': absent_count if absent_count > 0 else 0,
-                    'on_duty_classes': on_duty_count,
-                    'official_percentage': round(official_percentage, 2),
-                })
-
-    # Calculate Overall data
-    overall_attended = sum(item['attended_classes'] for item in subject_attendance_data)
-    overall_absent = sum(item['absent_classes'] for item in subject_attendance_data)
-    overall_on_duty = sum(item['on_duty_classes'] for item in subject_attendance_data)
-    overall_total = overall_attended + overall_absent + overall_on_duty
-    overall_effective_total = overall_total - overall_on_duty
-    overall_official_percentage = (
-            overall_attended / overall_effective_total * 100) if overall_effective_total > 0 else 0
-
-    subjects_below_threshold = [
-        item for item in subject_attendance_data if item['official_percentage'] < settings.required_percentage
-    ]
+    # Latest semester, cached until attendance is next marked for the class (see stats.dashboard_snapshot)
+    snapshot = stats.dashboard_snapshot(student_user)
 
     # Today's Classes
     todays_classes = Timetable.objects.filter(
         student_group=student_group, day_of_week=current_day_str
-    ).order_by('time_slot__start_time')
+    ).select_related('time_slot', 'subject__subject').order_by('time_slot__start_time')
     # --- END IMPLEMENTATION ---
 
     context = {
-        'overall_official_percentage': overall_official_percentage,
-        'overall_attended': overall_attended,
-        'overall_absent': overall_absent,
-        'overall_on_duty': overall_on_duty,
-        'subjects_below_threshold': subjects_below_threshold,
+        'overall_official_percentage': snapshot['percentage'],
+        'overall_attended': snapshot['attended_classes'],
+        'overall_absent': snapshot['absent_classes'],
+        'subjects_below_threshold': snapshot['subjects_below_threshold'],
         'todays_classes': todays_classes,
-        'subject_attendance_data_json': json.dumps(subject_attendance_data)
+        'subject_attendance_data_json': json.dumps(snapshot['subjects'])
     }
     return render(request, 'accounts/student_dashboard.html', context)
 
@@ -607,5 +548,7 @@ def download_csv_template_view(request):
 def mark_notifications_as_read_view(request):
     if request.method == 'POST':
         Notification.objects.filter(recipient=request.user, is_read=False).update(is_read=True)
+        # update() skips the Notification signals, so clear the cached summary here
+        invalidate_user_summary(request.user.pk)
         return JsonResponse({'status': 'success'})
     return JsonResponse({'status': 'error'}, status=400)
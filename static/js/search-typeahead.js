@@ -0,0 +1,64 @@
+/* Top navigation search suggestions.
+   Fetches the best matches from the typeahead endpoint while the user types and shows
+   them in a dropdown under the search box. Enter still opens the full results page. */
+(function ($) {
+  var $search = $(".search");
+  var typeaheadPath = $search.data("typeaheadPath");
+  if (!typeaheadPath) {
+    return;
+  }
+
+  var $input = $search.find("input");
+  var $menu = $('<div class="dropdown-menu search-typeahead"></div>').css({ width: "100%" });
+  $search.css("position", "relative").append($menu);
+
+  var timer = null;
+  var lastQuery = "";
+
+  function render(results) {
+    $menu.empty();
+    if (!results.length) {
+      $menu.removeClass("show");
+      return;
+    }
+    results.forEach(function (result) {
+      var $item = $(result.url ? "<a></a>" : "<span></span>")
+        .addClass("dropdown-item")
+        .attr("href", result.url || null);
+      $("<span></span>").text(result.title).appendTo($item);
+      $('<small class="text-muted d-block"></small>')
+        .text(result.type + " - " + result.subtitle)
+        .appendTo($item);
+      $menu.append($item);
+    });
+    $menu.addClass("show");
+  }
+
+  $input.on("input", function () {
+    var query = $.trim($input.val());
+    clearTimeout(timer);
+    if (query.length < 2) {
+      lastQuery = "";
+      render([]);
+      return;
+    }
+    // Wait for a pause in typing instead of querying on every keystroke
+    timer = setTimeout(function () {
+      if (query === lastQuery) {
+        return;
+      }
+      lastQuery = query;
+      $.getJSON(typeaheadPath, { q: query }).done(function (data) {
+        if (query === lastQuery) {
+          render(data.results);
+        }
+      });
+    }, 250);
+  });
+
+  $(document).on("click", function (event) {
+    if (!$(event.target).closest(".search").length) {
+      $menu.removeClass("show");
+    }
+  });
+})(jQuery);
@@ -36,6 +36,14 @@ if [ $? -ne 0 ]; then
     exit 1
 fi
 
+# Create the shared cache table (does nothing if it already exists)
+echo "Creating cache table..."
+python manage.py createcachetable
+if [ $? -ne 0 ]; then
+    echo "Error creating cache table. Aborting."
+    exit 1
+fi
+
 # Collect all static files
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
@@ -49,6 +57,8 @@ fi
 # The command for this depends on how you set up your server.
 # Below is a common example using systemd.
 # You will need to replace 'gunicorn.service' with the actual name of your service file.
+# To serve under ASGI instead (live announcements without polling), install
+# deploy/uvicorn.service and restart 'uvicorn.service' here.
 
 echo "Restarting the application server..."
 # sudo systemctl restart gunicorn.service  # <--- UNCOMMENT AND EDIT THIS LINE ON YOUR SERVER